@@ -0,0 +1,180 @@
+"""
+In-memory adjacency index over the knowledge graph.
+
+Edges are held as flat NumPy arrays and indexed CSR-style: the slots of
+node i are indptr[i]:indptr[i + 1] in `_slot_edges`, each slot pointing at
+an edge row. Every edge is stored under both of its endpoints, so
+neighbourhood and k-hop queries follow links in either direction.
+
+The index is tied to a graph version (see graph_versions). Adding or
+removing a roadmap, or a rebuild, records changes and so bumps the
+version; the next query sees the mismatch and reloads the index, which
+also picks up changes made by a worker in another process.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import graph_versions, models
+
+_version = -1
+_nodes: List[Dict] = []
+_node_index: Dict[str, int] = {}
+_node_roadmaps = np.zeros(0, dtype=np.int64)
+
+# One row per edge
+_edge_ids = np.zeros(0, dtype=np.int64)
+_edge_sources = np.zeros(0, dtype=np.int64)
+_edge_targets = np.zeros(0, dtype=np.int64)
+_edge_weights = np.zeros(0, dtype=np.float64)
+_edge_relationships = np.zeros(0, dtype=np.int32)
+_relationship_names: List[str] = []
+
+# CSR adjacency: neighbour node and edge row per slot
+_indptr = np.zeros(1, dtype=np.int64)
+_slot_neighbors = np.zeros(0, dtype=np.int64)
+_slot_edges = np.zeros(0, dtype=np.int64)
+
+
+async def _load(db_conn: AsyncSession, version: int):
+    global _version, _nodes, _node_index, _node_roadmaps
+    global _edge_ids, _edge_sources, _edge_targets, _edge_weights, _edge_relationships, _relationship_names
+    global _indptr, _slot_neighbors, _slot_edges
+
+    db_nodes = (await db_conn.scalars(select(models.KnowledgeGraphNode))).all()
+    nodes = [graph_versions.node_data(node) for node in db_nodes]
+    node_index = {node["id"]: i for i, node in enumerate(nodes)}
+
+    # Skip edges whose endpoints are no longer in the graph
+    db_edges = (await db_conn.scalars(select(models.KnowledgeGraphEdge).order_by(models.KnowledgeGraphEdge.id))).all()
+    edges = [
+        edge for edge in db_edges
+        if edge.source in node_index and edge.target in node_index
+    ]
+    relationship_names = sorted({edge.relationship for edge in edges})
+    relationship_codes = {name: code for code, name in enumerate(relationship_names)}
+
+    edge_sources = np.array([node_index[edge.source] for edge in edges], dtype=np.int64)
+    edge_targets = np.array([node_index[edge.target] for edge in edges], dtype=np.int64)
+
+    # Each edge occupies one slot under its source and one under its target
+    slot_owners = np.concatenate([edge_sources, edge_targets])
+    slot_neighbors = np.concatenate([edge_targets, edge_sources])
+    slot_edges = np.concatenate([np.arange(len(edges))] * 2).astype(np.int64)
+    order = np.argsort(slot_owners, kind="stable")
+
+    _nodes = nodes
+    _node_index = node_index
+    _node_roadmaps = np.array([node["roadmap_id"] or 0 for node in nodes], dtype=np.int64)
+    _edge_ids = np.array([edge.id for edge in edges], dtype=np.int64)
+    _edge_sources = edge_sources
+    _edge_targets = edge_targets
+    _edge_weights = np.array([edge.weight for edge in edges], dtype=np.float64)
+    _edge_relationships = np.array([relationship_codes[edge.relationship] for edge in edges], dtype=np.int32)
+    _relationship_names = relationship_names
+    _indptr = np.concatenate([[0], np.cumsum(np.bincount(slot_owners, minlength=len(nodes)))]).astype(np.int64)
+    _slot_neighbors = slot_neighbors[order]
+    _slot_edges = slot_edges[order]
+    _version = version
+    print(f"✓ Adjacency index built: {len(nodes)} nodes, {len(edges)} edges (graph v{version})")
+
+
+async def _ensure_current(db_conn: AsyncSession) -> int:
+    version = await graph_versions.current_version(db_conn)
+    if version != _version:
+        await _load(db_conn, version)
+    return version
+
+
+def _slots(node_positions: np.ndarray) -> np.ndarray:
+    """Slot indices of every given node, concatenated."""
+    starts = _indptr[node_positions]
+    lengths = _indptr[node_positions + 1] - starts
+    block_starts = np.cumsum(lengths) - lengths
+    return np.repeat(starts - block_starts, lengths) + np.arange(lengths.sum())
+
+
+def _edge_filter(relationship: Optional[str], min_weight: Optional[float]) -> np.ndarray:
+    """Boolean mask over edge rows passing the relationship/weight filters."""
+    mask = np.ones(len(_edge_ids), dtype=bool)
+    if relationship is not None:
+        if relationship not in _relationship_names:
+            return np.zeros(len(_edge_ids), dtype=bool)
+        mask &= _edge_relationships == _relationship_names.index(relationship)
+    if min_weight is not None:
+        mask &= _edge_weights >= min_weight
+    return mask
+
+
+def _result(version: int, node_positions: np.ndarray, edge_rows: np.ndarray) -> Dict:
+    return {
+        "version": version,
+        "nodes": [_nodes[i] for i in np.sort(node_positions)],
+        "edges": [
+            {
+                "id": int(_edge_ids[row]),
+                "source": _nodes[_edge_sources[row]]["id"],
+                "target": _nodes[_edge_targets[row]]["id"],
+                "weight": float(_edge_weights[row]),
+                "relationship": _relationship_names[_edge_relationships[row]]
+            }
+            for row in np.sort(edge_rows)
+        ]
+    }
+
+
+async def neighbors(
+    db_conn: AsyncSession,
+    node_id: str,
+    relationship: Optional[str] = None,
+    min_weight: Optional[float] = None
+) -> Optional[Dict]:
+    """
+    The node, its direct neighbours and the edges linking them, keeping
+    only edges that pass the filters. None if the node doesn't exist.
+    """
+    version = await _ensure_current(db_conn)
+    position = _node_index.get(node_id)
+    if position is None:
+        return None
+
+    slots = _slots(np.array([position], dtype=np.int64))
+    slots = slots[_edge_filter(relationship, min_weight)[_slot_edges[slots]]]
+    node_positions = np.unique(np.concatenate([[position], _slot_neighbors[slots]]))
+    return _result(version, node_positions, np.unique(_slot_edges[slots]))
+
+
+async def roadmap_subgraph(
+    db_conn: AsyncSession,
+    roadmap_id: int,
+    hops: int = 1,
+    relationship: Optional[str] = None,
+    min_weight: Optional[float] = None
+) -> Optional[Dict]:
+    """
+    Nodes within `hops` links of any node of a roadmap, and the filtered
+    edges among them. Only edges that pass the filters are followed.
+    None if the roadmap has no nodes in the graph.
+    """
+    version = await _ensure_current(db_conn)
+    seeds = np.flatnonzero(_node_roadmaps == roadmap_id)
+    if seeds.size == 0:
+        return None
+
+    edge_mask = _edge_filter(relationship, min_weight)
+    visited = np.zeros(len(_nodes), dtype=bool)
+    visited[seeds] = True
+    frontier = seeds
+    for _ in range(hops):
+        slots = _slots(frontier)
+        reached = np.unique(_slot_neighbors[slots[edge_mask[_slot_edges[slots]]]])
+        frontier = reached[~visited[reached]]
+        if frontier.size == 0:
+            break
+        visited[frontier] = True
+
+    edge_rows = np.flatnonzero(edge_mask & visited[_edge_sources] & visited[_edge_targets])
+    return _result(version, np.flatnonzero(visited), edge_rows)
@@ -1,9 +1,27 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Union
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import roadmaps, quiz, knowledge_graph, progress
+from app import db, jobs, metrics, migrations, query_profiler
+from app.routers import roadmaps, quiz, knowledge_graph, progress, jobs as jobs_router
 
-app = FastAPI(title="Roadmap Generator API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Refuse to serve against a database that hasn't been migrated
+    migrations.check_current(db.engine)
+    
+    # Run background jobs in this process unless a separate worker.py is used
+    stop_event = asyncio.Event()
+    worker = asyncio.create_task(jobs.run_worker(stop_event)) if jobs.RUN_IN_PROCESS else None
+    yield
+    if worker:
+        stop_event.set()
+        await worker
+
+
+app = FastAPI(title="Roadmap Generator API", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -12,18 +30,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "ETag", "Server-Timing"],
 )
+if query_profiler.ENABLED:
+    app.add_middleware(query_profiler.QueryProfilerMiddleware)
+# Added last so it is outermost and times the whole request
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(roadmaps.router)
 app.include_router(quiz.router)
 app.include_router(knowledge_graph.router)
 app.include_router(progress.router)
+app.include_router(jobs_router.router)
 
 @app.get("/")
 def read_root():
     return {"Message": "Roadmap Generator API"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """HTTP and LLM metrics in the Prometheus text format (see app/metrics.py)."""
+    content, content_type = metrics.render()
+    return Response(content=content, media_type=content_type)
+
+
 @app.get("/items/{item_id}")
 def read_item(item_id: int, q: Union[str, None] = None):
     return {"item_id": item_id, "q": q}
@@ -1,16 +1,121 @@
-from sqlalchemy import create_engine
+"""
+Database engines and sessions.
+
+Routers and background jobs use async sessions (get_db / get_read_db,
+AsyncSessionLocal) so queries don't block the event loop. Migrations and
+scripts use the synchronous `engine` / SessionLocal on the same database.
+
+Writes and reads use separate pools: read connections are read-only
+(PRAGMA query_only) and serve GET routes. With SQLite in WAL mode readers
+don't block the writer or each other, so reads keep flowing while a quiz
+completion or graph update is being written.
+
+JSON columns are encoded and decoded with orjson.
+
+Configuration (environment variables):
+- DATABASE_URL: SQLAlchemy URL (default: "sqlite:///./roadmaps.db")
+- ASYNC_DATABASE_URL: Async driver URL (default: DATABASE_URL with sqlite+aiosqlite)
+- DB_POOL_SIZE: Connections kept open for writes (default: 5)
+- DB_READ_POOL_SIZE: Connections kept open for reads (default: 10)
+- SQLITE_BUSY_TIMEOUT_MS: How long a write waits for the lock before failing (default: 5000)
+- SQLITE_MMAP_SIZE: Bytes of the database file memory-mapped (default: 268435456)
+- SQLITE_CACHE_SIZE_KB: Page cache per connection in KiB (default: 65536)
+"""
+
+import os
+
+import orjson
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from app.models import Base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./roadmaps.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./roadmaps.db")
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+_in_memory = IS_SQLITE and _url.database in (None, "", ":memory:")
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    _url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False) if IS_SQLITE else SQLALCHEMY_DATABASE_URL
+)
+
+
+def _json_serializer(value) -> str:
+    return orjson.dumps(value).decode()
+
+
+_JSON_OPTIONS = {"json_serializer": _json_serializer, "json_deserializer": orjson.loads}
+
+
+def _create_engine(pool_size: int):
+    if _in_memory:
+        return create_engine(SQLALCHEMY_DATABASE_URL, **_JSON_OPTIONS)
+    return create_engine(
+        SQLALCHEMY_DATABASE_URL, pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=not IS_SQLITE, **_JSON_OPTIONS
+    )
+
+
+def _create_async_engine(pool_size: int):
+    if _in_memory:
+        return create_async_engine(ASYNC_DATABASE_URL, **_JSON_OPTIONS)
+    return create_async_engine(
+        ASYNC_DATABASE_URL, pool_size=pool_size, max_overflow=pool_size, pool_pre_ping=not IS_SQLITE, **_JSON_OPTIONS
+    )
+
+
+def _configure_sqlite(dbapi_connection, read_only: bool):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    if not _in_memory:
+        # WAL lets readers run alongside the single writer; NORMAL sync is safe with WAL
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # SQLite ignores FOREIGN KEY / ON DELETE CASCADE unless enabled per connection
+    cursor.execute("PRAGMA foreign_keys=ON")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+# Synchronous engine for migrations and scripts
+engine = _create_engine(POOL_SIZE)
+
+# Async engines for the API and job worker.
+# An in-memory database exists per connection, so reads must share the write engine.
+async_engine = _create_async_engine(POOL_SIZE)
+async_read_engine = async_engine if _in_memory else _create_async_engine(READ_POOL_SIZE)
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def configure_write_connection(dbapi_connection, connection_record):
+        _configure_sqlite(dbapi_connection, read_only=False)
+
+    if async_read_engine is not async_engine:
+        @event.listens_for(async_read_engine.sync_engine, "connect")
+        def configure_read_connection(dbapi_connection, connection_record):
+            _configure_sqlite(dbapi_connection, read_only=True)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base.metadata.create_all(bind=engine)
+# expire_on_commit=False: attributes can't be lazily reloaded outside an await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+# Tables are created and upgraded by migrations (python migrate.py), not on import
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_read_db():
+    """Session for routes that only read; writes through it fail."""
+    async with AsyncReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,72 @@
+"""
+Cached topic discovery per user and milestone.
+
+Discovery is offered each time total_unlocks reaches a multiple of
+DISCOVERY_INTERVAL, so the suggestions for a user only need computing once
+per milestone. /api/progress/complete queues a job to compute them when
+the user is one unlock short of the next milestone, so /discover usually
+finds them here instead of waiting on the model.
+
+Entries live in the discovery_cache table so a separate worker process
+can fill them. Older milestones than the previous one are dropped when
+a new one is stored.
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+DISCOVERY_INTERVAL = 3
+
+
+def milestone(total_unlocks: int) -> int:
+    """The most recent milestone at this unlock count (0 before the first one)."""
+    return total_unlocks - total_unlocks % DISCOVERY_INTERVAL
+
+
+def unlocks_until_next(total_unlocks: int) -> int:
+    """Unlocks left before discovery is offered; 0 while sitting on a milestone."""
+    if total_unlocks < DISCOVERY_INTERVAL:
+        return DISCOVERY_INTERVAL - total_unlocks
+    return (DISCOVERY_INTERVAL - total_unlocks % DISCOVERY_INTERVAL) % DISCOVERY_INTERVAL
+
+
+async def lookup(db_conn: AsyncSession, user_id: str, at_milestone: int) -> Optional[Dict]:
+    entry = await db_conn.get(models.DiscoveryCacheEntry, (user_id, at_milestone))
+    return json.loads(entry.response) if entry else None
+
+
+async def store(db_conn: AsyncSession, user_id: str, at_milestone: int, response: Dict):
+    """Save suggestions unless some are already stored for the milestone, and commit."""
+    # The first stored result wins, so a user who already saw suggestions keeps seeing them
+    await db_conn.execute(insert(models.DiscoveryCacheEntry).values(
+        user_id=user_id,
+        milestone=at_milestone,
+        response=json.dumps(response),
+        created_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=["user_id", "milestone"]))
+    await db_conn.execute(delete(models.DiscoveryCacheEntry).where(
+        models.DiscoveryCacheEntry.user_id == user_id,
+        models.DiscoveryCacheEntry.milestone < at_milestone - DISCOVERY_INTERVAL
+    ))
+    await db_conn.commit()
+
+
+async def forget_roadmaps(db_conn: AsyncSession, roadmap_ids: List[int]):
+    """
+    Drop the entries of users with progress on roadmaps being deleted,
+    since their suggestions were based on those topics (caller commits).
+    """
+    await db_conn.execute(delete(models.DiscoveryCacheEntry).where(
+        models.DiscoveryCacheEntry.user_id.in_(
+            select(models.QuizProgress.user_id).join(
+                models.RoadmapItem, models.RoadmapItem.id == models.QuizProgress.roadmap_item_id
+            ).where(models.RoadmapItem.roadmap_id.in_(roadmap_ids))
+        )
+    ))
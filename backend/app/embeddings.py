@@ -0,0 +1,63 @@
+"""
+Local text vectors for similarity lookups.
+
+Texts are embedded as hashed character n-gram and word counts (the
+"hashing trick"), L2-normalized so that a dot product is the cosine
+similarity. No model or network call is needed, which makes these cheap
+enough to compute on every request.
+"""
+
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+VECTOR_DIM = 1024
+NGRAM_SIZE = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_TOKEN_RE.findall((text or "").lower()))
+
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes, unlike the builtin hash()
+    return zlib.crc32(feature.encode("utf-8")) % VECTOR_DIM
+
+
+def embed_text(text: str) -> np.ndarray:
+    """Embed a single text as a unit-length float32 vector."""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    normalized = normalize_text(text)
+    if not normalized:
+        return vector
+
+    for word in normalized.split(" "):
+        vector[_bucket(f"w:{word}")] += 1.0
+
+    padded = f" {normalized} "
+    for i in range(len(padded) - NGRAM_SIZE + 1):
+        vector[_bucket(padded[i:i + NGRAM_SIZE])] += 1.0
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed several texts into an (n, VECTOR_DIM) matrix."""
+    if not texts:
+        return np.zeros((0, VECTOR_DIM), dtype=np.float32)
+    return np.vstack([embed_text(text) for text in texts])
+
+
+def cosine_similarities(matrix: np.ndarray, vector: np.ndarray) -> np.ndarray:
+    """Cosine similarity of `vector` against every row of a normalized matrix."""
+    if matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+    return matrix @ vector
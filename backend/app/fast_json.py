@@ -0,0 +1,22 @@
+"""
+orjson-encoded responses for hot read endpoints.
+
+Returning a dict from a route makes FastAPI validate it against the
+response_model and run it through jsonable_encoder before encoding, which
+for a page of roadmaps costs more than the queries. Routes whose payloads
+are built from typed columns return json_response() instead: the body is
+encoded once by orjson and the response_model only documents the shape.
+"""
+
+from typing import Any, Dict, Optional
+
+import orjson
+from fastapi import Response
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=dumps(content), media_type="application/json", headers=headers)
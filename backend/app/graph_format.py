@@ -0,0 +1,129 @@
+"""
+Compact columnar encoding of the knowledge graph.
+
+Instead of one JSON object per node and edge, the graph is sent as
+parallel little-endian typed arrays packed with MessagePack:
+
+    {
+      "format": "graph-columnar-v2",
+      "version": <graph version>,
+      "nodes": {
+        "count": n,
+        "types": ["topic", "title"],       # node types; also the id prefix
+        "type_dtype": "<u1",               # dtype of "type" (see below)
+        "type": uint[n],                   # index into types
+        "key": int32[n],                   # id number: id = f"{types[type[i]]}_{key[i]}"
+        "labels": [...],                   # interned label strings
+        "label": uint32[n],                # index into labels
+        "roadmap_id": int32[n],            # -1 when missing
+        "group": int32[n],                 # -1 when missing
+        "x": float32[n], "y": float32[n]   # layout positions, NaN when missing
+      },
+      "edges": {
+        "count": m,
+        "relationships": [...],            # interned relationship names
+        "relationship_dtype": "<u1",       # dtype of "relationship"
+        "id": int32[m],
+        "source": uint32[m],               # index into the node arrays
+        "target": uint32[m],
+        "weight": float32[m],
+        "relationship": uint[m]            # index into relationships
+      }
+    }
+
+Relationship names are free-form model output, so their table can grow
+past what a byte can index. Type and relationship codes use the smallest
+unsigned little-endian type that fits their table ("<u1", "<u2" or
+"<u4"), named in the *_dtype field next to them.
+
+Edges whose endpoints are missing from the node list can't be expressed
+by index and are left out.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import msgpack
+import numpy as np
+
+MEDIA_TYPE = "application/x-msgpack"
+FORMAT_NAME = "graph-columnar-v2"
+
+
+def wants_msgpack(format: Optional[str], accept: Optional[str]) -> bool:
+    """Resolve the response format from ?format= (wins) or the Accept header."""
+    if format:
+        return format == "msgpack"
+    return bool(accept) and ("application/x-msgpack" in accept or "application/msgpack" in accept)
+
+
+def _intern(values: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+    table: Dict[str, int] = {}
+    codes = [table.setdefault(value, len(table)) for value in values]
+    return list(table), np.array(codes, dtype=np.uint32)
+
+
+def _code_dtype(table: List[str]) -> str:
+    """Smallest unsigned dtype that can index `table`."""
+    if len(table) <= 1 << 8:
+        return "<u1"
+    if len(table) <= 1 << 16:
+        return "<u2"
+    return "<u4"
+
+
+def _buffer(values, dtype: str) -> bytes:
+    return np.asarray(values, dtype=dtype).tobytes()
+
+
+def encode_graph(
+    version: int,
+    nodes: List[Tuple[str, str, str, Optional[int], Optional[int]]],
+    edges: List[Tuple[int, str, str, float, str]],
+    rebuild_job_id: Optional[int] = None,
+    positions: Optional[Dict[str, List[float]]] = None
+) -> bytes:
+    """
+    Pack the graph into the columnar MessagePack format.
+
+    nodes: (id, label, node_type, roadmap_id, group) rows
+    edges: (id, source, target, weight, relationship) rows
+    positions: node id -> [x, y] from the stored layout
+    """
+    positions = positions or {}
+    missing = (float("nan"), float("nan"))
+    node_index = {row[0]: i for i, row in enumerate(nodes)}
+    types, type_codes = _intern(row[2] for row in nodes)
+    labels, label_codes = _intern(row[1] or "" for row in nodes)
+
+    edges = [row for row in edges if row[1] in node_index and row[2] in node_index]
+    relationships, relationship_codes = _intern(row[4] for row in edges)
+
+    payload = {
+        "format": FORMAT_NAME,
+        "version": version,
+        "rebuild_job_id": rebuild_job_id,
+        "nodes": {
+            "count": len(nodes),
+            "types": types,
+            "type_dtype": _code_dtype(types),
+            "type": _buffer(type_codes, _code_dtype(types)),
+            "key": _buffer([int(row[0].rsplit("_", 1)[1]) for row in nodes], "<i4"),
+            "labels": labels,
+            "label": _buffer(label_codes, "<u4"),
+            "roadmap_id": _buffer([-1 if row[3] is None else row[3] for row in nodes], "<i4"),
+            "group": _buffer([-1 if row[4] is None else row[4] for row in nodes], "<i4"),
+            "x": _buffer([positions.get(row[0], missing)[0] for row in nodes], "<f4"),
+            "y": _buffer([positions.get(row[0], missing)[1] for row in nodes], "<f4")
+        },
+        "edges": {
+            "count": len(edges),
+            "relationships": relationships,
+            "relationship_dtype": _code_dtype(relationships),
+            "id": _buffer([row[0] for row in edges], "<i4"),
+            "source": _buffer([node_index[row[1]] for row in edges], "<u4"),
+            "target": _buffer([node_index[row[2]] for row in edges], "<u4"),
+            "weight": _buffer([row[3] if row[3] is not None else 1.0 for row in edges], "<f4"),
+            "relationship": _buffer(relationship_codes, _code_dtype(relationships))
+        }
+    }
+    return msgpack.packb(payload, use_bin_type=True)
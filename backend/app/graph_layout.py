@@ -0,0 +1,246 @@
+"""
+Server-side force-directed layout of the knowledge graph.
+
+Positions are computed with vectorized NumPy Fruchterman-Reingold
+iterations in a worker process (so the event loop and the GIL stay free)
+and stored per graph version in the graph_layouts table.
+
+Each new layout starts from the previous one: nodes that already had a
+position stay fixed and only nodes added since are relaxed, seeded at the
+mean position of their already-placed neighbours. After a full rebuild
+every node is relaxed, warm-started from the old positions. Layouts are
+seeded deterministically, so the same graph always gets the same layout.
+
+Configuration (environment variables):
+- GRAPH_LAYOUT_ITERATIONS: Iterations for a full layout (default: 300)
+- GRAPH_LAYOUT_INCREMENTAL_ITERATIONS: Iterations when relaxing only new nodes (default: 100)
+- GRAPH_LAYOUT_WORKERS: Worker processes for layout computation (default: 1)
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import graph_versions, models
+
+FULL_ITERATIONS = int(os.getenv("GRAPH_LAYOUT_ITERATIONS", "300"))
+INCREMENTAL_ITERATIONS = int(os.getenv("GRAPH_LAYOUT_INCREMENTAL_ITERATIONS", "100"))
+WORKERS = int(os.getenv("GRAPH_LAYOUT_WORKERS", "1"))
+KEEP_LAYOUTS = 2  # stored layouts kept (latest, plus one being read while a new one is written)
+
+IDEAL_EDGE_LENGTH = 1.0
+GRAVITY = 0.05
+REPULSION_BLOCK = 256  # movable nodes per repulsion block (bounds memory to block x n)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+def relax(
+    positions: np.ndarray,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    weights: np.ndarray,
+    movable: np.ndarray,
+    iterations: int
+) -> np.ndarray:
+    """
+    Run Fruchterman-Reingold iterations, moving only `movable` nodes.
+
+    positions: (n, 2) float array of starting positions
+    sources/targets: node indices of each edge; weights scale attraction
+    movable: indices of nodes allowed to move
+    """
+    positions = positions.astype(np.float64, copy=True)
+    n = len(positions)
+    if n == 0 or len(movable) == 0 or iterations <= 0:
+        return positions
+
+    k = IDEAL_EDGE_LENGTH
+    is_movable = np.zeros(n, dtype=bool)
+    is_movable[movable] = True
+    # Only edges touching a movable node produce useful force
+    touching = is_movable[sources] | is_movable[targets]
+    sources, targets, weights = sources[touching], targets[touching], weights[touching]
+
+    temperature = max(np.sqrt(n) * k * 0.1, k)
+    cooling = temperature / (iterations + 1)
+
+    for _ in range(iterations):
+        displacement = np.zeros((len(movable), 2))
+
+        # Repulsion between each movable node and every node, in blocks
+        xs, ys = positions[:, 0], positions[:, 1]
+        for start in range(0, len(movable), REPULSION_BLOCK):
+            block = movable[start:start + REPULSION_BLOCK]
+            dx = xs[block, None] - xs[None, :]
+            dy = ys[block, None] - ys[None, :]
+            strength = k * k / np.maximum(dx * dx + dy * dy, 1e-6)
+            displacement[start:start + len(block), 0] = (dx * strength).sum(axis=1)
+            displacement[start:start + len(block), 1] = (dy * strength).sum(axis=1)
+
+        # Attraction along edges
+        full = np.zeros((n, 2))
+        delta = positions[sources] - positions[targets]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-6)
+        pull = delta * (distance * np.minimum(weights, 3.0) / k)[:, None]
+        np.add.at(full, sources, -pull)
+        np.add.at(full, targets, pull)
+        displacement += full[movable]
+
+        # Gravity keeps disconnected components from drifting away
+        displacement -= GRAVITY * positions[movable]
+
+        # Move at most `temperature` per step
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        positions[movable] += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature = max(temperature - cooling, 1e-3)
+
+    return positions
+
+
+async def _latest_layout(db_conn: AsyncSession) -> Optional[models.GraphLayout]:
+    return await db_conn.scalar(select(models.GraphLayout).order_by(models.GraphLayout.version.desc()).limit(1))
+
+
+async def _layout_for_version(db_conn: AsyncSession, version: int) -> Optional[models.GraphLayout]:
+    return await db_conn.scalar(select(models.GraphLayout).where(models.GraphLayout.version == version))
+
+
+async def latest_version(db_conn: AsyncSession) -> Optional[int]:
+    """Graph version of the newest stored layout, or None if none has been computed."""
+    return await db_conn.scalar(select(models.GraphLayout.version).order_by(models.GraphLayout.version.desc()).limit(1))
+
+
+async def has_layout(db_conn: AsyncSession, version: int) -> bool:
+    """Whether positions have been stored for this graph version."""
+    return await db_conn.scalar(
+        select(models.GraphLayout.version).where(models.GraphLayout.version == version)
+    ) is not None
+
+
+async def get_positions(db_conn: AsyncSession, version: int) -> Optional[Dict[str, List[float]]]:
+    """Stored positions for exactly this graph version, or None if not computed yet."""
+    layout = await _layout_for_version(db_conn, version)
+    return json.loads(layout.positions) if layout else None
+
+
+def _initial_positions(
+    node_ids: List[str],
+    roadmap_ids: List[int],
+    sources: np.ndarray,
+    targets: np.ndarray,
+    previous: Dict[str, List[float]],
+    rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Starting positions, plus the indices of nodes that had no previous position."""
+    n = len(node_ids)
+    positions = np.zeros((n, 2))
+    placed = np.zeros(n, dtype=bool)
+    for i, node_id in enumerate(node_ids):
+        if node_id in previous:
+            positions[i] = previous[node_id]
+            placed[i] = True
+    new = np.flatnonzero(~placed)
+    if new.size == 0:
+        return positions, new
+
+    # Seed new nodes at the centroid of their placed neighbours
+    neighbor_sum = np.zeros((n, 2))
+    neighbor_count = np.zeros(n)
+    for a, b in ((sources, targets), (targets, sources)):
+        known = placed[b]
+        np.add.at(neighbor_sum, a[known], positions[b[known]])
+        np.add.at(neighbor_count, a[known], 1)
+
+    # Otherwise, at a per-roadmap anchor just outside the current layout
+    extent = np.abs(positions[placed]).max() if placed.any() else np.sqrt(n) * IDEAL_EDGE_LENGTH
+    anchors: Dict[int, np.ndarray] = {}
+    for i in new:
+        if neighbor_count[i]:
+            positions[i] = neighbor_sum[i] / neighbor_count[i]
+        else:
+            if roadmap_ids[i] not in anchors:
+                angle = rng.uniform(0, 2 * np.pi)
+                anchors[roadmap_ids[i]] = (extent + IDEAL_EDGE_LENGTH) * np.array([np.cos(angle), np.sin(angle)])
+            positions[i] = anchors[roadmap_ids[i]]
+        positions[i] += rng.normal(scale=0.1 * IDEAL_EDGE_LENGTH, size=2)
+    return positions, new
+
+
+async def compute_layout(db_conn: AsyncSession) -> models.GraphLayout:
+    """Compute and store the layout for the current graph version (no-op if it exists)."""
+    version = await graph_versions.current_version(db_conn)
+    existing = await _layout_for_version(db_conn, version)
+    if existing:
+        return existing
+
+    nodes = (await db_conn.execute(
+        select(models.KnowledgeGraphNode.id, models.KnowledgeGraphNode.roadmap_id).order_by(models.KnowledgeGraphNode.id)
+    )).all()
+    node_index = {node.id: i for i, node in enumerate(nodes)}
+    edge_rows = (await db_conn.execute(select(
+        models.KnowledgeGraphEdge.source,
+        models.KnowledgeGraphEdge.target,
+        models.KnowledgeGraphEdge.weight
+    ))).all()
+    edges = [edge for edge in edge_rows if edge.source in node_index and edge.target in node_index]
+    sources = np.array([node_index[edge.source] for edge in edges], dtype=np.int64)
+    targets = np.array([node_index[edge.target] for edge in edges], dtype=np.int64)
+    weights = np.array([edge.weight or 1.0 for edge in edges], dtype=np.float64)
+
+    previous_layout = await _latest_layout(db_conn)
+    previous = json.loads(previous_layout.positions) if previous_layout else {}
+    rng = np.random.default_rng(version)
+    positions, movable = _initial_positions(
+        [node.id for node in nodes], [node.roadmap_id for node in nodes], sources, targets, previous, rng
+    )
+
+    rebuilt = previous_layout is not None and await graph_versions.reset_since(db_conn, previous_layout.version)
+    if rebuilt or not previous:
+        movable = np.arange(len(nodes))
+        iterations = FULL_ITERATIONS
+    else:
+        iterations = INCREMENTAL_ITERATIONS
+
+    loop = asyncio.get_running_loop()
+    positions = await loop.run_in_executor(
+        _get_executor(), relax, positions, sources, targets, weights, movable, iterations
+    )
+
+    layout = models.GraphLayout(
+        version=version,
+        positions=json.dumps({node.id: [round(float(x), 3), round(float(y), 3)] for node, (x, y) in zip(nodes, positions)}),
+        node_count=len(nodes),
+        relaxed_count=len(movable)
+    )
+    db_conn.add(layout)
+    try:
+        await db_conn.commit()
+    except IntegrityError:
+        # Another worker stored this version first
+        await db_conn.rollback()
+        return await _layout_for_version(db_conn, version)
+
+    stale_ids = (await db_conn.scalars(
+        select(models.GraphLayout.id).order_by(models.GraphLayout.version.desc()).offset(KEEP_LAYOUTS)
+    )).all()
+    if stale_ids:
+        await db_conn.execute(delete(models.GraphLayout).where(models.GraphLayout.id.in_(stale_ids)))
+        await db_conn.commit()
+
+    print(f"📐 Graph layout v{version}: relaxed {len(movable)}/{len(nodes)} nodes in {iterations} iterations")
+    return layout
@@ -0,0 +1,150 @@
+"""
+Knowledge graph versioning and change log.
+
+Every change to graph nodes or edges is appended to the graph_changes
+table; the id of the latest row is the graph version. Clients use it as
+an ETag for the full graph, or ask for the changes since a version they
+already have.
+
+Full rebuilds are recorded as a single "reset" change, after which clients
+must download the whole graph again. Only the most recent
+GRAPH_CHANGE_RETENTION changes are kept; older versions also get a reset.
+"""
+
+import json
+import os
+from typing import Dict, Iterable
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+RETENTION = int(os.getenv("GRAPH_CHANGE_RETENTION", "10000"))
+
+
+async def current_version(db_conn: AsyncSession) -> int:
+    """Latest graph version (0 before any change)."""
+    return await db_conn.scalar(select(func.max(models.GraphChange.id))) or 0
+
+
+def etag(version: int, variant: str = None, laid_out: bool = False) -> str:
+    """
+    ETag for a graph version; `variant` distinguishes other encodings of it.
+    laid_out marks a response that includes the version's layout positions,
+    so clients that got it without them don't revalidate to a 304 forever.
+    """
+    tag = f"graph-v{version}"
+    if laid_out:
+        tag += "-L"
+    if variant:
+        tag += f"-{variant}"
+    return f'"{tag}"'
+
+
+def node_data(node: models.KnowledgeGraphNode) -> Dict:
+    return {
+        "id": node.id,
+        "label": node.label,
+        "type": node.node_type,
+        "roadmap_id": node.roadmap_id,
+        "group": node.group
+    }
+
+
+def edge_data(edge: models.KnowledgeGraphEdge) -> Dict:
+    return {
+        "id": edge.id,
+        "source": edge.source,
+        "target": edge.target,
+        "weight": edge.weight,
+        "relationship": edge.relationship
+    }
+
+
+async def record_added(
+    db_conn: AsyncSession,
+    nodes: Iterable[models.KnowledgeGraphNode] = (),
+    edges: Iterable[models.KnowledgeGraphEdge] = ()
+):
+    """Log newly added nodes and edges (caller commits)."""
+    await db_conn.flush()  # assign edge ids
+    for node in nodes:
+        db_conn.add(models.GraphChange(op="add", kind="node", entity_id=node.id, data=json.dumps(node_data(node))))
+    for edge in edges:
+        db_conn.add(models.GraphChange(op="add", kind="edge", entity_id=str(edge.id), data=json.dumps(edge_data(edge))))
+    await _prune(db_conn)
+
+
+async def record_removed(db_conn: AsyncSession, node_ids: Iterable[str] = (), edge_ids: Iterable[int] = ()):
+    """Log removed nodes and edges (caller commits)."""
+    for node_id in node_ids:
+        db_conn.add(models.GraphChange(op="remove", kind="node", entity_id=node_id))
+    for edge_id in edge_ids:
+        db_conn.add(models.GraphChange(op="remove", kind="edge", entity_id=str(edge_id)))
+    await _prune(db_conn)
+
+
+def record_reset(db_conn: AsyncSession):
+    """Log that the whole graph was replaced (caller commits)."""
+    db_conn.add(models.GraphChange(op="reset", kind=""))
+
+
+async def _prune(db_conn: AsyncSession):
+    await db_conn.flush()
+    cutoff = await current_version(db_conn) - RETENTION
+    if cutoff > 0:
+        await db_conn.execute(delete(models.GraphChange).where(models.GraphChange.id <= cutoff))
+
+
+async def reset_since(db_conn: AsyncSession, since: int) -> bool:
+    """Whether the graph was rebuilt after version `since`."""
+    return await db_conn.scalar(select(models.GraphChange.id).where(
+        models.GraphChange.id > since,
+        models.GraphChange.op == "reset"
+    ).limit(1)) is not None
+
+
+async def changes_since(db_conn: AsyncSession, since: int) -> Dict:
+    """
+    Net changes after version `since`, folded so each node/edge appears once.
+    Returns reset=True when the client has to reload the full graph instead.
+    """
+    version = await current_version(db_conn)
+    result = {
+        "version": version,
+        "since": since,
+        "reset": False,
+        "nodes_added": [],
+        "nodes_removed": [],
+        "edges_added": [],
+        "edges_removed": []
+    }
+    if since >= version:
+        return result
+
+    oldest = await db_conn.scalar(select(func.min(models.GraphChange.id)))
+    if since < 0 or oldest is None or since < oldest - 1 or await reset_since(db_conn, since):
+        result["reset"] = True
+        return result
+
+    changes = (await db_conn.scalars(select(models.GraphChange).where(
+        models.GraphChange.id > since,
+        models.GraphChange.id <= version
+    ).order_by(models.GraphChange.id))).all()
+
+    added: Dict[str, Dict] = {"node": {}, "edge": {}}
+    removed: Dict[str, Dict] = {"node": {}, "edge": {}}
+    for change in changes:
+        if change.op == "add":
+            added[change.kind][change.entity_id] = json.loads(change.data)
+            removed[change.kind].pop(change.entity_id, None)
+        else:
+            added[change.kind].pop(change.entity_id, None)
+            removed[change.kind][change.entity_id] = True
+
+    result["nodes_added"] = list(added["node"].values())
+    result["edges_added"] = list(added["edge"].values())
+    result["nodes_removed"] = list(removed["node"].keys())
+    result["edges_removed"] = [int(edge_id) for edge_id in removed["edge"].keys()]
+    return result
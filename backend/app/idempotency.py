@@ -0,0 +1,69 @@
+"""
+Stored responses for requests sent with an Idempotency-Key header.
+
+A retried request with the same key gets the stored response instead of
+running again. Reusing a key with different parameters (or on another
+endpoint) is rejected with 422.
+
+Configuration (environment variables):
+- IDEMPOTENCY_TTL_HOURS: How long stored responses are kept (default: 24)
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")))
+
+
+def request_hash(params: dict) -> str:
+    """Stable hash of the request parameters."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def lookup(db_conn: AsyncSession, key: str, endpoint: str, params_hash: str) -> Optional[Any]:
+    """Return the stored response for this key, or None if there isn't one."""
+    record = await db_conn.scalar(select(models.IdempotencyKey).where(
+        models.IdempotencyKey.key == key,
+        models.IdempotencyKey.created_at >= datetime.utcnow() - TTL
+    ))
+
+    if not record:
+        return None
+
+    if record.endpoint != endpoint or record.request_hash != params_hash:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with different request parameters"
+        )
+
+    print(f"✓ Replaying stored response for Idempotency-Key {key}")
+    return json.loads(record.response)
+
+
+async def store(db_conn: AsyncSession, key: str, endpoint: str, params_hash: str, response: Any):
+    """Store a response under its key and drop expired keys."""
+    await db_conn.execute(delete(models.IdempotencyKey).where(
+        models.IdempotencyKey.created_at < datetime.utcnow() - TTL
+    ))
+
+    db_conn.add(models.IdempotencyKey(
+        key=key,
+        endpoint=endpoint,
+        request_hash=params_hash,
+        response=json.dumps(response)
+    ))
+    try:
+        await db_conn.commit()
+    except IntegrityError:
+        # A concurrent request with the same key stored its response first
+        await db_conn.rollback()
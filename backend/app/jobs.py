@@ -0,0 +1,265 @@
+"""
+Durable background jobs.
+
+Work that doesn't need to finish before an HTTP response (e.g. linking a
+new roadmap into the knowledge graph) is written to the jobs table and
+picked up by a worker. The worker runs inside the API process by default,
+or separately via `python worker.py`.
+
+Failed jobs are retried with exponential backoff until max_attempts.
+A kind can register a failure handler to clean up after its last attempt.
+
+A running job holds a lease that its worker renews every third of
+JOBS_LEASE_SECONDS while the handler runs. Workers requeue running jobs
+whose lease has expired, i.e. whose worker died, however long they have
+been running. A worker that finds its lease was lost stops the handler.
+
+Configuration (environment variables):
+- JOBS_RUN_IN_PROCESS: Start a worker with the API process (default: "true")
+- JOBS_POLL_INTERVAL_SECONDS: Idle wait between polls (default: 1)
+- JOBS_MAX_ATTEMPTS: Attempts before a job is marked failed (default: 5)
+- JOBS_BACKOFF_SECONDS: Base retry delay, doubled per attempt (default: 5)
+- JOBS_LEASE_SECONDS: How long a running job is kept without a lease renewal (default: 60)
+"""
+
+import asyncio
+import json
+import os
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import db, metrics, models
+
+RUN_IN_PROCESS = os.getenv("JOBS_RUN_IN_PROCESS", "true").lower() == "true"
+POLL_INTERVAL_SECONDS = float(os.getenv("JOBS_POLL_INTERVAL_SECONDS", "1"))
+MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+BACKOFF_SECONDS = float(os.getenv("JOBS_BACKOFF_SECONDS", "5"))
+MAX_BACKOFF_SECONDS = 600
+LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+
+JobHandler = Callable[[dict, AsyncSession], Awaitable[None]]
+
+_handlers: Dict[str, JobHandler] = {}
+_failure_handlers: Dict[str, JobHandler] = {}
+
+
+class LeaseLostError(Exception):
+    """Raised when a running job's lease expired and it may have been requeued."""
+
+
+def handler(kind: str):
+    """Register an async function as the handler for a job kind."""
+    def register(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def failure_handler(kind: str):
+    """Register an async function to run when a job of this kind has failed for good."""
+    def register(func: JobHandler) -> JobHandler:
+        _failure_handlers[kind] = func
+        return func
+    return register
+
+
+async def _run_failure_handler(job: models.Job):
+    failure_handler = _failure_handlers.get(job.kind)
+    if failure_handler is None:
+        return
+    try:
+        async with db.AsyncSessionLocal() as handler_conn:
+            await failure_handler(json.loads(job.payload), handler_conn)
+    except Exception as e:
+        print(f"⚠️ Failure handler of job {job.id} ({job.kind}) raised: {str(e)}")
+
+
+async def enqueue(db_conn: AsyncSession, kind: str, payload: Optional[dict] = None, dedupe: bool = False) -> models.Job:
+    """
+    Add a job to the queue and commit.
+    With dedupe=True, an identical job that is still queued is returned instead.
+    """
+    payload_json = json.dumps(payload or {}, sort_keys=True)
+
+    if dedupe:
+        existing = await db_conn.scalar(select(models.Job).where(
+            models.Job.kind == kind,
+            models.Job.payload == payload_json,
+            models.Job.status == "queued"
+        ).limit(1))
+        if existing:
+            return existing
+
+    job = models.Job(kind=kind, payload=payload_json, max_attempts=MAX_ATTEMPTS)
+    db_conn.add(job)
+    await db_conn.commit()
+    return job
+
+
+def _lease_deadline() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)
+
+
+async def _claim_next_job(db_conn: AsyncSession) -> Optional[models.Job]:
+    """Atomically move the oldest runnable job to 'running'."""
+    while True:
+        candidate = await db_conn.scalar(select(models.Job).where(
+            models.Job.status == "queued",
+            models.Job.run_after <= datetime.utcnow()
+        ).order_by(models.Job.run_after, models.Job.id).limit(1))
+        if candidate is None:
+            return None
+
+        # Another worker may claim the same row; only one UPDATE will match
+        claimed = (await db_conn.execute(
+            update(models.Job)
+            .where(models.Job.id == candidate.id, models.Job.status == "queued")
+            .values(
+                status="running",
+                attempts=models.Job.attempts + 1,
+                updated_at=datetime.utcnow(),
+                lease_expires_at=_lease_deadline()
+            )
+        )).rowcount
+        await db_conn.commit()
+        if claimed:
+            await db_conn.refresh(candidate)
+            return candidate
+
+
+async def _requeue_expired_jobs(db_conn: AsyncSession):
+    """Requeue running jobs whose worker stopped renewing their lease."""
+    count = (await db_conn.execute(
+        update(models.Job)
+        .where(models.Job.status == "running", models.Job.lease_expires_at < datetime.utcnow())
+        .values(status="queued", run_after=datetime.utcnow(), lease_expires_at=None)
+    )).rowcount
+    await db_conn.commit()
+    if count:
+        print(f"♻️ Requeued {count} jobs with expired leases")
+
+
+async def _renew_lease(job_id: int):
+    """Extend a running job's lease until cancelled; returns if the lease was lost."""
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        try:
+            async with db.AsyncSessionLocal() as lease_conn:
+                renewed = (await lease_conn.execute(
+                    update(models.Job)
+                    .where(models.Job.id == job_id, models.Job.status == "running")
+                    .values(lease_expires_at=_lease_deadline())
+                )).rowcount
+                await lease_conn.commit()
+        except Exception as e:
+            # Keep trying; the lease only lapses after LEASE_SECONDS without a renewal
+            print(f"⚠️ Could not renew lease of job {job_id}: {str(e)}")
+            continue
+        if not renewed:
+            return
+
+
+async def _run_handler(job: models.Job, job_handler: JobHandler):
+    """Run a job's handler while renewing its lease; stop it if the lease is lost."""
+    # Handlers get their own session so a failure can't poison the job bookkeeping
+    async def run():
+        async with db.AsyncSessionLocal() as handler_conn:
+            await job_handler(json.loads(job.payload), handler_conn)
+
+    handler_task = asyncio.ensure_future(run())
+    lease_task = asyncio.ensure_future(_renew_lease(job.id))
+    try:
+        await asyncio.wait({handler_task, lease_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        lease_task.cancel()
+        if not handler_task.done():
+            handler_task.cancel()
+            await asyncio.gather(handler_task, return_exceptions=True)
+    if handler_task.cancelled():
+        raise LeaseLostError(f"Lease of job {job.id} expired while it was running")
+    handler_task.result()
+
+
+async def _run_job(job: models.Job, db_conn: AsyncSession):
+    job_handler = _handlers.get(job.kind)
+    try:
+        if job_handler is None:
+            raise ValueError(f"No handler registered for job kind '{job.kind}'")
+
+        caller_token = metrics.set_caller(f"job:{job.kind}")
+        try:
+            await _run_handler(job, job_handler)
+        finally:
+            metrics.reset_caller(caller_token)
+
+        job.status = "succeeded"
+        job.last_error = None
+        job.finished_at = datetime.utcnow()
+        print(f"✓ Job {job.id} ({job.kind}) succeeded")
+
+    except LeaseLostError as e:
+        # The job was requeued and belongs to whichever worker claims it next
+        print(f"⚠️ {str(e)}; leaving it to be retried")
+        await db_conn.rollback()
+        return
+
+    except Exception as e:
+        job.last_error = f"{str(e)}\n{traceback.format_exc()}"
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.finished_at = datetime.utcnow()
+            print(f"❌ Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {str(e)}")
+        else:
+            delay = min(BACKOFF_SECONDS * 2 ** (job.attempts - 1), MAX_BACKOFF_SECONDS)
+            job.status = "queued"
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            print(f"⚠️ Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay:.0f}s: {str(e)}")
+
+    job.lease_expires_at = None
+    await db_conn.commit()
+    if job.status == "failed":
+        await _run_failure_handler(job)
+
+
+async def run_pending_jobs(limit: Optional[int] = None) -> int:
+    """Run runnable jobs until the queue is empty (or `limit` is reached). Returns the count run."""
+    count = 0
+    async with db.AsyncSessionLocal() as db_conn:
+        while limit is None or count < limit:
+            job = await _claim_next_job(db_conn)
+            if job is None:
+                break
+            await _run_job(job, db_conn)
+            count += 1
+    return count
+
+
+async def run_worker(stop_event: Optional[asyncio.Event] = None):
+    """Poll for and run jobs until `stop_event` is set."""
+    stop_event = stop_event or asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    next_lease_check = loop.time()
+
+    print("👷 Job worker started")
+    while not stop_event.is_set():
+        try:
+            if loop.time() >= next_lease_check:
+                async with db.AsyncSessionLocal() as db_conn:
+                    await _requeue_expired_jobs(db_conn)
+                next_lease_check = loop.time() + LEASE_SECONDS / 3
+            ran = await run_pending_jobs()
+        except Exception as e:
+            print(f"Error polling job queue: {str(e)}")
+            ran = 0
+
+        if not ran:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    print("👷 Job worker stopped")
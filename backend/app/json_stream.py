@@ -0,0 +1,82 @@
+"""
+Incremental parsing of streamed JSON model output.
+
+The model streams a document like {"items": [{...}, {...}]} in arbitrary
+text chunks. ArrayItemParser picks out each element of the named array as
+soon as its closing brace arrives, so callers can act on it before the
+rest of the document has been generated.
+"""
+
+import json
+from typing import List
+
+
+class ArrayItemParser:
+    """Yield complete objects from a top-level array field of a streamed JSON document."""
+
+    def __init__(self, field: str):
+        self._key = json.dumps(field)
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Add a chunk of text and return any array items it completed."""
+        self._buffer += chunk
+        items = []
+
+        if not self._in_array and not self._done:
+            key_pos = self._buffer.find(self._key)
+            if key_pos == -1:
+                return items
+            bracket = self._buffer.find("[", key_pos + len(self._key))
+            if bracket == -1:
+                return items
+            self._in_array = True
+            self._pos = bracket + 1
+
+        while self._in_array and self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the array itself
+                    self._in_array = False
+                    self._done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        items.append(json.loads(self._buffer[self._item_start:self._pos + 1]))
+                        self._item_start = None
+
+            self._pos += 1
+
+        # Drop text that can no longer be part of an unfinished item
+        if self._in_array and self._item_start is None:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        return items
+
+    @property
+    def done(self) -> bool:
+        """True once the closing bracket of the array has been seen."""
+        return self._done
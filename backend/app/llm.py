@@ -0,0 +1,160 @@
+"""
+Shared gateway for all Gemini calls.
+
+Every router goes through this module instead of creating its own client.
+Calls use the SDK's async client so the event loop stays free while a
+generation is in flight, are capped by a process-wide concurrency limit,
+and are cancelled after a per-call timeout. Each call's latency, outcome
+and token usage are recorded in app.metrics.
+
+Configuration (environment variables):
+- GEMINI_API_KEY: API key for the Gemini client
+- GEMINI_MODEL: Model name (default: "gemini-2.5-flash")
+- GEMINI_MAX_CONCURRENCY: Max simultaneous LLM calls per process (default: 4)
+- GEMINI_TIMEOUT_SECONDS: Per-call timeout in seconds (default: 60)
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Optional
+
+from dotenv import load_dotenv
+from google import genai
+
+from app import metrics
+
+load_dotenv()
+
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+
+_client: Optional[genai.Client] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call does not finish within its timeout."""
+
+
+class LLMParseError(Exception):
+    """Raised when a structured generation returns no parseable JSON."""
+
+
+def get_client() -> genai.Client:
+    """Create the Gemini client on first use so importing the app needs no API key."""
+    global _client
+    if _client is None:
+        _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def generate_json(
+    prompt: str,
+    response_schema: dict,
+    model: str = DEFAULT_MODEL,
+    timeout: Optional[float] = None,
+) -> Any:
+    """
+    Run a structured (JSON) generation and return the parsed response.
+
+    Waits for a free concurrency slot, then awaits the async SDK call.
+    Raises LLMTimeoutError if the call exceeds `timeout` seconds
+    (GEMINI_TIMEOUT_SECONDS by default). Time spent waiting for a slot
+    does not count against the timeout.
+    """
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+
+    async with _get_semaphore():
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await asyncio.wait_for(
+                get_client().aio.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config={
+                        "response_mime_type": "application/json",
+                        "response_schema": response_schema,
+                    },
+                ),
+                timeout=timeout,
+            )
+            metrics.record_usage(model, response.usage_metadata)
+            if response.parsed is None:
+                outcome = "parse_error"
+                metrics.LLM_PARSE_FAILURES.labels(metrics.current_caller()).inc()
+                raise LLMParseError("LLM response did not contain the requested JSON")
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.0f}s")
+        finally:
+            metrics.LLM_CALL_DURATION.labels(metrics.current_caller(), model, "generate", outcome).observe(
+                time.perf_counter() - started
+            )
+
+    return response.parsed
+
+
+async def stream_json(
+    prompt: str,
+    response_schema: dict,
+    model: str = DEFAULT_MODEL,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """
+    Run a structured (JSON) generation and yield the raw text as it arrives.
+
+    Holds a concurrency slot for the whole stream. The timeout is a
+    deadline for the complete stream, not for each chunk.
+    """
+    timeout = TIMEOUT_SECONDS if timeout is None else timeout
+
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        started = time.perf_counter()
+        outcome = "error"
+        usage_metadata = None
+        try:
+            stream = await asyncio.wait_for(
+                get_client().aio.models.generate_content_stream(
+                    model=model,
+                    contents=prompt,
+                    config={
+                        "response_mime_type": "application/json",
+                        "response_schema": response_schema,
+                    },
+                ),
+                timeout=timeout,
+            )
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        stream.__anext__(), timeout=max(deadline - loop.time(), 0)
+                    )
+                except StopAsyncIteration:
+                    break
+                # Usage is reported on the final chunk(s)
+                usage_metadata = chunk.usage_metadata or usage_metadata
+                if chunk.text:
+                    yield chunk.text
+            outcome = "ok"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise LLMTimeoutError(f"LLM stream timed out after {timeout:.0f}s")
+        finally:
+            # Also reached when the consumer stops early (e.g. the client disconnected)
+            metrics.record_usage(model, usage_metadata)
+            metrics.LLM_CALL_DURATION.labels(metrics.current_caller(), model, "stream", outcome).observe(
+                time.perf_counter() - started
+            )
@@ -0,0 +1,149 @@
+"""
+Prometheus metrics for HTTP requests and LLM calls.
+
+MetricsMiddleware times every HTTP request under its route template (e.g.
+/api/quiz/{roadmap_item_id}) and records that route as the caller of any
+LLM call made while handling it; background jobs record "job:<kind>"
+instead. llm.py reports call durations, token usage and unparseable
+responses, prompts.py reports prompt sizes and context cut to fit the
+budget, and the routers report relationships they filter out. GET
+/metrics serves everything in the Prometheus text format.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by them so /metrics aggregates all of them (see the
+prometheus_client multiprocess docs).
+
+Configuration (environment variables):
+- PROMETHEUS_MULTIPROC_DIR: Directory for multi-process metrics (default: unset, single process)
+"""
+
+import os
+import time
+from contextvars import ContextVar, Token
+from typing import Tuple, Union
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# What LLM calls in this context are attributed to: a job name, or the
+# scope of the HTTP request being handled (its route is known once routed)
+_caller: ContextVar[Union[str, dict]] = ContextVar("llm_caller", default="unknown")
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency, until the last byte of the response is sent",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+LLM_CALL_DURATION = Histogram(
+    "llm_call_duration_seconds",
+    "LLM call latency, excluding time spent waiting for a concurrency slot",
+    ["caller", "model", "method", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120),
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens billed for LLM calls, by type (prompt, response, thoughts)",
+    ["caller", "model", "type"],
+)
+
+LLM_PARSE_FAILURES = Counter(
+    "llm_parse_failures_total",
+    "LLM responses that didn't contain the requested JSON",
+    ["caller"],
+)
+
+LLM_RELATIONSHIPS_FILTERED = Counter(
+    "llm_relationships_filtered_total",
+    "Relationships returned by the model but not turned into edges, by reason",
+    ["caller", "reason"],
+)
+
+PROMPT_ESTIMATED_TOKENS = Histogram(
+    "llm_prompt_estimated_tokens",
+    "Locally estimated prompt size, by prompt kind (see app/prompts.py)",
+    ["kind"],
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+
+PROMPT_ENTRIES_DROPPED = Counter(
+    "llm_prompt_entries_dropped_total",
+    "Context entries left out of prompts to stay within the token budget, by prompt kind and section",
+    ["kind", "section"],
+)
+
+
+def set_caller(name: str) -> Token:
+    """Attribute LLM calls in this context to `name`; pass the result to reset_caller()."""
+    return _caller.set(name)
+
+
+def reset_caller(token: Token) -> None:
+    _caller.reset(token)
+
+
+def current_caller() -> str:
+    value = _caller.get()
+    if isinstance(value, dict):
+        return f"{value['method']} {route_path(value)}"
+    return value
+
+
+def record_usage(model: str, usage_metadata) -> None:
+    """Count the tokens in a response's usage_metadata (if the SDK returned one)."""
+    if usage_metadata is None:
+        return
+    for token_type, count in (
+        ("prompt", usage_metadata.prompt_token_count),
+        ("response", usage_metadata.candidates_token_count),
+        ("thoughts", usage_metadata.thoughts_token_count),
+    ):
+        if count:
+            LLM_TOKENS.labels(current_caller(), model, token_type).inc(count)
+
+
+def route_path(scope: dict) -> str:
+    """Path template of the route that handled a request (set in the scope by routing)."""
+    # Unmatched paths share one label so scans can't blow up the series count
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing requests per route and naming the LLM caller."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _caller.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_DURATION.labels(scope["method"], route_path(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+            _caller.reset(token)
+
+
+def render() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with their content type."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
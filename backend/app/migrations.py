@@ -0,0 +1,519 @@
+"""
+Versioned schema migrations.
+
+Migrations are numbered functions registered with @migration; the
+schema_version table records which have been applied. Run pending ones
+with `python migrate.py` (see that script); the API and worker only check
+on startup that the database is current and refuse to start otherwise.
+
+Every migration spells out the schema it creates as DDL, and the data it
+writes as SQL, frozen at the time it was written, never the current
+models, so a fresh database goes through the same history as an old one. Migration 1 creates the schema
+that existed before migrations did (databases of that era already have
+it). Migrations must still be idempotent (check before altering, use IF
+NOT EXISTS / IF EXISTS) because a run can be interrupted between a
+change and its schema_version record.
+
+By default a migration runs in one transaction and receives a
+Connection. Long data changes should use transactional=False, receive the
+Engine, and go through backfill(), which commits in small batches so
+other writers aren't locked out for the whole run.
+
+Configuration (environment variables):
+- MIGRATION_BATCH_SIZE: Rows per backfill batch (default: 1000)
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, func, inspect, insert, text
+from sqlalchemy.engine import Connection, Engine
+
+from app import models
+
+BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "1000"))
+BATCH_PAUSE_SECONDS = 0.01  # let other writers in between batches
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # how SQLAlchemy stores DateTime in SQLite
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    func: Callable
+    transactional: bool
+
+
+_migrations: Dict[int, Migration] = {}
+
+
+def migration(version: int, description: str, transactional: bool = True):
+    """Register a migration function under a version number."""
+    def register(func: Callable) -> Callable:
+        if version in _migrations:
+            raise ValueError(f"Duplicate migration version {version}")
+        _migrations[version] = Migration(version, description, func, transactional)
+        return func
+    return register
+
+
+def latest_version() -> int:
+    return max(_migrations) if _migrations else 0
+
+
+def current_version(db_engine: Engine) -> int:
+    """Highest applied migration (0 for a database that has never been migrated)."""
+    if not inspect(db_engine).has_table(models.SchemaVersion.__tablename__):
+        return 0
+    with db_engine.connect() as conn:
+        return conn.execute(func.max(models.SchemaVersion.version).select()).scalar() or 0
+
+
+def check_current(db_engine: Engine):
+    """Raise if the database is missing migrations. Cheap enough to run at startup."""
+    current, latest = current_version(db_engine), latest_version()
+    if current < latest:
+        raise RuntimeError(
+            f"Database schema is at version {current}, code expects {latest}. "
+            "Run `python migrate.py` first."
+        )
+
+
+def pending(db_engine: Engine) -> List[Migration]:
+    models.SchemaVersion.__table__.create(db_engine, checkfirst=True)
+    with db_engine.connect() as conn:
+        applied = {row.version for row in conn.execute(models.SchemaVersion.__table__.select())}
+    return [_migrations[version] for version in sorted(_migrations) if version not in applied]
+
+
+def upgrade(db_engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations in order, up to `target` if given. Returns the versions applied."""
+    applied = []
+    for step in pending(db_engine):
+        if target is not None and step.version > target:
+            break
+        print(f"⬆️ Applying migration {step.version}: {step.description}")
+        started = time.monotonic()
+        record = insert(models.SchemaVersion).values(version=step.version, description=step.description)
+        if step.transactional:
+            with db_engine.begin() as conn:
+                step.func(conn)
+                conn.execute(record)
+        else:
+            step.func(db_engine)
+            with db_engine.begin() as conn:
+                conn.execute(record)
+        applied.append(step.version)
+        print(f"✓ Migration {step.version} applied in {time.monotonic() - started:.1f}s")
+    return applied
+
+
+def backfill(db_engine: Engine, statement: str, batch_size: int = None, **params) -> int:
+    """
+    Run a data change in batches, one transaction each, until it touches no rows.
+
+    `statement` must handle at most :batch_size rows per run and skip rows
+    already done, e.g.
+        UPDATE t SET x = ... WHERE id IN (SELECT id FROM t WHERE x IS NULL LIMIT :batch_size)
+    Returns the total row count.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    total = 0
+    while True:
+        with db_engine.begin() as conn:
+            count = conn.execute(text(statement), {"batch_size": batch_size, **params}).rowcount
+        total += count
+        if count < batch_size:
+            return total
+        time.sleep(BATCH_PAUSE_SECONDS)
+
+
+def create_index(conn: Connection, name: str, table: str, columns: List[str], unique: bool = False):
+    """CREATE [UNIQUE] INDEX IF NOT EXISTS."""
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    conn.execute(text(
+        f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})'
+    ))
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+# Schema before versioned migrations: tables that create_all() made at import
+BASELINE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS roadmaps (
+        id INTEGER NOT NULL, user_id VARCHAR, topic VARCHAR, experience TEXT, created_at VARCHAR,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_roadmaps_id ON roadmaps (id)",
+    "CREATE INDEX IF NOT EXISTS ix_roadmaps_topic ON roadmaps (topic)",
+    "CREATE INDEX IF NOT EXISTS ix_roadmaps_user_id ON roadmaps (user_id)",
+    """CREATE TABLE IF NOT EXISTS roadmap_items (
+        id INTEGER NOT NULL, roadmap_id INTEGER, title VARCHAR, summary TEXT, level INTEGER, study_material VARCHAR,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_roadmap_items_id ON roadmap_items (id)",
+    "CREATE INDEX IF NOT EXISTS ix_roadmap_items_roadmap_id ON roadmap_items (roadmap_id)",
+    """CREATE TABLE IF NOT EXISTS quiz_questions (
+        id INTEGER NOT NULL, roadmap_item_id INTEGER, question TEXT, options VARCHAR, correct INTEGER,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_questions_id ON quiz_questions (id)",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_questions_roadmap_item_id ON quiz_questions (roadmap_item_id)",
+    """CREATE TABLE IF NOT EXISTS knowledge_graph_nodes (
+        id VARCHAR NOT NULL, label VARCHAR, node_type VARCHAR, roadmap_id INTEGER, "group" INTEGER, created_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_knowledge_graph_nodes_roadmap_id ON knowledge_graph_nodes (roadmap_id)",
+    """CREATE TABLE IF NOT EXISTS knowledge_graph_edges (
+        id INTEGER NOT NULL, source VARCHAR, target VARCHAR, weight FLOAT, relationship VARCHAR, created_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_knowledge_graph_edges_id ON knowledge_graph_edges (id)",
+    "CREATE INDEX IF NOT EXISTS ix_knowledge_graph_edges_source ON knowledge_graph_edges (source)",
+    "CREATE INDEX IF NOT EXISTS ix_knowledge_graph_edges_target ON knowledge_graph_edges (target)",
+    """CREATE TABLE IF NOT EXISTS quiz_progress (
+        id INTEGER NOT NULL, user_id VARCHAR, roadmap_item_id INTEGER, completed_at DATETIME,
+        score INTEGER, total_questions INTEGER,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_progress_id ON quiz_progress (id)",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_progress_roadmap_item_id ON quiz_progress (roadmap_item_id)",
+    "CREATE INDEX IF NOT EXISTS ix_quiz_progress_user_id ON quiz_progress (user_id)",
+    """CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id VARCHAR NOT NULL, total_unlocks INTEGER, turtle_phase INTEGER, turtle_visible BOOLEAN,
+        last_discovery_at INTEGER, created_at DATETIME, updated_at DATETIME,
+        PRIMARY KEY (user_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_user_profiles_user_id ON user_profiles (user_id)",
+    """CREATE TABLE IF NOT EXISTS roadmap_cache (
+        id INTEGER NOT NULL, topic_key VARCHAR, experience_key VARCHAR, roadmap_id INTEGER,
+        hit_count INTEGER, created_at DATETIME, last_used_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_roadmap_cache_id ON roadmap_cache (id)",
+    "CREATE INDEX IF NOT EXISTS ix_roadmap_cache_roadmap_id ON roadmap_cache (roadmap_id)",
+    "CREATE INDEX IF NOT EXISTS ix_roadmap_cache_topic_key ON roadmap_cache (topic_key)",
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER NOT NULL, kind VARCHAR, payload TEXT, status VARCHAR, attempts INTEGER, max_attempts INTEGER,
+        run_after DATETIME, last_error TEXT, created_at DATETIME, updated_at DATETIME, finished_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_id ON jobs (id)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_kind ON jobs (kind)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_run_after ON jobs (run_after)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)",
+    """CREATE TABLE IF NOT EXISTS graph_rebuilds (
+        id INTEGER NOT NULL, status VARCHAR, nodes_built BOOLEAN, blocks TEXT, pairs TEXT, total_pairs INTEGER,
+        completed_pairs INTEGER, created_at DATETIME, updated_at DATETIME, finished_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_graph_rebuilds_id ON graph_rebuilds (id)",
+    "CREATE INDEX IF NOT EXISTS ix_graph_rebuilds_status ON graph_rebuilds (status)",
+    """CREATE TABLE IF NOT EXISTS graph_rebuild_pairs (
+        id INTEGER NOT NULL, rebuild_id INTEGER, block_a INTEGER, block_b INTEGER, edge_count INTEGER,
+        completed_at DATETIME,
+        PRIMARY KEY (id),
+        UNIQUE (rebuild_id, block_a, block_b)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_graph_rebuild_pairs_id ON graph_rebuild_pairs (id)",
+    "CREATE INDEX IF NOT EXISTS ix_graph_rebuild_pairs_rebuild_id ON graph_rebuild_pairs (rebuild_id)",
+    """CREATE TABLE IF NOT EXISTS idempotency_keys (
+        "key" VARCHAR NOT NULL, endpoint VARCHAR, request_hash VARCHAR, response TEXT, created_at DATETIME,
+        PRIMARY KEY ("key")
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_idempotency_keys_created_at ON idempotency_keys (created_at)",
+    """CREATE TABLE IF NOT EXISTS graph_changes (
+        id INTEGER NOT NULL, op VARCHAR, kind VARCHAR, entity_id VARCHAR, data TEXT, created_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_graph_changes_id ON graph_changes (id)",
+    """CREATE TABLE IF NOT EXISTS graph_layouts (
+        id INTEGER NOT NULL, version INTEGER, positions TEXT, node_count INTEGER, relaxed_count INTEGER,
+        created_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_graph_layouts_id ON graph_layouts (id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_graph_layouts_version ON graph_layouts (version)",
+]
+
+
+@migration(1, "Create baseline tables")
+def create_tables(conn: Connection):
+    for statement in BASELINE_SCHEMA:
+        conn.execute(text(statement))
+
+
+@migration(2, "Drop legacy knowledge_graph_cache table")
+def drop_graph_cache(conn: Connection):
+    # Replaced by persistent knowledge_graph_nodes/edges
+    had_cache = inspect(conn).has_table("knowledge_graph_cache")
+    conn.execute(text("DROP TABLE IF EXISTS knowledge_graph_cache"))
+
+    # Databases coming from the cache-based graph need the graph built once
+    roadmaps = conn.execute(text("SELECT COUNT(*) FROM roadmaps")).scalar()
+    nodes = conn.execute(text("SELECT COUNT(*) FROM knowledge_graph_nodes")).scalar()
+    if had_cache and roadmaps and not nodes:
+        now = datetime.utcnow().strftime(DATETIME_FORMAT)
+        conn.execute(text("""
+            INSERT INTO jobs (kind, payload, status, attempts, max_attempts, run_after, created_at, updated_at)
+            VALUES ('graph.rebuild', '{}', 'queued', 0, 5, :now, :now, :now)
+        """), {"now": now})
+        print("   Queued a knowledge graph rebuild")
+
+
+# Tables gaining foreign keys, parents first: the condition a row must meet
+# to be kept, and the table and indexes as recreated with their constraints
+FOREIGN_KEY_TABLES = [
+    ("roadmap_items", "roadmap_id IN (SELECT id FROM roadmaps)", [
+        """CREATE TABLE roadmap_items (
+            id INTEGER NOT NULL, roadmap_id INTEGER, title VARCHAR, summary TEXT, level INTEGER, study_material VARCHAR,
+            PRIMARY KEY (id),
+            FOREIGN KEY(roadmap_id) REFERENCES roadmaps (id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX ix_roadmap_items_id ON roadmap_items (id)",
+        "CREATE INDEX ix_roadmap_items_roadmap_id ON roadmap_items (roadmap_id)",
+    ]),
+    ("quiz_questions", "roadmap_item_id IN (SELECT id FROM roadmap_items)", [
+        """CREATE TABLE quiz_questions (
+            id INTEGER NOT NULL, roadmap_item_id INTEGER, question TEXT, options VARCHAR, correct INTEGER,
+            PRIMARY KEY (id),
+            FOREIGN KEY(roadmap_item_id) REFERENCES roadmap_items (id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX ix_quiz_questions_id ON quiz_questions (id)",
+        "CREATE INDEX ix_quiz_questions_roadmap_item_id ON quiz_questions (roadmap_item_id)",
+    ]),
+    ("quiz_progress", "roadmap_item_id IN (SELECT id FROM roadmap_items)", [
+        """CREATE TABLE quiz_progress (
+            id INTEGER NOT NULL, user_id VARCHAR, roadmap_item_id INTEGER, completed_at DATETIME,
+            score INTEGER, total_questions INTEGER,
+            PRIMARY KEY (id),
+            FOREIGN KEY(roadmap_item_id) REFERENCES roadmap_items (id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX ix_quiz_progress_id ON quiz_progress (id)",
+        "CREATE INDEX ix_quiz_progress_roadmap_item_id ON quiz_progress (roadmap_item_id)",
+        "CREATE INDEX ix_quiz_progress_user_id ON quiz_progress (user_id)",
+    ]),
+    ("roadmap_cache", "roadmap_id IN (SELECT id FROM roadmaps)", [
+        """CREATE TABLE roadmap_cache (
+            id INTEGER NOT NULL, topic_key VARCHAR, experience_key VARCHAR, roadmap_id INTEGER,
+            hit_count INTEGER, created_at DATETIME, last_used_at DATETIME,
+            PRIMARY KEY (id),
+            FOREIGN KEY(roadmap_id) REFERENCES roadmaps (id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX ix_roadmap_cache_id ON roadmap_cache (id)",
+        "CREATE INDEX ix_roadmap_cache_roadmap_id ON roadmap_cache (roadmap_id)",
+        "CREATE INDEX ix_roadmap_cache_topic_key ON roadmap_cache (topic_key)",
+    ]),
+    ("knowledge_graph_nodes", "roadmap_id IN (SELECT id FROM roadmaps)", [
+        """CREATE TABLE knowledge_graph_nodes (
+            id VARCHAR NOT NULL, label VARCHAR, node_type VARCHAR, roadmap_id INTEGER, "group" INTEGER, created_at DATETIME,
+            PRIMARY KEY (id),
+            FOREIGN KEY(roadmap_id) REFERENCES roadmaps (id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX ix_knowledge_graph_nodes_roadmap_id ON knowledge_graph_nodes (roadmap_id)",
+    ]),
+    (
+        "knowledge_graph_edges",
+        "source IN (SELECT id FROM knowledge_graph_nodes) AND target IN (SELECT id FROM knowledge_graph_nodes)",
+        [
+            """CREATE TABLE knowledge_graph_edges (
+                id INTEGER NOT NULL, source VARCHAR, target VARCHAR, weight FLOAT, relationship VARCHAR, created_at DATETIME,
+                PRIMARY KEY (id),
+                FOREIGN KEY(source) REFERENCES knowledge_graph_nodes (id) ON DELETE CASCADE,
+                FOREIGN KEY(target) REFERENCES knowledge_graph_nodes (id) ON DELETE CASCADE
+            )""",
+            "CREATE INDEX ix_knowledge_graph_edges_id ON knowledge_graph_edges (id)",
+            "CREATE INDEX ix_knowledge_graph_edges_source ON knowledge_graph_edges (source)",
+            "CREATE INDEX ix_knowledge_graph_edges_target ON knowledge_graph_edges (target)",
+        ]
+    ),
+]
+
+
+@migration(3, "Add foreign keys with ON DELETE CASCADE", transactional=False)
+def add_foreign_keys(db_engine: Engine):
+    """
+    SQLite can't add constraints to existing tables, so each table created
+    before foreign keys existed is rebuilt: renamed aside, recreated with
+    its constraints and refilled, dropping orphaned rows on the way.
+    """
+    inspector = inspect(db_engine)
+    tables = [
+        (name, keep, statements) for name, keep, statements in FOREIGN_KEY_TABLES
+        if not inspector.get_foreign_keys(name)
+    ]
+    if not tables:
+        return
+
+    connection = db_engine.raw_connection()
+    try:
+        sqlite = connection.driver_connection
+        sqlite.isolation_level = None  # explicit BEGIN/COMMIT below
+        cursor = sqlite.cursor()
+        # Constraints must be off while tables are swapped; renames must not rewrite references
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        cursor.execute("PRAGMA legacy_alter_table=ON")
+        cursor.execute("BEGIN")
+        try:
+            for name, keep, statements in tables:
+                old_name = f"{name}_old"
+                old_columns = [column["name"] for column in inspector.get_columns(name)]
+                columns = ", ".join(f'"{column}"' for column in old_columns)
+
+                for index in inspector.get_indexes(name):
+                    cursor.execute(f'DROP INDEX IF EXISTS "{index["name"]}"')
+                cursor.execute(f'ALTER TABLE "{name}" RENAME TO "{old_name}"')
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM "{old_name}" WHERE {keep}')
+                dropped = cursor.execute(f'SELECT COUNT(*) FROM "{old_name}"').fetchone()[0] - cursor.execute(
+                    f'SELECT COUNT(*) FROM "{name}"'
+                ).fetchone()[0]
+                cursor.execute(f'DROP TABLE "{old_name}"')
+                print(f"   Rebuilt {name} ({dropped} orphaned rows dropped)")
+
+            violations = cursor.execute("PRAGMA foreign_key_check").fetchall()
+            if violations:
+                raise RuntimeError(f"Foreign key check failed: {violations[:5]}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.execute("PRAGMA legacy_alter_table=OFF")
+            cursor.execute("PRAGMA foreign_keys=ON")
+    finally:
+        connection.close()
+
+
+@migration(4, "Add roadmap_progress summaries")
+def add_roadmap_progress(conn: Connection):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS roadmap_progress (
+        user_id VARCHAR NOT NULL, roadmap_id INTEGER NOT NULL, level_items TEXT, level_completed TEXT,
+        completed_item_ids TEXT, updated_at DATETIME,
+        PRIMARY KEY (user_id, roadmap_id),
+        FOREIGN KEY(roadmap_id) REFERENCES roadmaps (id) ON DELETE CASCADE
+    )"""))
+    create_index(conn, "ix_roadmap_progress_roadmap_id", "roadmap_progress", ["roadmap_id"])
+    if conn.execute(text("SELECT COUNT(*) FROM roadmap_progress")).scalar():
+        return
+
+    # Summarize existing progress per (user, roadmap)
+    completed: Dict[tuple, set] = {}
+    for user_id, item_id, roadmap_id in conn.execute(text("""
+        SELECT quiz_progress.user_id, quiz_progress.roadmap_item_id, roadmap_items.roadmap_id
+        FROM quiz_progress JOIN roadmap_items ON roadmap_items.id = quiz_progress.roadmap_item_id
+        WHERE quiz_progress.score = quiz_progress.total_questions
+    """)):
+        completed.setdefault((user_id, roadmap_id), set()).add(item_id)
+    if not completed:
+        return
+
+    items: Dict[int, List[tuple]] = {}
+    for item_id, level, roadmap_id in conn.execute(
+        text("SELECT id, level, roadmap_id FROM roadmap_items WHERE roadmap_id IN :roadmap_ids").bindparams(
+            bindparam("roadmap_ids", expanding=True)
+        ),
+        {"roadmap_ids": sorted({roadmap_id for _, roadmap_id in completed})}
+    ):
+        items.setdefault(roadmap_id, []).append((item_id, level))
+
+    # Summary format of this version: JSON text, item and completion counts keyed by level as a string
+    summaries = []
+    for (user_id, roadmap_id), item_ids in completed.items():
+        level_items: Dict[str, int] = {}
+        level_completed: Dict[str, int] = {}
+        for item_id, level in items[roadmap_id]:
+            level_items[str(level)] = level_items.get(str(level), 0) + 1
+            level_completed[str(level)] = level_completed.get(str(level), 0) + (item_id in item_ids)
+        summaries.append({
+            "user_id": user_id,
+            "roadmap_id": roadmap_id,
+            "level_items": json.dumps(level_items),
+            "level_completed": json.dumps(level_completed),
+            "completed_item_ids": json.dumps(sorted(item_ids)),
+            "updated_at": datetime.utcnow().strftime(DATETIME_FORMAT)
+        })
+    conn.execute(text("""
+        INSERT INTO roadmap_progress (user_id, roadmap_id, level_items, level_completed, completed_item_ids, updated_at)
+        VALUES (:user_id, :roadmap_id, :level_items, :level_completed, :completed_item_ids, :updated_at)
+    """), summaries)
+    print(f"   Summarized progress for {len(completed)} (user, roadmap) pairs")
+
+
+@migration(5, "Make quiz_progress unique per (user_id, roadmap_item_id)", transactional=False)
+def unique_quiz_progress(db_engine: Engine):
+    # Keep the newest of any duplicate rows left by concurrent completions
+    removed = backfill(db_engine, """
+        DELETE FROM quiz_progress WHERE id IN (
+            SELECT id FROM quiz_progress AS older WHERE EXISTS (
+                SELECT 1 FROM quiz_progress AS newer
+                WHERE newer.user_id = older.user_id
+                  AND newer.roadmap_item_id = older.roadmap_item_id
+                  AND newer.id > older.id
+            )
+            LIMIT :batch_size
+        )
+    """)
+    if removed:
+        print(f"   Removed {removed} duplicate quiz_progress rows")
+    with db_engine.begin() as conn:
+        create_index(conn, "ix_quiz_progress_user_item", "quiz_progress", ["user_id", "roadmap_item_id"], unique=True)
+
+
+# JSON list columns that were written as text by json.dumps()
+JSON_LIST_COLUMNS = [("roadmap_items", "study_material"), ("quiz_questions", "options")]
+
+
+@migration(6, "Store study_material and options as JSON", transactional=False)
+def json_list_columns(db_engine: Engine):
+    """
+    The columns are now sqlalchemy.JSON. SQLite keeps JSON as text, which
+    is what the old String columns already held, so the tables keep their
+    declared types and only values that wouldn't decode to a list are
+    reset to an empty one.
+    """
+    for table, column in JSON_LIST_COLUMNS:
+        fixed = backfill(db_engine, f"""
+            UPDATE "{table}" SET "{column}" = '[]' WHERE id IN (
+                SELECT id FROM "{table}"
+                WHERE CASE WHEN json_valid("{column}") THEN json_type("{column}") != 'array' ELSE 1 END
+                LIMIT :batch_size
+            )
+        """)
+        if fixed:
+            print(f"   Reset {fixed} {table}.{column} values that weren't JSON lists")
+
+
+@migration(7, "Add discovery_cache table")
+def add_discovery_cache(conn: Connection):
+    conn.execute(text("""CREATE TABLE IF NOT EXISTS discovery_cache (
+        user_id VARCHAR NOT NULL, milestone INTEGER NOT NULL, response TEXT, created_at DATETIME,
+        PRIMARY KEY (user_id, milestone)
+    )"""))
+
+
+@migration(8, "Add jobs.lease_expires_at")
+def add_job_leases(conn: Connection):
+    if "lease_expires_at" not in {column["name"] for column in inspect(conn).get_columns("jobs")}:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN lease_expires_at DATETIME"))
+
+
+@migration(9, "Assign roadmaps without an owner to default_user", transactional=False)
+def backfill_roadmap_owners(db_engine: Engine):
+    """
+    Roadmaps created before requests carried a user_id have none, so
+    per-user listings such as /api/progress/roadmaps skipped them. They
+    were all made through the single-user API, i.e. by default_user.
+    """
+    assigned = backfill(db_engine, """
+        UPDATE roadmaps SET user_id = 'default_user' WHERE id IN (
+            SELECT id FROM roadmaps WHERE user_id IS NULL LIMIT :batch_size
+        )
+    """)
+    if assigned:
+        print(f"   Assigned {assigned} roadmaps to default_user")
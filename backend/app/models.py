@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, Text, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Float, Text, DateTime, ForeignKey, Index, JSON, UniqueConstraint
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 
@@ -17,19 +17,19 @@ class RoadmapItem(Base):
     __tablename__ = "roadmap_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    roadmap_id = Column(Integer, index=True)
+    roadmap_id = Column(Integer, ForeignKey("roadmaps.id", ondelete="CASCADE"), index=True)
     title = Column(String)
     summary = Column(Text)
     level = Column(Integer)
-    study_material = Column(String)  # JSON string
+    study_material = Column(JSON)  # list of links
     
 class QuizQuestion(Base):
     __tablename__ = "quiz_questions"
     
     id = Column(Integer, primary_key=True, index=True)
-    roadmap_item_id = Column(Integer, index=True)
+    roadmap_item_id = Column(Integer, ForeignKey("roadmap_items.id", ondelete="CASCADE"), index=True)
     question = Column(Text)
-    options = Column(String)  # JSON string
+    options = Column(JSON)  # list of answer strings
     correct = Column(Integer)
 
 class KnowledgeGraphNode(Base):
@@ -38,7 +38,7 @@ class KnowledgeGraphNode(Base):
     id = Column(String, primary_key=True)  # e.g., "topic_1" or "title_5"
     label = Column(String)
     node_type = Column(String)  # "topic" or "title"
-    roadmap_id = Column(Integer, index=True)
+    roadmap_id = Column(Integer, ForeignKey("roadmaps.id", ondelete="CASCADE"), index=True)
     group = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -46,18 +46,20 @@ class KnowledgeGraphEdge(Base):
     __tablename__ = "knowledge_graph_edges"
     
     id = Column(Integer, primary_key=True, index=True)
-    source = Column(String, index=True)
-    target = Column(String, index=True)
+    source = Column(String, ForeignKey("knowledge_graph_nodes.id", ondelete="CASCADE"), index=True)
+    target = Column(String, ForeignKey("knowledge_graph_nodes.id", ondelete="CASCADE"), index=True)
     weight = Column(Float, default=1.0)
     relationship = Column(String, default="related")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class QuizProgress(Base):
     __tablename__ = "quiz_progress"
+    # One row per user and item; completions are upserted against this index
+    __table_args__ = (Index("ix_quiz_progress_user_item", "user_id", "roadmap_item_id", unique=True),)
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, index=True, default="default_user")
-    roadmap_item_id = Column(Integer, index=True)
+    roadmap_item_id = Column(Integer, ForeignKey("roadmap_items.id", ondelete="CASCADE"), index=True)
     completed_at = Column(DateTime, default=datetime.utcnow)
     score = Column(Integer)
     total_questions = Column(Integer)
@@ -72,3 +74,111 @@ class UserProfile(Base):
     last_discovery_at = Column(Integer, default=0)  # unlock count when last discovery was shown
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RoadmapProgress(Base):
+    __tablename__ = "roadmap_progress"
+
+    # Summary of one user's QuizProgress on one roadmap, kept current by /api/progress/complete
+    user_id = Column(String, primary_key=True)
+    roadmap_id = Column(Integer, ForeignKey("roadmaps.id", ondelete="CASCADE"), primary_key=True, index=True)
+    level_items = Column(JSON)  # level (as a string key) -> number of items
+    level_completed = Column(JSON)  # level (as a string key) -> number of items completed
+    completed_item_ids = Column(JSON)  # list of completed item ids
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class RoadmapCacheEntry(Base):
+    __tablename__ = "roadmap_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    topic_key = Column(String, index=True)  # normalized topic
+    experience_key = Column(String)  # normalized experience
+    roadmap_id = Column(Integer, ForeignKey("roadmaps.id", ondelete="CASCADE"), index=True)  # generated roadmap served on hits
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+class DiscoveryCacheEntry(Base):
+    __tablename__ = "discovery_cache"
+
+    # Topic suggestions for one user at one discovery milestone (every 3 unlocks)
+    user_id = Column(String, primary_key=True)
+    milestone = Column(Integer, primary_key=True)  # total_unlocks the suggestions are for
+    response = Column(Text)  # JSON string of the /discover response
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, index=True)  # e.g. "graph.add_roadmap"
+    payload = Column(Text)  # JSON string
+    status = Column(String, index=True, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_after = Column(DateTime, default=datetime.utcnow, index=True)  # not picked up before this time
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    lease_expires_at = Column(DateTime)  # while running: requeued if the worker stops renewing by then
+    finished_at = Column(DateTime)
+
+class GraphRebuild(Base):
+    __tablename__ = "graph_rebuilds"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, index=True, default="running")  # running (or interrupted), succeeded, failed, superseded
+    nodes_built = Column(Boolean, default=False)  # graph wiped and nodes recreated
+    blocks = Column(Text)  # JSON list of blocks, each a list of roadmap ids
+    pairs = Column(Text)  # JSON list of [block_a, block_b] pairs to analyze
+    total_pairs = Column(Integer, default=0)
+    completed_pairs = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class GraphRebuildPair(Base):
+    __tablename__ = "graph_rebuild_pairs"
+    __table_args__ = (UniqueConstraint("rebuild_id", "block_a", "block_b"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    rebuild_id = Column(Integer, index=True)
+    block_a = Column(Integer)
+    block_b = Column(Integer)
+    edge_count = Column(Integer, default=0)
+    completed_at = Column(DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String, primary_key=True)  # client-supplied Idempotency-Key header
+    endpoint = Column(String)
+    request_hash = Column(String)  # SHA256 of the request parameters
+    response = Column(Text)  # JSON string
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class GraphChange(Base):
+    __tablename__ = "graph_changes"
+    
+    id = Column(Integer, primary_key=True, index=True)  # graph version after this change
+    op = Column(String)  # "add", "remove" or "reset"
+    kind = Column(String)  # "node" or "edge" (empty for reset)
+    entity_id = Column(String)  # node id or edge id
+    data = Column(Text)  # JSON string of the added node/edge
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class GraphLayout(Base):
+    __tablename__ = "graph_layouts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, unique=True, index=True)  # graph version the layout was computed for
+    positions = Column(Text)  # JSON object: node id -> [x, y]
+    node_count = Column(Integer, default=0)
+    relaxed_count = Column(Integer, default=0)  # nodes moved when computing this layout
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+    
+    version = Column(Integer, primary_key=True)  # migration number (see app/migrations.py)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
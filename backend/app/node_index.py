@@ -0,0 +1,113 @@
+"""
+Vector index over knowledge-graph title nodes.
+
+Used to pick which existing nodes a new roadmap's titles are compared
+against, so the linking prompt stays bounded as the graph grows. Each
+node is embedded from its label plus its roadmap item summary.
+
+The index is built from the database on first use and kept current by
+add_nodes()/remove_roadmap(); if the node count in the database no longer
+matches (e.g. another process changed the graph) it is rebuilt.
+
+Configuration (environment variables):
+- GRAPH_LINK_CANDIDATES_K: Nearest existing nodes kept per new node (default: 8)
+"""
+
+import os
+from typing import List, Set
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.embeddings import VECTOR_DIM, embed_text, embed_texts
+
+CANDIDATES_PER_NODE = int(os.getenv("GRAPH_LINK_CANDIDATES_K", "8"))
+
+_node_ids: List[str] = []
+_roadmap_ids = np.zeros(0, dtype=np.int64)
+_vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+_loaded = False
+
+
+def node_text(label: str, summary: str = None) -> str:
+    """Text embedded for a title node."""
+    return f"{label} {summary or ''}"
+
+
+def _item_id(node_id: str) -> int:
+    return int(node_id.split("_", 1)[1])
+
+
+async def _load(db_conn: AsyncSession):
+    global _node_ids, _roadmap_ids, _vectors, _loaded
+    nodes = (await db_conn.scalars(select(models.KnowledgeGraphNode).where(
+        models.KnowledgeGraphNode.node_type == "title"
+    ))).all()
+    summaries = dict((await db_conn.execute(
+        select(models.RoadmapItem.id, models.RoadmapItem.summary).where(
+            models.RoadmapItem.id.in_([_item_id(node.id) for node in nodes])
+        )
+    )).all()) if nodes else {}
+
+    _node_ids = [node.id for node in nodes]
+    _roadmap_ids = np.array([node.roadmap_id for node in nodes], dtype=np.int64)
+    _vectors = embed_texts([node_text(node.label, summaries.get(_item_id(node.id))) for node in nodes])
+    _loaded = True
+    print(f"✓ Node index built: {len(_node_ids)} title nodes")
+
+
+async def _ensure_current(db_conn: AsyncSession):
+    if _loaded:
+        db_count = await db_conn.scalar(select(func.count(models.KnowledgeGraphNode.id)).where(
+            models.KnowledgeGraphNode.node_type == "title"
+        ))
+        if db_count == len(_node_ids):
+            return
+    await _load(db_conn)
+
+
+async def nearest_candidates(db_conn: AsyncSession, texts: List[str], exclude_roadmap_id: int, k: int = None) -> Set[str]:
+    """
+    Return ids of existing title nodes most similar to any of `texts`:
+    the top-k per text, excluding nodes of `exclude_roadmap_id`.
+    """
+    k = CANDIDATES_PER_NODE if k is None else k
+    await _ensure_current(db_conn)
+
+    eligible = np.flatnonzero(_roadmap_ids != exclude_roadmap_id)
+    if eligible.size == 0 or not texts:
+        return set()
+
+    scores = embed_texts(texts) @ _vectors[eligible].T
+    k = min(k, eligible.size)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return {_node_ids[eligible[i]] for i in np.unique(top)}
+
+
+def add_nodes(node_ids: List[str], texts: List[str], roadmap_id: int):
+    """Add newly created title nodes to the index."""
+    global _node_ids, _roadmap_ids, _vectors
+    if not _loaded or not node_ids:
+        return
+    _node_ids = _node_ids + list(node_ids)
+    _roadmap_ids = np.concatenate([_roadmap_ids, np.full(len(node_ids), roadmap_id, dtype=np.int64)])
+    _vectors = np.vstack([_vectors] + [embed_text(text)[None, :] for text in texts])
+
+
+def remove_roadmap(roadmap_id: int):
+    """Drop every node belonging to a roadmap from the index."""
+    global _node_ids, _roadmap_ids, _vectors
+    if not _loaded:
+        return
+    keep = np.flatnonzero(_roadmap_ids != roadmap_id)
+    _node_ids = [_node_ids[i] for i in keep]
+    _roadmap_ids = _roadmap_ids[keep]
+    _vectors = _vectors[keep]
+
+
+def reset():
+    """Forget the index; it is rebuilt from the database on next use."""
+    global _loaded
+    _loaded = False
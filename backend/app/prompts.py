@@ -0,0 +1,107 @@
+"""
+Token-budgeted prompt construction.
+
+Prompts that embed user history or graph nodes would otherwise grow with
+the data until calls get slow, expensive, or fail on the context limit.
+build() fills a prompt template within a fixed token budget per prompt
+kind: the caller passes each context section as a list ranked most
+relevant first, sections are filled in order, and each keeps the leading
+entries that fit in what the budget has left. Sections are embedded as
+compact JSON.
+
+Token counts are a local estimate (no tokenizer call): the larger of the
+number of word and punctuation pieces and a quarter of the characters,
+which errs on the high side for English text and JSON.
+
+Configuration (environment variables):
+- PROMPT_TOKEN_BUDGET_DISCOVERY: Token budget for topic discovery prompts (default: 1500)
+- PROMPT_TOKEN_BUDGET_GRAPH_LINK: Token budget for relationship analysis prompts (default: 3000)
+"""
+
+import json
+import math
+import os
+import re
+import textwrap
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Tuple
+
+from app import metrics
+
+BUDGETS = {
+    "discovery": int(os.getenv("PROMPT_TOKEN_BUDGET_DISCOVERY", "1500")),
+    "graph_link": int(os.getenv("PROMPT_TOKEN_BUDGET_GRAPH_LINK", "3000")),
+}
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(len(_TOKEN_PIECES.findall(text)), math.ceil(len(text) / 4))
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """Cut text at a word boundary to at most max_chars, marking the cut."""
+    text = (text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def dedupe(entries: Iterable[Any], key: Callable[[Any], Hashable]) -> List[Any]:
+    """Keep the first entry for each key, preserving order."""
+    seen = set()
+    kept = []
+    for entry in entries:
+        entry_key = key(entry)
+        if entry_key not in seen:
+            seen.add(entry_key)
+            kept.append(entry)
+    return kept
+
+
+def _fit(entries: List[Any], budget: int) -> List[Any]:
+    """Longest prefix of `entries` whose compact JSON list fits in `budget` tokens."""
+    used = estimate_tokens("[]")
+    for count, entry in enumerate(entries):
+        used += estimate_tokens(compact_json(entry)) + 1  # separating comma
+        if used > budget:
+            return entries[:count]
+    return entries
+
+
+def build(kind: str, template: str, sections: Dict[str, List[Any]], **params) -> Tuple[str, Dict[str, List[Any]]]:
+    """
+    Fill a str.format template whose section placeholders take compact JSON,
+    keeping the whole prompt within the budget for `kind`.
+    Returns the prompt and the entries kept from each section; a section
+    can come back empty, and callers decide whether the prompt is still
+    worth sending.
+    """
+    template = textwrap.dedent(template).strip()
+    budget = BUDGETS[kind]
+    remaining = budget - estimate_tokens(template.format(**{name: "[]" for name in sections}, **params))
+
+    kept: Dict[str, List[Any]] = {}
+    for name, entries in sections.items():
+        kept[name] = _fit(entries, remaining)
+        remaining -= estimate_tokens(compact_json(kept[name]))
+
+    prompt = template.format(**{name: compact_json(entries) for name, entries in kept.items()}, **params)
+    _record(kind, prompt, budget, sections, kept)
+    return prompt, kept
+
+
+def _record(kind: str, prompt: str, budget: int, sections: Dict[str, List[Any]], kept: Dict[str, List[Any]]):
+    tokens = estimate_tokens(prompt)
+    metrics.PROMPT_ESTIMATED_TOKENS.labels(kind).observe(tokens)
+    for name, entries in sections.items():
+        if len(kept[name]) < len(entries):
+            metrics.PROMPT_ENTRIES_DROPPED.labels(kind, name).inc(len(entries) - len(kept[name]))
+
+    counts = ", ".join(f"{name} {len(kept[name])}/{len(entries)}" for name, entries in sections.items())
+    print(f"📏 {kind} prompt: ~{tokens} tokens (budget {budget}); kept {counts}")
+
@@ -0,0 +1,176 @@
+"""
+Per-request database query profiling.
+
+When enabled, listeners on every engine count the statements each request
+runs and the time spent in them, and group the statements by shape (the
+SQL with parameters and IN lists collapsed). A shape that runs several
+times in one request is usually a query issued in a loop, i.e. an N+1.
+QueryProfilerMiddleware reports the totals in a Server-Timing header (so
+they show up in the browser's network panel) and logs one line per
+request with the totals and any repeated shapes.
+
+The header is sent with the response headers, so for streamed responses
+it only covers the queries run before the stream started; the log line
+covers the whole request.
+
+Tests can use assert_max_queries() to fail when an endpoint starts
+issuing more queries, whether or not profiling is enabled:
+
+    with query_profiler.assert_max_queries(2):
+        client.get("/api/roadmaps/")
+
+Configuration (environment variables):
+- DB_QUERY_PROFILING: Profile requests and send Server-Timing headers (default: false)
+- DB_QUERY_REPEAT_THRESHOLD: Runs of one statement shape per request that get flagged (default: 3)
+"""
+
+import json
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app import db, metrics
+
+ENABLED = os.getenv("DB_QUERY_PROFILING", "false").lower() == "true"
+REPEAT_THRESHOLD = int(os.getenv("DB_QUERY_REPEAT_THRESHOLD", "3"))
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class QueryProfile:
+    queries: int = 0
+    seconds: float = 0.0
+    shapes: Counter = field(default_factory=Counter)
+
+    def add(self, statement: str, seconds: float):
+        self.queries += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statement shapes that ran at least `threshold` times, most frequent first."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+# Profile of the request being handled in this context
+_current: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+# Profiles that record every query in the process (see profile())
+_global_profiles: List[QueryProfile] = []
+_installed = False
+
+
+def statement_shape(statement: str) -> str:
+    """Statement with literals and placeholder lists collapsed, so one query in a loop has one shape."""
+    shape = _STRING.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?, ...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_profiler_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_profiler_started", None)
+    if started is None:
+        return
+    seconds = time.perf_counter() - started
+    request_profile = _current.get()
+    if request_profile is not None:
+        request_profile.add(statement, seconds)
+    for global_profile in _global_profiles:
+        global_profile.add(statement, seconds)
+
+
+def install():
+    """Attach the profiling listeners to every engine (once)."""
+    global _installed
+    if _installed:
+        return
+    engines = {db.engine, db.async_engine.sync_engine, db.async_read_engine.sync_engine}
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+def server_timing(profile: QueryProfile) -> str:
+    return f'db;dur={profile.seconds * 1000:.2f};desc="{profile.queries} queries"'
+
+
+def log(method: str, route: str, status: int, profile: QueryProfile):
+    entry = {
+        "method": method,
+        "route": route,
+        "status": status,
+        "queries": profile.queries,
+        "db_ms": round(profile.seconds * 1000, 2),
+        "repeated": [{"statement": shape, "count": count} for shape, count in profile.repeated()],
+    }
+    icon = "🔁" if entry["repeated"] else "🗄️"
+    print(f"{icon} db queries: {json.dumps(entry)}")
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware profiling the queries of each HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+        install()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_profile = QueryProfile()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"server-timing", server_timing(request_profile).encode())]
+            await send(message)
+
+        token = _current.set(request_profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            log(scope["method"], metrics.route_path(scope), status, request_profile)
+
+
+@contextmanager
+def profile() -> Iterator[QueryProfile]:
+    """Record every query run in the process while the block runs (including other threads and tasks)."""
+    install()
+    recorded = QueryProfile()
+    _global_profiles.append(recorded)
+    try:
+        yield recorded
+    finally:
+        _global_profiles.remove(recorded)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int) -> Iterator[QueryProfile]:
+    """Fail with the recorded statement shapes if the block runs more than `max_queries` queries."""
+    with profile() as recorded:
+        yield recorded
+    if recorded.queries > max_queries:
+        shapes = "\n".join(f"  {count}x {shape}" for shape, count in recorded.shapes.most_common())
+        raise AssertionError(f"Expected at most {max_queries} queries, ran {recorded.queries}:\n{shapes}")
@@ -0,0 +1,76 @@
+"""
+In-process cache of serialized quiz payloads.
+
+Quiz questions are written once, together with their roadmap item, and
+never edited afterwards, so the JSON body of GET /api/quiz/{item_id} can
+be built once and reused until the roadmap is deleted. Entries are kept
+in LRU order and remember their roadmap so forget_roadmaps() can drop
+them when it is.
+
+Each worker process has its own cache and a delete only clears the worker
+that handled it, while SQLite hands a deleted item's id to the next item
+inserted. An item id alone therefore can't identify a payload: entries
+are stored under the item's roadmap version (its id and creation time,
+which is never reused), the caller looks that up on every request and
+get() only returns an entry whose version still matches. The version is
+part of the ETag too, so a browser holding a deleted item's quiz can't
+revalidate it against a new item with the same id.
+
+Configuration (environment variables):
+- QUIZ_CACHE_MAX_ENTRIES: Max cached quiz payloads per process (default: 2000)
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional
+
+MAX_ENTRIES = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "2000"))
+
+
+class QuizPayload(NamedTuple):
+    roadmap_id: int
+    version: str  # see roadmap_version()
+    body: bytes  # serialized QuizResponse
+    etag: str
+
+
+_entries: "OrderedDict[int, QuizPayload]" = OrderedDict()
+
+
+def etag_for(body: bytes, version: str = "") -> str:
+    """Strong ETag for a response body (of the given roadmap version)."""
+    return f'"{hashlib.sha256(version.encode() + body).hexdigest()[:32]}"'
+
+
+def roadmap_version(roadmap_id: int, created_at: Optional[str]) -> str:
+    """Identifies one roadmap for good: ids are reused after a delete, creation times are not."""
+    return f"{roadmap_id}@{created_at}"
+
+
+def get(roadmap_item_id: int, version: str) -> Optional[QuizPayload]:
+    """The cached payload, unless the item id now belongs to another roadmap version."""
+    payload = _entries.get(roadmap_item_id)
+    if payload is None:
+        return None
+    if payload.version != version:
+        del _entries[roadmap_item_id]
+        return None
+    _entries.move_to_end(roadmap_item_id)
+    return payload
+
+
+def put(roadmap_item_id: int, roadmap_id: int, version: str, body: bytes) -> QuizPayload:
+    payload = QuizPayload(roadmap_id, version, body, etag_for(body, version))
+    _entries[roadmap_item_id] = payload
+    _entries.move_to_end(roadmap_item_id)
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+    return payload
+
+
+def forget_roadmaps(roadmap_ids: Iterable[int]):
+    """Drop the payloads of deleted roadmaps' items."""
+    roadmap_ids = set(roadmap_ids)
+    for roadmap_item_id in [key for key, payload in _entries.items() if payload.roadmap_id in roadmap_ids]:
+        del _entries[roadmap_item_id]
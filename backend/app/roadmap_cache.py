@@ -0,0 +1,240 @@
+"""
+Semantic cache for generated roadmaps.
+
+Each generated roadmap is recorded under its normalized topic and
+experience. Later requests for the same or a near-identical topic are
+served by cloning the cached roadmap's items and questions instead of
+calling the model.
+
+Only entries whose topic has the same words as the request (ignoring
+order, case, punctuation and a few filler words) are candidates. Vector
+similarity alone can't tell "World War I" from "World War II" or "ML
+with Python" from "ML with R", and serving those would be wrong content.
+
+Entries live in the roadmap_cache table; a per-process similarity index
+over their topic/experience vectors is loaded lazily from it. The index
+only changes once the rows it mirrors are committed, so a rolled back
+transaction can't leave it out of step with the table.
+
+Configuration (environment variables):
+- ROADMAP_CACHE_SIMILARITY: Minimum similarity for a hit (default: 0.95)
+- ROADMAP_CACHE_TTL_HOURS: Entry lifetime in hours (default: 168)
+- ROADMAP_CACHE_MAX_ENTRIES: Max entries before LRU eviction (default: 500)
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.embeddings import VECTOR_DIM, cosine_similarities, embed_text, embed_texts, normalize_text
+
+SIMILARITY_THRESHOLD = float(os.getenv("ROADMAP_CACHE_SIMILARITY", "0.95"))
+TTL = timedelta(hours=float(os.getenv("ROADMAP_CACHE_TTL_HOURS", "168")))
+MAX_ENTRIES = int(os.getenv("ROADMAP_CACHE_MAX_ENTRIES", "500"))
+
+# The topic decides what is taught; experience only tunes it
+TOPIC_WEIGHT = 0.75
+EXPERIENCE_WEIGHT = 0.25
+
+# Words that don't change what a topic is about
+FILLER_WORDS = frozenset({"a", "an", "and", "for", "in", "of", "on", "the", "to", "with"})
+
+_entry_ids: List[int] = []
+_roadmap_ids: List[int] = []
+_topic_tokens: List[FrozenSet[str]] = []
+_topic_vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+_experience_vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+_index_loaded = False
+
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+async def _load_index(db_conn: AsyncSession):
+    global _index_loaded
+    if _index_loaded:
+        return
+    entries = (await db_conn.scalars(select(models.RoadmapCacheEntry))).all()
+    _reset_index(entries)
+    _index_loaded = True
+
+
+def topic_tokens(topic: str) -> FrozenSet[str]:
+    """The words of a topic that must match for a cache hit."""
+    return frozenset(normalize_text(topic).split()) - FILLER_WORDS
+
+
+def _reset_index(entries: List[models.RoadmapCacheEntry]):
+    global _entry_ids, _roadmap_ids, _topic_tokens, _topic_vectors, _experience_vectors
+    _entry_ids = [entry.id for entry in entries]
+    _roadmap_ids = [entry.roadmap_id for entry in entries]
+    _topic_tokens = [topic_tokens(entry.topic_key) for entry in entries]
+    _topic_vectors = embed_texts([entry.topic_key for entry in entries])
+    _experience_vectors = embed_texts([entry.experience_key for entry in entries])
+
+
+def _add_to_index(entry: models.RoadmapCacheEntry):
+    global _entry_ids, _topic_vectors, _experience_vectors
+    _entry_ids.append(entry.id)
+    _roadmap_ids.append(entry.roadmap_id)
+    _topic_tokens.append(topic_tokens(entry.topic_key))
+    _topic_vectors = np.vstack([_topic_vectors, embed_text(entry.topic_key)[None, :]])
+    _experience_vectors = np.vstack([_experience_vectors, embed_text(entry.experience_key)[None, :]])
+
+
+def _remove_from_index(entry_ids: List[int]):
+    global _entry_ids, _roadmap_ids, _topic_tokens, _topic_vectors, _experience_vectors
+    removed = set(entry_ids)
+    keep = [i for i, entry_id in enumerate(_entry_ids) if entry_id not in removed]
+    _entry_ids = [_entry_ids[i] for i in keep]
+    _roadmap_ids = [_roadmap_ids[i] for i in keep]
+    _topic_tokens = [_topic_tokens[i] for i in keep]
+    _topic_vectors = _topic_vectors[keep]
+    _experience_vectors = _experience_vectors[keep]
+
+
+async def _delete_entries(db_conn: AsyncSession, entry_ids: List[int]):
+    """Delete entry rows; the caller drops them from the index after committing."""
+    if not entry_ids:
+        return
+    await db_conn.execute(delete(models.RoadmapCacheEntry).where(
+        models.RoadmapCacheEntry.id.in_(entry_ids)
+    ))
+
+
+async def _evict_expired(db_conn: AsyncSession):
+    cutoff = datetime.utcnow() - TTL
+    expired_ids = (await db_conn.scalars(select(models.RoadmapCacheEntry.id).where(
+        models.RoadmapCacheEntry.created_at < cutoff
+    ))).all()
+    if expired_ids:
+        await _delete_entries(db_conn, expired_ids)
+        await db_conn.commit()
+        _remove_from_index(expired_ids)
+        _stats["evictions"] += len(expired_ids)
+
+
+async def lookup(db_conn: AsyncSession, topic: str, experience: str) -> Optional[models.RoadmapCacheEntry]:
+    """
+    Find a cached roadmap for this topic and experience.
+    Returns the best entry with the same topic words whose similarity
+    crosses the threshold, or None.
+    """
+    await _load_index(db_conn)
+    await _evict_expired(db_conn)
+
+    entry = None
+    if _entry_ids:
+        scores = (
+            TOPIC_WEIGHT * cosine_similarities(_topic_vectors, embed_text(topic))
+            + EXPERIENCE_WEIGHT * cosine_similarities(_experience_vectors, embed_text(experience))
+        )
+        wanted = topic_tokens(topic)
+        scores[[tokens != wanted for tokens in _topic_tokens]] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] >= SIMILARITY_THRESHOLD:
+            entry = await db_conn.get(models.RoadmapCacheEntry, _entry_ids[best])
+            if entry is None:
+                # Removed by another process since the index was loaded
+                _remove_from_index([_entry_ids[best]])
+
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+
+    entry.hit_count += 1
+    entry.last_used_at = datetime.utcnow()
+    await db_conn.commit()
+    _stats["hits"] += 1
+    return entry
+
+
+async def load_items(db_conn: AsyncSession, entry: models.RoadmapCacheEntry) -> List[Dict]:
+    """
+    Read the cached roadmap's items and questions in the same shape
+    the model returns, so they can be saved as a new roadmap.
+    """
+    items = (await db_conn.scalars(select(models.RoadmapItem).where(
+        models.RoadmapItem.roadmap_id == entry.roadmap_id
+    ).order_by(models.RoadmapItem.id))).all()
+
+    item_ids = [item.id for item in items]
+    questions_by_item: Dict[int, List[Dict]] = {item_id: [] for item_id in item_ids}
+    if item_ids:
+        questions = (await db_conn.scalars(select(models.QuizQuestion).where(
+            models.QuizQuestion.roadmap_item_id.in_(item_ids)
+        ).order_by(models.QuizQuestion.id))).all()
+        for q in questions:
+            questions_by_item[q.roadmap_item_id].append({
+                "question": q.question,
+                "options": q.options,
+                "correct": q.correct
+            })
+
+    return [
+        {
+            "title": item.title,
+            "summary": item.summary,
+            "level": item.level,
+            "study_material": item.study_material,
+            "questions": questions_by_item[item.id]
+        }
+        for item in items
+    ]
+
+
+async def store(db_conn: AsyncSession, topic: str, experience: str, roadmap_id: int):
+    """Record a freshly generated roadmap, evicting least recently used entries over the limit."""
+    await _load_index(db_conn)
+
+    entry = models.RoadmapCacheEntry(
+        topic_key=normalize_text(topic),
+        experience_key=normalize_text(experience),
+        roadmap_id=roadmap_id
+    )
+    db_conn.add(entry)
+    await db_conn.flush()
+
+    lru_ids = []
+    overflow = await db_conn.scalar(select(func.count(models.RoadmapCacheEntry.id))) - MAX_ENTRIES
+    if overflow > 0:
+        lru_ids = (await db_conn.scalars(select(models.RoadmapCacheEntry.id).order_by(
+            models.RoadmapCacheEntry.last_used_at
+        ).limit(overflow))).all()
+        await _delete_entries(db_conn, lru_ids)
+
+    await db_conn.commit()
+    _add_to_index(entry)
+    _remove_from_index(lru_ids)
+    _stats["evictions"] += len(lru_ids)
+
+
+async def forget_roadmaps(db_conn: AsyncSession, roadmap_ids: List[int]):
+    """
+    Delete entries that point at roadmaps which are being deleted (caller
+    commits, then calls unindex_roadmaps).
+    """
+    entry_ids = (await db_conn.scalars(select(models.RoadmapCacheEntry.id).where(
+        models.RoadmapCacheEntry.roadmap_id.in_(roadmap_ids)
+    ))).all()
+    await _delete_entries(db_conn, entry_ids)
+
+
+def unindex_roadmaps(roadmap_ids: List[int]):
+    """Drop index entries of roadmaps whose deletion has been committed."""
+    removed = set(roadmap_ids)
+    _remove_from_index([entry_id for entry_id, roadmap_id in zip(_entry_ids, _roadmap_ids) if roadmap_id in removed])
+
+
+def stats() -> Dict[str, float]:
+    """Hit/miss counters for this process."""
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "entries": len(_entry_ids),
+        "hit_rate": _stats["hits"] / lookups if lookups else 0.0
+    }
@@ -0,0 +1,111 @@
+"""
+Per-roadmap progress summaries.
+
+The roadmap_progress table holds, for each (user, roadmap), how many items
+each level has and how many of them the user has completed with a perfect
+score. /api/progress/complete refreshes the row in the same transaction as
+the QuizProgress write, so reading a roadmap's progress is one primary-key
+lookup instead of scanning the user's whole quiz history.
+
+A refresh recomputes rows from the roadmaps' items and the user's
+progress on them: it only reads the affected roadmaps' rows and can't
+drift from QuizProgress.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+
+def summarize(items: Iterable[Tuple[int, int]], completed_ids: Iterable[int]) -> Dict:
+    """Column values of a summary row, from (item id, level) pairs and the completed item ids."""
+    completed_ids = set(completed_ids)
+    level_items: Dict[str, int] = {}
+    level_completed: Dict[str, int] = {}
+    completed_in_roadmap = []
+    for item_id, level in items:
+        level_items[str(level)] = level_items.get(str(level), 0) + 1
+        level_completed.setdefault(str(level), 0)
+        if item_id in completed_ids:
+            level_completed[str(level)] += 1
+            completed_in_roadmap.append(item_id)
+    return {
+        "level_items": level_items,
+        "level_completed": level_completed,
+        "completed_item_ids": sorted(completed_in_roadmap)
+    }
+
+
+def levels_progress(summary: Optional[models.RoadmapProgress], first_level: Optional[int] = None) -> Dict:
+    """
+    completed_levels, current_level and completed_item_ids for a summary row.
+    Without a row nothing is completed and the current level is `first_level`.
+    """
+    if summary is None:
+        return {"completed_levels": [], "current_level": first_level or 1, "completed_item_ids": []}
+
+    level_items = {int(level): count for level, count in summary.level_items.items()}
+    level_completed = {int(level): count for level, count in summary.level_completed.items()}
+
+    # Levels unlock in order: stop at the first one with an item left
+    completed_levels = []
+    current_level = 1
+    for level in sorted(level_items):
+        if level_completed.get(level, 0) >= level_items[level]:
+            completed_levels.append(level)
+            current_level = level + 1
+        else:
+            current_level = level
+            break
+
+    return {
+        "completed_levels": completed_levels,
+        "current_level": current_level,
+        "completed_item_ids": summary.completed_item_ids
+    }
+
+
+async def refresh(db_conn: AsyncSession, user_id: str, roadmap_ids: Iterable[int]) -> List[models.RoadmapProgress]:
+    """Recompute a user's summary rows for some roadmaps (caller commits)."""
+    roadmap_ids = sorted(set(roadmap_ids))
+    if not roadmap_ids:
+        return []
+    await db_conn.flush()  # include QuizProgress changes pending in this session
+
+    items: Dict[int, List[Tuple[int, int]]] = {roadmap_id: [] for roadmap_id in roadmap_ids}
+    for item_id, level, roadmap_id in (await db_conn.execute(
+        select(models.RoadmapItem.id, models.RoadmapItem.level, models.RoadmapItem.roadmap_id).where(
+            models.RoadmapItem.roadmap_id.in_(roadmap_ids)
+        )
+    )).all():
+        items[roadmap_id].append((item_id, level))
+    completed_ids = (await db_conn.scalars(
+        select(models.QuizProgress.roadmap_item_id).join(
+            models.RoadmapItem, models.RoadmapItem.id == models.QuizProgress.roadmap_item_id
+        ).where(
+            models.RoadmapItem.roadmap_id.in_(roadmap_ids),
+            models.QuizProgress.user_id == user_id,
+            models.QuizProgress.score == models.QuizProgress.total_questions
+        )
+    )).all()
+
+    existing = {
+        summary.roadmap_id: summary
+        for summary in (await db_conn.scalars(select(models.RoadmapProgress).where(
+            models.RoadmapProgress.user_id == user_id,
+            models.RoadmapProgress.roadmap_id.in_(roadmap_ids)
+        ))).all()
+    }
+    summaries = []
+    for roadmap_id in roadmap_ids:
+        summary = existing.get(roadmap_id)
+        if summary is None:
+            summary = models.RoadmapProgress(user_id=user_id, roadmap_id=roadmap_id)
+            db_conn.add(summary)
+        for column, value in summarize(items[roadmap_id], completed_ids).items():
+            setattr(summary, column, value)
+        summaries.append(summary)
+    return summaries
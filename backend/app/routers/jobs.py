@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, db
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+import json
+
+router = APIRouter(prefix="/api/jobs")
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    payload: dict
+    status: str
+    attempts: int
+    max_attempts: int
+    last_error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: int, db_conn: AsyncSession = Depends(db.get_read_db)):
+    """
+    Get the status of a background job.
+    
+    Path parameters:
+    - job_id: The ID of the job
+    
+    Returns:
+    - status: "queued", "running", "succeeded" or "failed"
+    - attempts / max_attempts: Retry progress
+    - last_error: Error from the most recent failed attempt, if any
+    """
+    job = await db_conn.get(models.Job, job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "payload": json.loads(job.payload),
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
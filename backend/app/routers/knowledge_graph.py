@@ -1,67 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from google import genai
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import json
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from app import models, db
-from dotenv import load_dotenv
 import os
+import numpy as np
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional, Tuple
+from app import models, db, llm, jobs, metrics, adjacency, graph_format, graph_layout, graph_versions, node_index, prompts
+from app.etags import etag_matches
+from app.embeddings import embed_texts, normalize_text
 from datetime import datetime
 
-load_dotenv()
-
-# Initialize Gemini client
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
 router = APIRouter(prefix="/api/knowledge-graph")
 
 # Minimum weight threshold for relationships
 MIN_RELATIONSHIP_WEIGHT = 1.5  # Only include moderate to strong connections
 
+# Partitioned full rebuilds (force_refresh)
+REBUILD_BLOCK_SIZE = int(os.getenv("GRAPH_REBUILD_BLOCK_SIZE", "30"))  # max title nodes per block
+REBUILD_NEIGHBOR_BLOCKS = int(os.getenv("GRAPH_REBUILD_NEIGHBOR_BLOCKS", "4"))  # other blocks compared with each block
+REBUILD_CONCURRENCY = int(os.getenv("GRAPH_REBUILD_CONCURRENCY", "4"))  # block pairs analyzed at once
+
+# Structured output schema shared by the relationship analysis prompts
+RELATIONSHIPS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "relationships": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "source_id": {"type": "string"},
+                    "target_id": {"type": "string"},
+                    "relationship_type": {"type": "string"},
+                    "weight": {"type": "number"},
+                    "explanation": {"type": "string"}
+                },
+                "required": ["source_id", "target_id", "relationship_type", "weight", "explanation"]
+            }
+        }
+    },
+    "required": ["relationships"]
+}
+
 class Node(BaseModel):
     id: str
     label: str
     type: str  # "topic" or "title"
     roadmap_id: int = None
     group: int = None  # For coloring different roadmaps
+    x: Optional[float] = None  # Precomputed layout position, when available
+    y: Optional[float] = None
 
 class Edge(BaseModel):
+    id: Optional[int] = None
     source: str
     target: str
     weight: float = 1.0
     relationship: str = "related"
 
 class KnowledgeGraphResponse(BaseModel):
+    version: int = 0
     nodes: List[Node]
     edges: List[Edge]
+    rebuild_job_id: Optional[int] = None  # set when force_refresh queued a rebuild
+
+class GraphChangesResponse(BaseModel):
+    version: int
+    since: int
+    reset: bool  # True: changes can't be expressed as a delta, reload the full graph
+    nodes_added: List[Node]
+    nodes_removed: List[str]
+    edges_added: List[Edge]
+    edges_removed: List[int]
 
 @router.get("/", response_model=KnowledgeGraphResponse)
 async def get_knowledge_graph(
+    response: Response,
     force_refresh: bool = Query(False, description="Force complete regeneration of the graph"),
-    db_conn: Session = Depends(db.get_db)
+    format: Optional[str] = Query(None, pattern="^(json|msgpack)$", description="Response encoding (overrides Accept)"),
+    accept: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    db_conn: AsyncSession = Depends(db.get_read_db)
 ):
     """
     Get knowledge graph data showing relationships between topics and titles.
     Uses persistent incremental updates - graph is built up over time.
     Returns nodes (topics/titles) and edges (connections) for visualization.
+    
+    The response carries the graph version (and whether it includes the
+    layout) as its ETag; a request with a matching If-None-Match gets 304
+    Not Modified without loading the graph.
+    
+    With format=msgpack (or Accept: application/x-msgpack) the graph is sent
+    in the compact columnar encoding described in app/graph_format.py.
+    
+    Nodes carry x/y from the server-side layout once it has been computed
+    for this graph version; until then they are null.
+    
+    With force_refresh, a full rebuild is queued as a background job and the
+    current graph is returned along with rebuild_job_id.
     """
 
     try:
+        rebuild_job_id = None
         if force_refresh:
             # Complete regeneration requested
-            print("🔄 Force refresh - regenerating entire graph...")
-            # Delete all existing graph data
-            db_conn.query(models.KnowledgeGraphEdge).delete()
-            db_conn.query(models.KnowledgeGraphNode).delete()
-            db_conn.commit()
-            
-            # Rebuild from scratch
-            await rebuild_entire_graph(db_conn)
+            print("🔄 Force refresh - queueing full graph rebuild...")
+            async with db.AsyncSessionLocal() as write_conn:
+                rebuild_job_id = (await start_rebuild(write_conn)).id
+        
+        # Read the version before the graph, so a concurrent change makes it stale rather than ahead
+        version = await graph_versions.current_version(db_conn)
+        use_msgpack = graph_format.wants_msgpack(format, accept)
+        variant = "msgpack" if use_msgpack else None
+        # A response sent before the layout job finished must not stay fresh once it has
+        laid_out = await graph_layout.has_layout(db_conn, version)
+        current_etag = graph_versions.etag(version, variant, laid_out)
+        if etag_matches(if_none_match, current_etag) and not force_refresh:
+            return Response(status_code=304, headers={"ETag": current_etag, "Vary": "Accept"})
+        positions = await graph_layout.get_positions(db_conn, version)
+        etag = graph_versions.etag(version, variant, laid_out=positions is not None)
+        positions = positions or {}
+        response.headers["ETag"] = etag
+        response.headers["Vary"] = "Accept"
+        
+        if use_msgpack:
+            # Plain column tuples; skips ORM objects and Pydantic models entirely
+            node_rows = (await db_conn.execute(select(
+                models.KnowledgeGraphNode.id,
+                models.KnowledgeGraphNode.label,
+                models.KnowledgeGraphNode.node_type,
+                models.KnowledgeGraphNode.roadmap_id,
+                models.KnowledgeGraphNode.group
+            ))).all()
+            edge_rows = (await db_conn.execute(select(
+                models.KnowledgeGraphEdge.id,
+                models.KnowledgeGraphEdge.source,
+                models.KnowledgeGraphEdge.target,
+                models.KnowledgeGraphEdge.weight,
+                models.KnowledgeGraphEdge.relationship
+            ))).all()
+            content = graph_format.encode_graph(version, node_rows, edge_rows, rebuild_job_id, positions)
+            print(f"✓ Loaded graph: {len(node_rows)} nodes, {len(edge_rows)} edges ({len(content)} bytes msgpack)")
+            return Response(content=content, media_type=graph_format.MEDIA_TYPE, headers={"ETag": etag, "Vary": "Accept"})
         
         # Load graph from database
-        db_nodes = db_conn.query(models.KnowledgeGraphNode).all()
-        db_edges = db_conn.query(models.KnowledgeGraphEdge).all()
+        db_nodes = (await db_conn.scalars(select(models.KnowledgeGraphNode))).all()
+        db_edges = (await db_conn.scalars(select(models.KnowledgeGraphEdge))).all()
         
         # Convert to response format
         nodes = [
@@ -70,13 +157,16 @@ async def get_knowledge_graph(
                 label=node.label,
                 type=node.node_type,
                 roadmap_id=node.roadmap_id,
-                group=node.group
+                group=node.group,
+                x=positions.get(node.id, (None, None))[0],
+                y=positions.get(node.id, (None, None))[1]
             )
             for node in db_nodes
         ]
         
         edges = [
             Edge(
+                id=edge.id,
                 source=edge.source,
                 target=edge.target,
                 weight=edge.weight,
@@ -86,86 +176,442 @@ async def get_knowledge_graph(
         ]
         
         print(f"✓ Loaded graph: {len(nodes)} nodes, {len(edges)} edges")
-        return {"nodes": nodes, "edges": edges}
+        return {"version": version, "nodes": nodes, "edges": edges, "rebuild_job_id": rebuild_job_id}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get knowledge graph: {str(e)}")
 
-async def rebuild_entire_graph(db_conn: Session):
-    """Rebuild the entire knowledge graph from scratch."""
-    print("⚙️ Building entire graph from scratch...")
+@router.get("/changes", response_model=GraphChangesResponse)
+async def get_graph_changes(
+    since: int = Query(..., description="Graph version the client already has"),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    """
+    Get the nodes and edges added or removed since a graph version.
     
-    # Get all roadmaps
-    roadmaps = db_conn.query(models.Roadmap).all()
+    Query parameters:
+    - since: Version from a previous full graph or changes response
+    
+    Returns:
+    - version: Current graph version (use as the next `since`)
+    - nodes_removed / edges_removed: Ids to drop (apply these first)
+    - nodes_added / edges_added: Nodes and edges to add or replace
+    - reset: True if the graph was rebuilt or `since` is too old; reload the full graph
+    """
+    return await graph_versions.changes_since(db_conn, since)
+
+class SubgraphResponse(BaseModel):
+    version: int
+    nodes: List[Node]
+    edges: List[Edge]
+
+@router.get("/nodes/{node_id}/neighbors", response_model=SubgraphResponse)
+async def get_node_neighbors(
+    node_id: str,
+    relationship: Optional[str] = Query(None, description="Only follow edges of this relationship type"),
+    min_weight: Optional[float] = Query(None, description="Only follow edges with at least this weight"),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    """
+    Get a node together with its directly connected nodes.
+    
+    Query parameters:
+    - relationship: Edge type filter (e.g. "contains", "prerequisite")
+    - min_weight: Minimum edge weight
+    
+    Returns:
+    - nodes: The node and its neighbours
+    - edges: Edges between the node and its neighbours that pass the filters
+    """
+    subgraph = await adjacency.neighbors(db_conn, node_id, relationship, min_weight)
+    if subgraph is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return subgraph
+
+@router.get("/roadmaps/{roadmap_id}/subgraph", response_model=SubgraphResponse)
+async def get_roadmap_subgraph(
+    roadmap_id: int,
+    hops: int = Query(1, ge=0, le=5, description="How many links to follow out from the roadmap's nodes"),
+    relationship: Optional[str] = Query(None, description="Only follow edges of this relationship type"),
+    min_weight: Optional[float] = Query(None, description="Only follow edges with at least this weight"),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    """
+    Get the part of the graph around one roadmap, so the frontend can load
+    just what the user is looking at instead of the whole graph.
+    
+    Query parameters:
+    - hops: Link distance from the roadmap's own nodes (0 = the roadmap only)
+    - relationship: Edge type filter
+    - min_weight: Minimum edge weight
+    
+    Returns:
+    - nodes: Nodes within `hops` links of the roadmap
+    - edges: Edges among those nodes that pass the filters
+    """
+    subgraph = await adjacency.roadmap_subgraph(db_conn, roadmap_id, hops, relationship, min_weight)
+    if subgraph is None:
+        raise HTTPException(status_code=404, detail="Roadmap has no nodes in the knowledge graph")
+    return subgraph
+
+class NodePosition(BaseModel):
+    id: str
+    x: float
+    y: float
+
+class LayoutResponse(BaseModel):
+    version: int
+    pending: bool
+    positions: List[NodePosition]
+
+@router.get("/layout", response_model=LayoutResponse)
+async def get_graph_layout(
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None, alias="If-None-Match"),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    """
+    Get precomputed x/y positions for the nodes of the graph.
+    
+    Layouts are computed by a background job after each graph change. If
+    the current version has none yet, the job is queued and the latest
+    stored layout is returned; nodes added since have no position in it.
+    
+    Returns:
+    - version: Graph version the positions belong to (0 before any layout)
+    - pending: True while the layout for the current version is being computed
+    - positions: Node ids with their coordinates
+    """
+    version = await graph_versions.current_version(db_conn)
+    layout_version = await graph_layout.latest_version(db_conn)
+    pending = layout_version != version
+    if pending:
+        async with db.AsyncSessionLocal() as write_conn:
+            await jobs.enqueue(write_conn, "graph.layout", dedupe=True)
+    if layout_version is None:
+        return {"version": 0, "pending": True, "positions": []}
+    
+    etag = graph_versions.etag(layout_version, "layout-pending" if pending else "layout")
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
     
-    if not roadmaps:
+    positions = await graph_layout.get_positions(db_conn, layout_version) or {}
+    response.headers["ETag"] = etag
+    return {
+        "version": layout_version,
+        "pending": pending,
+        "positions": [{"id": node_id, "x": x, "y": y} for node_id, (x, y) in positions.items()]
+    }
+
+class RebuildStatusResponse(BaseModel):
+    id: int
+    status: str
+    total_pairs: int
+    completed_pairs: int
+    progress: float
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+@router.get("/rebuild", response_model=RebuildStatusResponse)
+async def get_rebuild_status(db_conn: AsyncSession = Depends(db.get_read_db)):
+    """
+    Get progress of the most recent full graph rebuild.
+    
+    Returns:
+    - status: "running" (including interrupted rebuilds waiting to resume), "succeeded",
+      "failed" (its job ran out of attempts) or "superseded" (a newer rebuild replaced it)
+    - completed_pairs / total_pairs: Block pairs analyzed so far
+    - progress: Fraction complete (0-1)
+    """
+    rebuild = await db_conn.scalar(select(models.GraphRebuild).order_by(models.GraphRebuild.id.desc()).limit(1))
+    
+    if not rebuild:
+        raise HTTPException(status_code=404, detail="No graph rebuild has been run")
+    
+    return {
+        "id": rebuild.id,
+        "status": rebuild.status,
+        "total_pairs": rebuild.total_pairs,
+        "completed_pairs": rebuild.completed_pairs,
+        "progress": rebuild.completed_pairs / rebuild.total_pairs if rebuild.total_pairs else float(rebuild.status == "succeeded"),
+        "created_at": rebuild.created_at,
+        "finished_at": rebuild.finished_at
+    }
+
+@jobs.handler("graph.rebuild")
+async def rebuild_graph_job(payload: dict, db_conn: AsyncSession):
+    """Job: run the rebuild named in the payload, resuming it when this is a retry."""
+    if "rebuild_id" in payload:
+        rebuild = await db_conn.get(models.GraphRebuild, payload["rebuild_id"])
+    else:
+        # Queued without a rebuild of its own (e.g. by migration 2)
+        rebuild = await create_rebuild(db_conn)
+    
+    if rebuild is None or rebuild.status != "running":
+        print(f"⏭️ Skipping graph rebuild {payload.get('rebuild_id')}: no longer running")
         return
     
+    await rebuild_entire_graph(rebuild, db_conn)
+    await jobs.enqueue(db_conn, "graph.layout", dedupe=True)
+
+@jobs.failure_handler("graph.rebuild")
+async def rebuild_graph_failed(payload: dict, db_conn: AsyncSession):
+    """The rebuild's job ran out of attempts, so nothing will resume it."""
+    await db_conn.execute(update(models.GraphRebuild).where(
+        models.GraphRebuild.id == payload.get("rebuild_id"),
+        models.GraphRebuild.status == "running"
+    ).values(status="failed", finished_at=datetime.utcnow()))
+    await db_conn.commit()
+
+@jobs.handler("graph.add_roadmap")
+async def add_roadmap_job(payload: dict, db_conn: AsyncSession):
+    """Job: link a new roadmap into the graph. Safe to retry."""
+    # Clear anything a previous failed attempt left behind
+    await remove_roadmap_from_graph(payload["roadmap_id"], db_conn)
+    await add_roadmap_to_graph(payload["roadmap_id"], db_conn)
+    await jobs.enqueue(db_conn, "graph.layout", dedupe=True)
+
+@jobs.handler("graph.layout")
+async def layout_job(payload: dict, db_conn: AsyncSession):
+    """Job: compute node positions for the current graph version."""
+    await graph_layout.compute_layout(db_conn)
+
+async def create_rebuild(db_conn: AsyncSession) -> models.GraphRebuild:
+    """
+    Start a new rebuild and commit. Rebuilds already under way planned their
+    blocks for an older set of roadmaps; they are superseded, not resumed.
+    """
+    await db_conn.execute(update(models.GraphRebuild).where(
+        models.GraphRebuild.status == "running"
+    ).values(status="superseded", finished_at=datetime.utcnow()))
+    rebuild = models.GraphRebuild()
+    db_conn.add(rebuild)
+    await db_conn.commit()
+    return rebuild
+
+async def start_rebuild(db_conn: AsyncSession) -> models.Job:
+    """
+    Queue a full rebuild of the graph from the current roadmaps and commit.
+    A queued rebuild that hasn't built its nodes yet will plan from the
+    current roadmaps anyway, so its job is returned instead.
+    """
+    waiting = await db_conn.scalar(select(models.GraphRebuild).where(
+        models.GraphRebuild.status == "running",
+        models.GraphRebuild.nodes_built.is_not(True)
+    ).order_by(models.GraphRebuild.id.desc()).limit(1))
+    rebuild = waiting or await create_rebuild(db_conn)
+    return await jobs.enqueue(db_conn, "graph.rebuild", {"rebuild_id": rebuild.id}, dedupe=True)
+
+async def rebuild_entire_graph(rebuild: models.GraphRebuild, db_conn: AsyncSession):
+    """
+    Rebuild the entire knowledge graph from scratch.
+    
+    If this rebuild was interrupted (its job is being retried), it is
+    resumed: nodes are kept and only block pairs without a checkpoint are
+    analyzed again.
+    """
+    if rebuild.nodes_built:
+        print(f"⏯️ Resuming graph rebuild {rebuild.id} ({rebuild.completed_pairs}/{rebuild.total_pairs} block pairs done)")
+    else:
+        print(f"⚙️ Building entire graph from scratch (rebuild {rebuild.id})...")
+        
+        await db_conn.execute(delete(models.KnowledgeGraphEdge))
+        await db_conn.execute(delete(models.KnowledgeGraphNode))
+        node_index.reset()
+        await build_graph_nodes(db_conn)
+        graph_versions.record_reset(db_conn)
+        
+        blocks, pairs = await partition_graph(db_conn)
+        rebuild.blocks = json.dumps(blocks)
+        rebuild.pairs = json.dumps(pairs)
+        rebuild.total_pairs = len(pairs)
+        rebuild.nodes_built = True
+        await db_conn.commit()
+        print(f"✓ Graph nodes built; {len(blocks)} blocks, {len(pairs)} block pairs to analyze")
+    
+    # Analyze inter-roadmap relationships block pair by block pair
+    await analyze_graph_partitioned(rebuild, db_conn)
+    
+    rebuild.status = "succeeded"
+    rebuild.finished_at = datetime.utcnow()
+    await db_conn.commit()
+    print(f"✓ Complete graph built (rebuild {rebuild.id})")
+
+async def build_graph_nodes(db_conn: AsyncSession):
+    """Create topic and title nodes plus intra-roadmap edges for every roadmap (caller commits)."""
+    # Get all roadmaps
+    roadmaps = (await db_conn.scalars(select(models.Roadmap).order_by(models.Roadmap.id))).all()
+    
     # Assign group numbers
     roadmap_groups = {roadmap.id: idx for idx, roadmap in enumerate(roadmaps)}
     
-    # Create all nodes
-    all_nodes = []
+    # Fetch every item at once rather than per roadmap
+    items_by_roadmap: Dict[int, List[models.RoadmapItem]] = {}
+    for item in (await db_conn.scalars(select(models.RoadmapItem).order_by(models.RoadmapItem.id))).all():
+        items_by_roadmap.setdefault(item.roadmap_id, []).append(item)
+    
+    edges = []
     for roadmap in roadmaps:
         # Topic node
-        topic_node = models.KnowledgeGraphNode(
+        db_conn.add(models.KnowledgeGraphNode(
             id=f"topic_{roadmap.id}",
             label=roadmap.topic,
             node_type="topic",
             roadmap_id=roadmap.id,
             group=roadmap_groups[roadmap.id]
-        )
-        db_conn.add(topic_node)
-        all_nodes.append(Node(
-            id=topic_node.id,
-            label=topic_node.label,
-            type=topic_node.node_type,
-            roadmap_id=topic_node.roadmap_id,
-            group=topic_node.group
         ))
         
         # Title nodes
-        items = db_conn.query(models.RoadmapItem).filter(
-            models.RoadmapItem.roadmap_id == roadmap.id
-        ).all()
-        
-        for item in items:
-            title_node = models.KnowledgeGraphNode(
+        for item in items_by_roadmap.get(roadmap.id, []):
+            db_conn.add(models.KnowledgeGraphNode(
                 id=f"title_{item.id}",
                 label=item.title,
                 node_type="title",
                 roadmap_id=roadmap.id,
                 group=roadmap_groups[roadmap.id]
-            )
-            db_conn.add(title_node)
-            all_nodes.append(Node(
-                id=title_node.id,
-                label=title_node.label,
-                type=title_node.node_type,
-                roadmap_id=title_node.roadmap_id,
-                group=title_node.group
             ))
             
             # Intra-roadmap edge (topic -> title)
-            edge = models.KnowledgeGraphEdge(
+            edges.append(models.KnowledgeGraphEdge(
                 source=f"topic_{roadmap.id}",
                 target=f"title_{item.id}",
                 weight=3.0,
                 relationship="contains"
+            ))
+    
+    # Edges reference nodes by foreign key, so the nodes must be inserted first
+    await db_conn.flush()
+    db_conn.add_all(edges)
+
+async def partition_graph(db_conn: AsyncSession):
+    """
+    Split title nodes into blocks of whole roadmaps (at most REBUILD_BLOCK_SIZE
+    titles each, unless a single roadmap is larger) and choose which block pairs
+    to analyze: each block with itself, plus its REBUILD_NEIGHBOR_BLOCKS most
+    similar blocks by centroid of node vectors.
+    
+    Returns (blocks, pairs): blocks as lists of roadmap ids, pairs as [a, b] block indices.
+    """
+    rows = (await db_conn.execute(
+        select(models.RoadmapItem.roadmap_id, models.RoadmapItem.title, models.RoadmapItem.summary).order_by(
+            models.RoadmapItem.roadmap_id, models.RoadmapItem.id
+        )
+    )).all()
+    
+    texts_by_roadmap: Dict[int, List[str]] = {}
+    for row in rows:
+        texts_by_roadmap.setdefault(row.roadmap_id, []).append(node_index.node_text(row.title, row.summary))
+    
+    blocks: List[List[int]] = []
+    block_texts: List[List[str]] = []
+    for roadmap_id, texts in texts_by_roadmap.items():
+        if not blocks or len(block_texts[-1]) + len(texts) > REBUILD_BLOCK_SIZE:
+            blocks.append([])
+            block_texts.append([])
+        blocks[-1].append(roadmap_id)
+        block_texts[-1].extend(texts)
+    
+    if not blocks:
+        return [], []
+    
+    centroids = np.vstack([embed_texts(texts).mean(axis=0) for texts in block_texts])
+    centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+    similarity = centroids @ centroids.T
+    
+    pairs = set()
+    for i in range(len(blocks)):
+        if len(blocks[i]) > 1:
+            pairs.add((i, i))
+        neighbors = [j for j in np.argsort(-similarity[i]) if j != i][:REBUILD_NEIGHBOR_BLOCKS]
+        for j in neighbors:
+            pairs.add((min(i, int(j)), max(i, int(j))))
+    
+    return blocks, [list(pair) for pair in sorted(pairs)]
+
+async def analyze_graph_partitioned(rebuild: models.GraphRebuild, db_conn: AsyncSession):
+    """
+    Analyze the rebuild's block pairs concurrently (at most REBUILD_CONCURRENCY
+    at a time). Each finished pair's edges are committed together with its
+    checkpoint, so a crashed rebuild only redoes unfinished pairs.
+    Raises if any pair failed, after every other pair has finished.
+    """
+    blocks = json.loads(rebuild.blocks or "[]")
+    pairs = json.loads(rebuild.pairs or "[]")
+    
+    done = {
+        (row.block_a, row.block_b)
+        for row in (await db_conn.execute(
+            select(models.GraphRebuildPair.block_a, models.GraphRebuildPair.block_b).where(
+                models.GraphRebuildPair.rebuild_id == rebuild.id
             )
-            db_conn.add(edge)
+        )).all()
+    }
+    pending = [(a, b) for a, b in pairs if (a, b) not in done]
+    if not pending:
+        return
     
-    db_conn.commit()
+    nodes_by_roadmap: Dict[int, List[Node]] = {}
+    for node in (await db_conn.scalars(select(models.KnowledgeGraphNode).where(
+        models.KnowledgeGraphNode.node_type == "title"
+    ))).all():
+        nodes_by_roadmap.setdefault(node.roadmap_id, []).append(Node(
+            id=node.id,
+            label=node.label,
+            type=node.node_type,
+            roadmap_id=node.roadmap_id,
+            group=node.group
+        ))
+    block_nodes = [
+        [node for roadmap_id in block for node in nodes_by_roadmap.get(roadmap_id, [])]
+        for block in blocks
+    ]
     
-    # Analyze inter-roadmap relationships
-    title_nodes = [n for n in all_nodes if n.type == "title"]
-    if len(title_nodes) > 1:
-        inter_edges = await analyze_relationships(title_nodes, [], db_conn)
-        print(f"✓ Generated {len(inter_edges)} cross-roadmap connections")
+    semaphore = asyncio.Semaphore(REBUILD_CONCURRENCY)
+    # The session can't run two operations at once; pairs take turns writing
+    write_lock = asyncio.Lock()
     
-    print(f"✓ Complete graph built: {len(all_nodes)} nodes")
+    async def analyze_pair(a: int, b: int):
+        async with semaphore:
+            relationships = []
+            # Skip the model when fewer nodes than a relationship needs fit the budget
+            if a == b:
+                prompt, nodes = build_full_prompt(block_nodes[a])
+                if len(nodes) >= 2:
+                    relationships = await fetch_relationships(prompt, nodes)
+            else:
+                prompt, nodes_a, nodes_b = build_incremental_prompt(block_nodes[a], block_nodes[b])
+                if nodes_a and nodes_b:
+                    relationships = await fetch_relationships(prompt, nodes_a, nodes_b)
+        
+        async with write_lock:
+            await add_relationship_edges(db_conn, relationships)
+            db_conn.add(models.GraphRebuildPair(
+                rebuild_id=rebuild.id,
+                block_a=a,
+                block_b=b,
+                edge_count=len(relationships)
+            ))
+            rebuild.completed_pairs += 1
+            await db_conn.commit()
+        print(f"  ✓ Block pair ({a}, {b}): {len(relationships)} edges [{rebuild.completed_pairs}/{rebuild.total_pairs}]")
+    
+    print(f"🔍 Analyzing {len(pending)} block pairs (concurrency {REBUILD_CONCURRENCY})...")
+    results = await asyncio.gather(
+        *[analyze_pair(a, b) for a, b in pending],
+        return_exceptions=True
+    )
+    
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        # Rollback expires `rebuild`, so build the message first
+        error = RuntimeError(
+            f"{len(failures)} of {len(pending)} block pairs failed in rebuild {rebuild.id} "
+            f"(completed pairs are checkpointed): {str(failures[0])}"
+        )
+        await db_conn.rollback()
+        raise error
 
-async def add_roadmap_to_graph(roadmap_id: int, db_conn: Session):
+async def add_roadmap_to_graph(roadmap_id: int, db_conn: AsyncSession):
     """
     Incrementally add a new roadmap to the existing graph.
     Only analyzes relationships between new nodes and existing nodes.
@@ -173,22 +619,33 @@ async def add_roadmap_to_graph(roadmap_id: int, db_conn: Session):
     print(f"➕ Adding roadmap {roadmap_id} to graph incrementally...")
     
     # Get the roadmap
-    roadmap = db_conn.query(models.Roadmap).filter(
-        models.Roadmap.id == roadmap_id
-    ).first()
+    roadmap = await db_conn.get(models.Roadmap, roadmap_id)
     
     if not roadmap:
         return
     
     # Calculate group number (max existing group + 1)
-    max_group = db_conn.query(models.KnowledgeGraphNode).count()
+    max_group = await db_conn.scalar(select(func.count(models.KnowledgeGraphNode.id)))
     group = max_group  # Simple incrementing group
     
-    # Get existing title nodes for relationship analysis
-    existing_nodes = db_conn.query(models.KnowledgeGraphNode).filter(
-        models.KnowledgeGraphNode.node_type == "title"
-    ).all()
+    # Get items for this roadmap
+    items = (await db_conn.scalars(select(models.RoadmapItem).where(
+        models.RoadmapItem.roadmap_id == roadmap.id
+    ))).all()
+    item_texts = [node_index.node_text(item.title, item.summary) for item in items]
     
+    # Only the existing title nodes nearest to the new items go to the model
+    candidate_ids = await node_index.nearest_candidates(db_conn, item_texts, exclude_roadmap_id=roadmap.id)
+    existing_nodes = (await db_conn.scalars(select(models.KnowledgeGraphNode).where(
+        models.KnowledgeGraphNode.id.in_(candidate_ids)
+    ))).all() if candidate_ids else []
+    
+    # Most connected candidates first, one per distinct label, in case the prompt budget runs out
+    degrees = await node_degrees(db_conn, [node.id for node in existing_nodes])
+    existing_nodes = prompts.dedupe(
+        sorted(existing_nodes, key=lambda node: (-degrees[node.id], node.id)),
+        key=lambda node: normalize_text(node.label)
+    )
     existing_title_nodes = [
         Node(
             id=node.id,
@@ -210,13 +667,10 @@ async def add_roadmap_to_graph(roadmap_id: int, db_conn: Session):
     )
     db_conn.add(topic_node)
     
-    # Get items for this roadmap
-    items = db_conn.query(models.RoadmapItem).filter(
-        models.RoadmapItem.roadmap_id == roadmap.id
-    ).all()
-    
     # Create title nodes and intra-roadmap edges
     new_title_nodes = []
+    added_nodes = [topic_node]
+    added_edges = []
     for item in items:
         title_node = models.KnowledgeGraphNode(
             id=f"title_{item.id}",
@@ -226,6 +680,7 @@ async def add_roadmap_to_graph(roadmap_id: int, db_conn: Session):
             group=group
         )
         db_conn.add(title_node)
+        added_nodes.append(title_node)
         
         new_title_nodes.append(Node(
             id=title_node.id,
@@ -242,13 +697,18 @@ async def add_roadmap_to_graph(roadmap_id: int, db_conn: Session):
             weight=3.0,
             relationship="contains"
         )
-        db_conn.add(edge)
+        added_edges.append(edge)
     
-    db_conn.commit()
+    # Edges reference nodes by foreign key, so the nodes must be inserted first
+    await db_conn.flush()
+    db_conn.add_all(added_edges)
+    await graph_versions.record_added(db_conn, added_nodes, added_edges)
+    await db_conn.commit()
+    node_index.add_nodes([node.id for node in new_title_nodes], item_texts, roadmap.id)
     
-    # Analyze relationships between NEW nodes and EXISTING nodes only
+    # Analyze relationships between NEW nodes and their nearest EXISTING nodes only
     if new_title_nodes and existing_title_nodes:
-        print(f"🔍 Analyzing {len(new_title_nodes)} new nodes against {len(existing_title_nodes)} existing nodes...")
+        print(f"🔍 Analyzing {len(new_title_nodes)} new nodes against {len(existing_title_nodes)} candidate nodes...")
         inter_edges = await analyze_new_relationships(
             new_title_nodes, 
             existing_title_nodes, 
@@ -258,254 +718,234 @@ async def add_roadmap_to_graph(roadmap_id: int, db_conn: Session):
     
     print(f"✓ Roadmap {roadmap_id} added to graph")
 
-async def remove_roadmap_from_graph(roadmap_id: int, db_conn: Session):
+async def remove_roadmap_from_graph(roadmap_id: int, db_conn: AsyncSession):
     """
     Incrementally remove a roadmap from the graph.
     Removes all nodes and edges associated with this roadmap.
     """
     print(f"➖ Removing roadmap {roadmap_id} from graph...")
     
-    # Get all nodes for this roadmap
-    nodes_to_remove = db_conn.query(models.KnowledgeGraphNode).filter(
-        models.KnowledgeGraphNode.roadmap_id == roadmap_id
-    ).all()
-    
-    node_ids = [node.id for node in nodes_to_remove]
-    
+    node_ids = await delete_graph_rows(db_conn, [roadmap_id])
     if not node_ids:
         return
     
-    # Remove edges connected to these nodes
-    db_conn.query(models.KnowledgeGraphEdge).filter(
-        (models.KnowledgeGraphEdge.source.in_(node_ids)) |
-        (models.KnowledgeGraphEdge.target.in_(node_ids))
-    ).delete(synchronize_session=False)
-    
-    # Remove the nodes
-    db_conn.query(models.KnowledgeGraphNode).filter(
-        models.KnowledgeGraphNode.roadmap_id == roadmap_id
-    ).delete(synchronize_session=False)
-    
-    db_conn.commit()
+    await db_conn.commit()
+    node_index.remove_roadmap(roadmap_id)
     print(f"✓ Removed {len(node_ids)} nodes and their connections")
 
-async def analyze_new_relationships(
-    new_nodes: List[Node], 
-    existing_nodes: List[Node], 
-    db_conn: Session
-) -> List[Edge]:
+async def delete_graph_rows(db_conn: AsyncSession, roadmap_ids: List[int]) -> List[str]:
     """
-    Analyze relationships only between NEW nodes and EXISTING nodes.
-    This is the key to incremental updates - we don't re-analyze everything.
+    Delete the graph nodes of some roadmaps and log the removals (caller commits).
+    Edges go with their nodes through ON DELETE CASCADE. Returns the removed node ids.
     """
-    
-    if not new_nodes or not existing_nodes:
+    node_ids = list((await db_conn.scalars(select(models.KnowledgeGraphNode.id).where(
+        models.KnowledgeGraphNode.roadmap_id.in_(roadmap_ids)
+    ))).all())
+    if not node_ids:
         return []
-
-    try:
-        # Prepare content for AI analysis
-        new_content = []
-        for node in new_nodes:
-            new_content.append({
-                "id": node.id,
-                "label": node.label,
-                "roadmap_id": node.roadmap_id
-            })
-        
-        existing_content = []
-        for node in existing_nodes:
-            existing_content.append({
-                "id": node.id,
-                "label": node.label,
-                "roadmap_id": node.roadmap_id
-            })
-
-        # Create prompt for incremental relationship analysis
-        relationships_prompt = f"""
-        You are analyzing NEW learning topics that were just added to an existing knowledge graph.
-        Your job is to find meaningful relationships between the NEW topics and the EXISTING topics.
-
-        NEW TOPICS (just added):
-        {json.dumps(new_content, indent=2)}
-
-        EXISTING TOPICS (already in the graph):
-        {json.dumps(existing_content, indent=2)}
-
-        Instructions:
-        1. Only create connections between NEW topics and EXISTING topics
-        2. Do NOT create connections between two NEW topics (those already exist)
-        3. Do NOT create connections between two EXISTING topics (those already exist)
-        4. Look for prerequisite relationships (where one topic is foundational for another)
-        5. Look for complementary relationships (topics that build upon each other)
-        6. Look for conceptual connections (sharing similar concepts or techniques)
-        7. Consider cross-domain knowledge transfer
-        8. BE HIGHLY SELECTIVE - Only create truly meaningful relationships
-        9. Minimum weight should be {MIN_RELATIONSHIP_WEIGHT} or higher
-
-        Return ONLY valid JSON with this exact structure:
+    
+    # Two single-column lookups use the source/target indexes; an OR of both wouldn't
+    edge_ids = set((await db_conn.scalars(select(models.KnowledgeGraphEdge.id).where(
+        models.KnowledgeGraphEdge.source.in_(node_ids)
+    ))).all())
+    edge_ids.update((await db_conn.scalars(select(models.KnowledgeGraphEdge.id).where(
+        models.KnowledgeGraphEdge.target.in_(node_ids)
+    ))).all())
+    
+    await db_conn.execute(delete(models.KnowledgeGraphNode).where(
+        models.KnowledgeGraphNode.roadmap_id.in_(roadmap_ids)
+    ).execution_options(synchronize_session=False))
+    
+    await graph_versions.record_removed(db_conn, node_ids, sorted(edge_ids))
+    return node_ids
+
+INCREMENTAL_PROMPT = """
+    You are analyzing NEW learning topics that were just added to an existing knowledge graph.
+    Your job is to find meaningful relationships between the NEW topics and the EXISTING topics.
+
+    NEW TOPICS (just added):
+    {new_topics}
+
+    EXISTING TOPICS (already in the graph):
+    {existing_topics}
+
+    Instructions:
+    1. Only create connections between NEW topics and EXISTING topics
+    2. Do NOT create connections between two NEW topics (those already exist)
+    3. Do NOT create connections between two EXISTING topics (those already exist)
+    4. Look for prerequisite relationships (where one topic is foundational for another)
+    5. Look for complementary relationships (topics that build upon each other)
+    6. Look for conceptual connections (sharing similar concepts or techniques)
+    7. Consider cross-domain knowledge transfer
+    8. BE HIGHLY SELECTIVE - Only create truly meaningful relationships
+    9. Minimum weight should be {min_weight} or higher
+
+    Return ONLY valid JSON with this exact structure:
+    {{
+      "relationships": [
         {{
-          "relationships": [
-            {{
-              "source_id": "title_X",
-              "target_id": "title_Y",
-              "relationship_type": "prerequisite|complementary|conceptual|transfer",
-              "weight": 1.5 to 3.0,
-              "explanation": "Brief explanation"
-            }}
-          ]
+          "source_id": "title_X",
+          "target_id": "title_Y",
+          "relationship_type": "prerequisite|complementary|conceptual|transfer",
+          "weight": 1.5 to 3.0,
+          "explanation": "Brief explanation"
         }}
+      ]
+    }}
 
-        Important: One endpoint must be from NEW topics, one from EXISTING topics.
-        """
-
-        # Call Gemini API
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=relationships_prompt,
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": {
-                    "type": "object",
-                    "properties": {
-                        "relationships": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "source_id": {"type": "string"},
-                                    "target_id": {"type": "string"},
-                                    "relationship_type": {"type": "string"},
-                                    "weight": {"type": "number"},
-                                    "explanation": {"type": "string"}
-                                },
-                                "required": ["source_id", "target_id", "relationship_type", "weight", "explanation"]
-                            }
-                        }
-                    },
-                    "required": ["relationships"]
-                }
-            }
-        )
+    Important: One endpoint must be from NEW topics, one from EXISTING topics.
+    """
 
-        relationships_data = response.parsed
-
-        # Convert to Edge objects and save to database
-        edges = []
-        for rel in relationships_data["relationships"]:
-            weight = float(rel["weight"])
-            # Only include relationships that meet minimum weight threshold
-            if weight >= MIN_RELATIONSHIP_WEIGHT:
-                edge = models.KnowledgeGraphEdge(
-                    source=rel["source_id"],
-                    target=rel["target_id"],
-                    weight=weight,
-                    relationship=rel["relationship_type"]
-                )
-                db_conn.add(edge)
-                edges.append(edge)
-            else:
-                print(f"Filtered weak: {rel['source_id']} -> {rel['target_id']} (weight: {weight})")
+FULL_PROMPT = """
+    Analyze the following learning topics and identify meaningful relationships between them.
 
-        db_conn.commit()
-        return edges
+    Topics to analyze:
+    {topics}
 
-    except Exception as e:
-        print(f"Error analyzing new relationships: {str(e)}")
-        return []
+    Instructions:
+    1. Look for prerequisite, complementary, conceptual, and transfer relationships
+    2. Only create connections between titles from DIFFERENT roadmaps
+    3. BE HIGHLY SELECTIVE - only truly meaningful relationships
+    4. Minimum weight should be {min_weight} or higher
 
-async def analyze_relationships(all_nodes: List[Node], existing_edges: List, db_conn: Session) -> List[Edge]:
+    Return ONLY valid JSON:
+    {{
+      "relationships": [
+        {{
+          "source_id": "title_X",
+          "target_id": "title_Y",
+          "relationship_type": "prerequisite|complementary|conceptual|transfer",
+          "weight": 1.5 to 3.0,
+          "explanation": "Brief explanation"
+        }}
+      ]
+    }}
+    """
+
+def node_content(node: Node) -> dict:
+    return {"id": node.id, "label": node.label, "roadmap_id": node.roadmap_id}
+
+def kept_nodes(nodes: List[Node], kept: List[dict]) -> List[Node]:
+    kept_ids = {entry["id"] for entry in kept}
+    return [node for node in nodes if node.id in kept_ids]
+
+def build_incremental_prompt(new_nodes: List[Node], existing_nodes: List[Node]) -> Tuple[str, List[Node], List[Node]]:
     """
-    Legacy function for complete graph analysis (used in force_refresh).
-    Analyzes ALL possible relationships between title nodes.
+    Prompt asking for relationships between two sets of title nodes, each
+    ranked most relevant first. New nodes get the token budget first.
+    Returns the prompt and the nodes of each set that fit in it.
     """
+    prompt, kept = prompts.build(
+        "graph_link",
+        INCREMENTAL_PROMPT,
+        {
+            "new_topics": [node_content(node) for node in new_nodes],
+            "existing_topics": [node_content(node) for node in existing_nodes]
+        },
+        min_weight=MIN_RELATIONSHIP_WEIGHT
+    )
+    return prompt, kept_nodes(new_nodes, kept["new_topics"]), kept_nodes(existing_nodes, kept["existing_topics"])
+
+def build_full_prompt(title_nodes: List[Node]) -> Tuple[str, List[Node]]:
+    """Prompt asking for relationships among one set of title nodes, and the nodes that fit in it."""
+    prompt, kept = prompts.build(
+        "graph_link",
+        FULL_PROMPT,
+        {"topics": [node_content(node) for node in title_nodes]},
+        min_weight=MIN_RELATIONSHIP_WEIGHT
+    )
+    return prompt, kept_nodes(title_nodes, kept["topics"])
+
+async def node_degrees(db_conn: AsyncSession, node_ids: List[str]) -> Dict[str, int]:
+    """Number of edges touching each node."""
+    degrees = {node_id: 0 for node_id in node_ids}
+    for column in (models.KnowledgeGraphEdge.source, models.KnowledgeGraphEdge.target):
+        for node_id, count in (await db_conn.execute(
+            select(column, func.count(models.KnowledgeGraphEdge.id)).where(column.in_(node_ids)).group_by(column)
+        )).all():
+            degrees[node_id] += count
+    return degrees
+
+async def fetch_relationships(
+    prompt: str,
+    nodes_a: List[Node],
+    nodes_b: Optional[List[Node]] = None
+) -> List[dict]:
+    """
+    Ask the model for relationships and keep only usable ones: weight at or
+    above MIN_RELATIONSHIP_WEIGHT, both endpoints among the given nodes and
+    in different roadmaps, and (when nodes_b is given) one endpoint per set.
+    """
+    roadmap_of = {node.id: node.roadmap_id for node in nodes_a + (nodes_b or [])}
+    ids_a = {node.id for node in nodes_a}
+    
+    relationships_data = await llm.generate_json(prompt, RELATIONSHIPS_SCHEMA)
+    
+    relationships = []
+    filtered: Dict[str, int] = {}
+    for rel in relationships_data["relationships"]:
+        source, target = rel["source_id"], rel["target_id"]
+        weight = float(rel["weight"])
+        # Only include relationships that meet minimum weight threshold
+        if weight < MIN_RELATIONSHIP_WEIGHT:
+            reason = "weak"
+        elif source not in roadmap_of or target not in roadmap_of:
+            reason = "unknown_node"
+        elif roadmap_of[source] == roadmap_of[target]:
+            reason = "same_roadmap"
+        elif nodes_b is not None and (source in ids_a) == (target in ids_a):
+            reason = "same_side"
+        else:
+            relationships.append({**rel, "weight": weight})
+            continue
+        filtered[reason] = filtered.get(reason, 0) + 1
+    
+    for reason, count in filtered.items():
+        metrics.LLM_RELATIONSHIPS_FILTERED.labels(metrics.current_caller(), reason).inc(count)
+    if filtered:
+        print(f"Filtered {sum(filtered.values())} of {len(relationships_data['relationships'])} relationships: {filtered}")
+    return relationships
+
+async def add_relationship_edges(db_conn: AsyncSession, relationships: List[dict]) -> List[models.KnowledgeGraphEdge]:
+    """Add edges for analyzed relationships (caller commits)."""
+    edges = []
+    for rel in relationships:
+        edge = models.KnowledgeGraphEdge(
+            source=rel["source_id"],
+            target=rel["target_id"],
+            weight=rel["weight"],
+            relationship=rel["relationship_type"]
+        )
+        db_conn.add(edge)
+        edges.append(edge)
+    await graph_versions.record_added(db_conn, edges=edges)
+    return edges
 
-    title_nodes = [n for n in all_nodes if n.type == "title"]
+async def analyze_new_relationships(
+    new_nodes: List[Node], 
+    existing_nodes: List[Node], 
+    db_conn: AsyncSession
+) -> List[models.KnowledgeGraphEdge]:
+    """
+    Analyze relationships only between NEW nodes and EXISTING nodes.
+    This is the key to incremental updates - we don't re-analyze everything.
+    """
     
-    if len(title_nodes) < 2:
+    if not new_nodes or not existing_nodes:
         return []
 
     try:
-        # Prepare content for AI analysis
-        content_list = []
-        for node in title_nodes:
-            content_list.append({
-                "id": node.id,
-                "label": node.label,
-                "roadmap_id": node.roadmap_id
-            })
-
-        relationships_prompt = f"""
-        Analyze the following learning topics and identify meaningful relationships between them.
-
-        Topics to analyze:
-        {json.dumps(content_list, indent=2)}
-
-        Instructions:
-        1. Look for prerequisite, complementary, conceptual, and transfer relationships
-        2. Only create connections between titles from DIFFERENT roadmaps
-        3. BE HIGHLY SELECTIVE - only truly meaningful relationships
-        4. Minimum weight should be {MIN_RELATIONSHIP_WEIGHT} or higher
-
-        Return ONLY valid JSON:
-        {{
-          "relationships": [
-            {{
-              "source_id": "title_X",
-              "target_id": "title_Y",
-              "relationship_type": "prerequisite|complementary|conceptual|transfer",
-              "weight": 1.5 to 3.0,
-              "explanation": "Brief explanation"
-            }}
-          ]
-        }}
-        """
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=relationships_prompt,
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": {
-                    "type": "object",
-                    "properties": {
-                        "relationships": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "source_id": {"type": "string"},
-                                    "target_id": {"type": "string"},
-                                    "relationship_type": {"type": "string"},
-                                    "weight": {"type": "number"},
-                                    "explanation": {"type": "string"}
-                                },
-                                "required": ["source_id", "target_id", "relationship_type", "weight", "explanation"]
-                            }
-                        }
-                    },
-                    "required": ["relationships"]
-                }
-            }
-        )
-
-        relationships_data = response.parsed
-
-        edges = []
-        for rel in relationships_data["relationships"]:
-            weight = float(rel["weight"])
-            if weight >= MIN_RELATIONSHIP_WEIGHT:
-                edge = models.KnowledgeGraphEdge(
-                    source=rel["source_id"],
-                    target=rel["target_id"],
-                    weight=weight,
-                    relationship=rel["relationship_type"]
-                )
-                db_conn.add(edge)
-                edges.append(edge)
-
-        db_conn.commit()
+        prompt, new_nodes, existing_nodes = build_incremental_prompt(new_nodes, existing_nodes)
+        if not new_nodes or not existing_nodes:
+            # The budget left no room for one side: there is nothing to relate
+            print("⏭️ No nodes on one side fit the prompt budget; skipping relationship analysis")
+            return []
+        relationships = await fetch_relationships(prompt, new_nodes, existing_nodes)
+        edges = await add_relationship_edges(db_conn, relationships)
+        await db_conn.commit()
         return edges
 
     except Exception as e:
-        print(f"Error analyzing relationships: {str(e)}")
-        return []
+        # Let the graph job fail so the queue retries it
+        print(f"Error analyzing new relationships: {str(e)}")
+        raise
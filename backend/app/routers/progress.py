@@ -1,18 +1,38 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import models, db
-from pydantic import BaseModel
-from typing import List, Optional
+from sqlalchemy import and_, bindparam, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, db, discovery_cache, jobs, roadmap_progress
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 
 router = APIRouter(prefix="/api/progress")
 
-class CompleteQuizRequest(BaseModel):
+class QuizCompletion(BaseModel):
     roadmap_item_id: int
     score: int
     total_questions: int
+
+class CompleteQuizRequest(QuizCompletion):
+    user_id: str = "default_user"
+
+class CompleteQuizBatchRequest(BaseModel):
+    completions: List[QuizCompletion] = Field(..., min_length=1, max_length=1000)
     user_id: str = "default_user"
 
+class CompletionOutcome(BaseModel):
+    roadmap_item_id: int
+    success: bool
+    status: str  # "unlocked", "updated", "not_perfect" or "not_found"
+    is_new_unlock: bool
+
+class CompleteQuizBatchResponse(BaseModel):
+    results: List[CompletionOutcome]
+    new_unlocks: int
+    total_unlocks: int
+    turtle_phase: int
+
 class UnlockedIdsResponse(BaseModel):
     unlocked_ids: List[int]
 
@@ -21,6 +41,9 @@ class RoadmapProgressResponse(BaseModel):
     current_level: int
     completed_item_ids: List[int]
 
+class RoadmapProgressSummary(RoadmapProgressResponse):
+    roadmap_id: int
+
 class TurtleStateResponse(BaseModel):
     total_unlocks: int
     turtle_phase: int
@@ -32,17 +55,16 @@ class UpdateTurtleVisibilityRequest(BaseModel):
     turtle_visible: bool
     user_id: str = "default_user"
 
-def get_or_create_user_profile(user_id: str, db_conn: Session) -> models.UserProfile:
-    """Get or create user profile for tracking turtle state."""
-    profile = db_conn.query(models.UserProfile).filter(
-        models.UserProfile.user_id == user_id
-    ).first()
+async def get_or_create_user_profile(user_id: str, db_conn: AsyncSession) -> models.UserProfile:
+    """Get or create user profile for tracking turtle state (caller commits)."""
+    profile = await db_conn.get(models.UserProfile, user_id)
     
     if not profile:
-        profile = models.UserProfile(user_id=user_id)
-        db_conn.add(profile)
-        db_conn.commit()
-        db_conn.refresh(profile)
+        # Concurrent requests may both get here; only one insert takes effect
+        await db_conn.execute(
+            insert(models.UserProfile).values(user_id=user_id).on_conflict_do_nothing(index_elements=["user_id"])
+        )
+        profile = await db_conn.get(models.UserProfile, user_id)
     
     return profile
 
@@ -57,10 +79,94 @@ def calculate_turtle_phase(total_unlocks: int) -> int:
     else:
         return 3  # Phase 3: Full reveal
 
+async def upsert_completions(
+    db_conn: AsyncSession,
+    user_id: str,
+    completions: List[QuizCompletion]
+) -> Set[int]:
+    """
+    Save perfect-score completions, one QuizProgress row per item (caller commits).
+    Returns the item ids that were unlocked for the first time.
+    """
+    if not completions:
+        return set()
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "roadmap_item_id": completion.roadmap_item_id,
+            "score": completion.score,
+            "total_questions": completion.total_questions,
+            "completed_at": now
+        }
+        for completion in completions
+    ]
+    
+    # Rows the insert skipped already existed, which tells new unlocks apart
+    new_ids = set((await db_conn.scalars(
+        insert(models.QuizProgress).values(rows).on_conflict_do_nothing(
+            index_elements=["user_id", "roadmap_item_id"]
+        ).returning(models.QuizProgress.roadmap_item_id)
+    )).all())
+    
+    completed_again = [row for row in rows if row["roadmap_item_id"] not in new_ids]
+    if completed_again:
+        await db_conn.execute(
+            update(models.QuizProgress.__table__).where(and_(
+                models.QuizProgress.user_id == bindparam("match_user_id"),
+                models.QuizProgress.roadmap_item_id == bindparam("match_item_id")
+            )).values(
+                score=bindparam("score"),
+                total_questions=bindparam("total_questions"),
+                completed_at=bindparam("completed_at")
+            ),
+            [
+                {**row, "match_user_id": row["user_id"], "match_item_id": row["roadmap_item_id"]}
+                for row in completed_again
+            ]
+        )
+    return new_ids
+
+async def add_unlocks(db_conn: AsyncSession, user_id: str, count: int) -> Dict[str, int]:
+    """
+    Add to the user's unlock count in SQL, creating the profile if needed,
+    and move the turtle phase along (caller commits).
+    """
+    now = datetime.utcnow()
+    total_unlocks = await db_conn.scalar(
+        insert(models.UserProfile).values(
+            user_id=user_id,
+            total_unlocks=count,
+            updated_at=now
+        ).on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"total_unlocks": models.UserProfile.total_unlocks + count, "updated_at": now}
+        ).returning(models.UserProfile.total_unlocks)
+    )
+    # Still inside the write transaction, so no one else can move total_unlocks in between
+    turtle_phase = calculate_turtle_phase(total_unlocks)
+    await db_conn.execute(
+        update(models.UserProfile).where(models.UserProfile.user_id == user_id).values(turtle_phase=turtle_phase)
+    )
+    return {"total_unlocks": total_unlocks, "turtle_phase": turtle_phase}
+
+async def queue_discovery_precompute(db_conn: AsyncSession, user_id: str, total_unlocks: int):
+    """
+    One unlock before a discovery milestone, queue a job that computes the
+    milestone's suggestions so the discovery modal doesn't wait on the model.
+    """
+    if discovery_cache.unlocks_until_next(total_unlocks) == 1:
+        await jobs.enqueue(
+            db_conn,
+            "discovery.precompute",
+            {"user_id": user_id, "milestone": total_unlocks + 1},
+            dedupe=True
+        )
+
 @router.post("/complete")
 async def complete_quiz(
     request: CompleteQuizRequest,
-    db_conn: Session = Depends(db.get_db)
+    db_conn: AsyncSession = Depends(db.get_db)
 ):
     """
     Mark a quiz as completed. Only saves if score is 100% (perfect score).
@@ -75,9 +181,7 @@ async def complete_quiz(
     - Success message or error if not 100% correct
     """
     # Check if roadmap item exists
-    roadmap_item = db_conn.query(models.RoadmapItem).filter(
-        models.RoadmapItem.id == request.roadmap_item_id
-    ).first()
+    roadmap_item = await db_conn.get(models.RoadmapItem, request.roadmap_item_id)
     
     if not roadmap_item:
         raise HTTPException(status_code=404, detail="Roadmap item not found")
@@ -91,37 +195,18 @@ async def complete_quiz(
             "required": request.total_questions
         }
     
-    # Check if already completed
-    existing = db_conn.query(models.QuizProgress).filter(
-        models.QuizProgress.user_id == request.user_id,
-        models.QuizProgress.roadmap_item_id == request.roadmap_item_id
-    ).first()
-
-    is_new_unlock = existing is None
-
-    if existing:
-        # Update existing record
-        existing.score = request.score
-        existing.total_questions = request.total_questions
-        existing.completed_at = datetime.utcnow()
-    else:
-        # Create new record
-        progress = models.QuizProgress(
-            user_id=request.user_id,
-            roadmap_item_id=request.roadmap_item_id,
-            score=request.score,
-            total_questions=request.total_questions,
-            completed_at=datetime.utcnow()
-        )
-        db_conn.add(progress)
-        
-        # Update user profile unlock count
-        profile = get_or_create_user_profile(request.user_id, db_conn)
-        profile.total_unlocks += 1
-        profile.turtle_phase = calculate_turtle_phase(profile.total_unlocks)
-        profile.updated_at = datetime.utcnow()
+    # Upsert against the (user_id, roadmap_item_id) unique index, so concurrent
+    # submissions can't create duplicate rows or count an unlock twice
+    is_new_unlock = bool(await upsert_completions(db_conn, request.user_id, [request]))
+    if is_new_unlock:
+        profile = await add_unlocks(db_conn, request.user_id, 1)
 
-    db_conn.commit()
+    # Keep the roadmap's progress summary in step, in the same transaction
+    await roadmap_progress.refresh(db_conn, request.user_id, [roadmap_item.roadmap_id])
+    await db_conn.commit()
+    
+    if is_new_unlock:
+        await queue_discovery_precompute(db_conn, request.user_id, profile["total_unlocks"])
 
     return {
         "success": True,
@@ -130,10 +215,81 @@ async def complete_quiz(
         "is_new_unlock": is_new_unlock
     }
 
+@router.post("/complete/batch", response_model=CompleteQuizBatchResponse)
+async def complete_quiz_batch(
+    request: CompleteQuizBatchRequest,
+    db_conn: AsyncSession = Depends(db.get_db)
+):
+    """
+    Record many quiz completions in one transaction, e.g. when syncing an
+    offline session or importing a class's results. Like /complete, only
+    perfect scores are saved.
+    
+    Body parameters:
+    - completions: Up to 1000 entries of roadmap_item_id, score and total_questions
+    - user_id: User identifier (defaults to "default_user")
+    
+    Returns:
+    - results: One outcome per entry, in request order
+    - new_unlocks: Items unlocked for the first time
+    - total_unlocks / turtle_phase: The user's profile after this batch
+    """
+    item_ids = {completion.roadmap_item_id for completion in request.completions}
+    item_roadmaps = dict((await db_conn.execute(
+        select(models.RoadmapItem.id, models.RoadmapItem.roadmap_id).where(models.RoadmapItem.id.in_(item_ids))
+    )).all())
+    
+    # Last perfect entry per item wins
+    perfect = {
+        completion.roadmap_item_id: completion
+        for completion in request.completions
+        if completion.roadmap_item_id in item_roadmaps and completion.score == completion.total_questions
+    }
+    new_ids = await upsert_completions(db_conn, request.user_id, list(perfect.values()))
+    
+    if new_ids:
+        profile = await add_unlocks(db_conn, request.user_id, len(new_ids))
+    else:
+        existing_profile = await db_conn.get(models.UserProfile, request.user_id)
+        profile = {
+            "total_unlocks": existing_profile.total_unlocks if existing_profile else 0,
+            "turtle_phase": existing_profile.turtle_phase if existing_profile else 0
+        }
+    
+    await roadmap_progress.refresh(db_conn, request.user_id, {item_roadmaps[item_id] for item_id in perfect})
+    await db_conn.commit()
+    
+    if new_ids:
+        await queue_discovery_precompute(db_conn, request.user_id, profile["total_unlocks"])
+    
+    results = []
+    reported = set()
+    for completion in request.completions:
+        item_id = completion.roadmap_item_id
+        if item_id not in item_roadmaps:
+            status = "not_found"
+        elif completion.score != completion.total_questions:
+            status = "not_perfect"
+        elif item_id in new_ids and item_id not in reported:
+            status = "unlocked"
+        else:
+            status = "updated"
+        is_new_unlock = status == "unlocked"
+        if is_new_unlock:
+            reported.add(item_id)
+        results.append({
+            "roadmap_item_id": item_id,
+            "success": status in ("unlocked", "updated"),
+            "status": status,
+            "is_new_unlock": is_new_unlock
+        })
+    
+    return {"results": results, "new_unlocks": len(new_ids), **profile}
+
 @router.get("/unlocked", response_model=UnlockedIdsResponse)
 async def get_unlocked_ids(
     user_id: str = "default_user",
-    db_conn: Session = Depends(db.get_db)
+    db_conn: AsyncSession = Depends(db.get_read_db)
 ):
     """
     Get list of unlocked (completed with 100% score) roadmap item IDs.
@@ -144,12 +300,10 @@ async def get_unlocked_ids(
     Returns:
     - List of roadmap_item_ids that have been completed
     """
-    completed = db_conn.query(models.QuizProgress).filter(
+    unlocked_ids = (await db_conn.scalars(select(models.QuizProgress.roadmap_item_id).where(
         models.QuizProgress.user_id == user_id,
         models.QuizProgress.score == models.QuizProgress.total_questions  # Perfect score
-    ).all()
-    
-    unlocked_ids = [progress.roadmap_item_id for progress in completed]
+    ))).all()
     
     return {"unlocked_ids": unlocked_ids}
 
@@ -157,7 +311,7 @@ async def get_unlocked_ids(
 async def get_roadmap_progress(
     roadmap_id: int,
     user_id: str = "default_user",
-    db_conn: Session = Depends(db.get_db)
+    db_conn: AsyncSession = Depends(db.get_read_db)
 ):
     """
     Get completion status per level for a specific roadmap.
@@ -173,65 +327,62 @@ async def get_roadmap_progress(
     - current_level: The next level to unlock (first incomplete level)
     - completed_item_ids: All completed item IDs for this roadmap
     """
-    # Check if roadmap exists
-    roadmap = db_conn.query(models.Roadmap).filter(
-        models.Roadmap.id == roadmap_id
-    ).first()
+    # Maintained by /complete, see app/roadmap_progress.py
+    summary = await db_conn.get(models.RoadmapProgress, (user_id, roadmap_id))
+    if summary:
+        return roadmap_progress.levels_progress(summary)
+    
+    # Nothing completed yet: the first level is current
+    roadmap = await db_conn.get(models.Roadmap, roadmap_id)
     
     if not roadmap:
         raise HTTPException(status_code=404, detail="Roadmap not found")
     
-    # Get all items for this roadmap
-    roadmap_items = db_conn.query(models.RoadmapItem).filter(
+    first_level = await db_conn.scalar(select(func.min(models.RoadmapItem.level)).where(
         models.RoadmapItem.roadmap_id == roadmap_id
-    ).all()
+    ))
+    return roadmap_progress.levels_progress(None, first_level)
+
+@router.get("/roadmaps", response_model=List[RoadmapProgressSummary])
+async def get_all_roadmap_progress(
+    user_id: str = "default_user",
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    """
+    Get completion status per level for every roadmap the user owns or has progress on.
     
-    # Get completed items for this user
-    completed_progress = db_conn.query(models.QuizProgress).filter(
-        models.QuizProgress.user_id == user_id,
-        models.QuizProgress.score == models.QuizProgress.total_questions
-    ).all()
+    Query parameters:
+    - user_id: User identifier (defaults to "default_user")
     
-    completed_item_ids = {progress.roadmap_item_id for progress in completed_progress}
+    Returns:
+    - One entry per roadmap, ordered by roadmap_id, with the same fields as /roadmap/{roadmap_id}
+    """
+    summaries = {
+        summary.roadmap_id: summary
+        for summary in (await db_conn.scalars(select(models.RoadmapProgress).where(
+            models.RoadmapProgress.user_id == user_id
+        ))).all()
+    }
     
-    # Filter to only items in this roadmap
-    roadmap_item_ids = {item.id for item in roadmap_items}
-    completed_in_roadmap = [
-        item_id for item_id in completed_item_ids 
-        if item_id in roadmap_item_ids
+    # The user's other roadmaps have no progress yet; only their first level is needed
+    first_levels = dict((await db_conn.execute(
+        select(models.Roadmap.id, func.min(models.RoadmapItem.level)).outerjoin(
+            models.RoadmapItem, models.RoadmapItem.roadmap_id == models.Roadmap.id
+        ).where(
+            models.Roadmap.user_id == user_id,
+            models.Roadmap.id.not_in(list(summaries))
+        ).group_by(models.Roadmap.id)
+    )).all())
+    
+    return [
+        {"roadmap_id": roadmap_id, **roadmap_progress.levels_progress(summaries.get(roadmap_id), first_levels.get(roadmap_id))}
+        for roadmap_id in sorted(set(summaries) | set(first_levels))
     ]
-    
-    # Group items by level
-    levels = {}
-    for item in roadmap_items:
-        if item.level not in levels:
-            levels[item.level] = []
-        levels[item.level].append(item.id)
-    
-    # Determine which levels are completed
-    completed_levels = []
-    current_level = 1
-    
-    for level in sorted(levels.keys()):
-        items_in_level = levels[level]
-        if all(item_id in completed_item_ids for item_id in items_in_level):
-            completed_levels.append(level)
-            current_level = level + 1
-        else:
-            # First incomplete level
-            current_level = level
-            break
-    
-    return {
-        "completed_levels": completed_levels,
-        "current_level": current_level,
-        "completed_item_ids": completed_in_roadmap
-    }
 
 @router.get("/turtle-state", response_model=TurtleStateResponse)
 async def get_turtle_state(
     user_id: str = "default_user",
-    db_conn: Session = Depends(db.get_db)
+    db_conn: AsyncSession = Depends(db.get_db)
 ):
     """
     Get turtle guide state for the user.
@@ -246,23 +397,19 @@ async def get_turtle_state(
     - turtle_visible: User preference for showing turtle
     - unlocks_until_next_discovery: Count until next discovery trigger
     """
-    profile = get_or_create_user_profile(user_id, db_conn)
+    profile = await get_or_create_user_profile(user_id, db_conn)
+    await db_conn.commit()
     
     # Check if discovery should be triggered
     # Trigger every 3 unlocks AND not shown at this count before
     should_show_discovery = (
-        profile.total_unlocks >= 3 and 
-        profile.total_unlocks % 3 == 0 and
+        profile.total_unlocks >= discovery_cache.DISCOVERY_INTERVAL and 
+        discovery_cache.milestone(profile.total_unlocks) == profile.total_unlocks and
         profile.last_discovery_at < profile.total_unlocks
     )
     
     # Calculate unlocks until next discovery
-    if profile.total_unlocks < 3:
-        unlocks_until_next = 3 - profile.total_unlocks
-    else:
-        unlocks_until_next = 3 - (profile.total_unlocks % 3)
-        if unlocks_until_next == 3:
-            unlocks_until_next = 0
+    unlocks_until_next = discovery_cache.unlocks_until_next(profile.total_unlocks)
     
     return {
         "total_unlocks": profile.total_unlocks,
@@ -275,7 +422,7 @@ async def get_turtle_state(
 @router.post("/turtle-visibility")
 async def update_turtle_visibility(
     request: UpdateTurtleVisibilityRequest,
-    db_conn: Session = Depends(db.get_db)
+    db_conn: AsyncSession = Depends(db.get_db)
 ):
     """
     Update user preference for turtle guide visibility.
@@ -287,10 +434,10 @@ async def update_turtle_visibility(
     Returns:
     - Success message with updated state
     """
-    profile = get_or_create_user_profile(request.user_id, db_conn)
+    profile = await get_or_create_user_profile(request.user_id, db_conn)
     profile.turtle_visible = request.turtle_visible
     profile.updated_at = datetime.utcnow()
-    db_conn.commit()
+    await db_conn.commit()
     
     return {
         "success": True,
@@ -301,7 +448,7 @@ async def update_turtle_visibility(
 @router.post("/mark-discovery-shown")
 async def mark_discovery_shown(
     user_id: str = "default_user",
-    db_conn: Session = Depends(db.get_db)
+    db_conn: AsyncSession = Depends(db.get_db)
 ):
     """
     Mark that discovery modal was shown at current unlock count.
@@ -313,10 +460,10 @@ async def mark_discovery_shown(
     Returns:
     - Success message
     """
-    profile = get_or_create_user_profile(user_id, db_conn)
+    profile = await get_or_create_user_profile(user_id, db_conn)
     profile.last_discovery_at = profile.total_unlocks
     profile.updated_at = datetime.utcnow()
-    db_conn.commit()
+    await db_conn.commit()
     
     return {
         "success": True,
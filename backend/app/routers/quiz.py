@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import models, db
-import json
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, db, quiz_cache
+from app.etags import etag_matches
+from app.fast_json import dumps
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/quiz")
@@ -17,8 +19,95 @@ class QuizResponse(BaseModel):
     roadmap_item_id: int
     questions: List[QuestionResponse]
 
+class RoadmapQuizzesResponse(BaseModel):
+    roadmap_id: int
+    quizzes: List[QuizResponse]
+
+
+# Question columns, read as plain rows rather than ORM objects
+QUESTION_COLUMNS = (
+    models.QuizQuestion.id.label("question_id"),
+    models.QuizQuestion.question,
+    models.QuizQuestion.options,
+    models.QuizQuestion.correct
+)
+
+
+def question_payload(row) -> Dict:
+    return {
+        "id": row.question_id,
+        "question": row.question,
+        "options": row.options,
+        "correct": row.correct
+    }
+
+
+def cached_response(body: bytes, etag: str, cache_control: str, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/roadmap/{roadmap_id}", response_model=RoadmapQuizzesResponse)
+async def get_roadmap_quizzes(
+    roadmap_id: int,
+    if_none_match: Optional[str] = Header(default=None),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    """
+    Get the quiz questions of every item in a roadmap with one query.
+    
+    Path parameters:
+    - roadmap_id: The ID of the roadmap
+    
+    Returns:
+    - One quiz per roadmap item, in item order
+    """
+    rows = (await db_conn.execute(
+        select(
+            models.Roadmap.created_at, models.RoadmapItem.id.label("item_id"), *QUESTION_COLUMNS
+        ).select_from(models.Roadmap).outerjoin(
+            models.RoadmapItem, models.RoadmapItem.roadmap_id == models.Roadmap.id
+        ).outerjoin(
+            models.QuizQuestion, models.QuizQuestion.roadmap_item_id == models.RoadmapItem.id
+        ).where(
+            models.Roadmap.id == roadmap_id
+        ).order_by(models.RoadmapItem.id, models.QuizQuestion.id)
+    )).all()
+    
+    if not rows:
+        raise HTTPException(status_code=404, detail="Roadmap not found")
+    
+    quizzes: Dict[int, List[Dict]] = {}
+    for row in rows:
+        if row.item_id is None:
+            continue  # roadmap has no items yet
+        questions = quizzes.setdefault(row.item_id, [])
+        if row.question_id is not None:
+            questions.append(question_payload(row))
+    
+    # Warm the per-item cache while the questions are at hand
+    version = quiz_cache.roadmap_version(roadmap_id, rows[0].created_at)
+    for item_id, questions in quizzes.items():
+        if quiz_cache.get(item_id, version) is None:
+            quiz_cache.put(item_id, roadmap_id, version, dumps({"roadmap_item_id": item_id, "questions": questions}))
+    
+    body = dumps({
+        "roadmap_id": roadmap_id,
+        "quizzes": [{"roadmap_item_id": item_id, "questions": questions} for item_id, questions in quizzes.items()]
+    })
+    
+    # A roadmap still being generated gains items, so always revalidate
+    return cached_response(body, quiz_cache.etag_for(body), "no-cache", if_none_match)
+
+
 @router.get("/{roadmap_item_id}", response_model=QuizResponse)
-async def get_quiz_questions(roadmap_item_id: int, db_conn: Session = Depends(db.get_db)):
+async def get_quiz_questions(
+    roadmap_item_id: int,
+    if_none_match: Optional[str] = Header(default=None),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
     """
     Get all quiz questions for a specific roadmap item.
     
@@ -27,31 +116,29 @@ async def get_quiz_questions(roadmap_item_id: int, db_conn: Session = Depends(db
     
     Returns:
     - Quiz questions with options and correct answer index
+    - ETag header; a matching If-None-Match gets a 304
     """
-    # Check if roadmap item exists
-    roadmap_item = db_conn.query(models.RoadmapItem).filter(
-        models.RoadmapItem.id == roadmap_item_id
-    ).first()
+    # Item ids are reused after a delete, so check which roadmap the id belongs to now
+    owner = (await db_conn.execute(
+        select(models.RoadmapItem.roadmap_id, models.Roadmap.created_at).join(
+            models.Roadmap, models.Roadmap.id == models.RoadmapItem.roadmap_id
+        ).where(models.RoadmapItem.id == roadmap_item_id)
+    )).first()
     
-    if not roadmap_item:
+    if owner is None:
         raise HTTPException(status_code=404, detail="Roadmap item not found")
     
-    # Get all questions for this roadmap item
-    questions = db_conn.query(models.QuizQuestion).filter(
-        models.QuizQuestion.roadmap_item_id == roadmap_item_id
-    ).all()
-    
-    # Format the response
-    formatted_questions = []
-    for q in questions:
-        formatted_questions.append({
-            "id": q.id,
-            "question": q.question,
-            "options": json.loads(q.options),
-            "correct": q.correct
-        })
+    version = quiz_cache.roadmap_version(owner.roadmap_id, owner.created_at)
+    payload = quiz_cache.get(roadmap_item_id, version)
     
-    return {
-        "roadmap_item_id": roadmap_item_id,
-        "questions": formatted_questions
-    }
+    if payload is None:
+        rows = (await db_conn.execute(
+            select(*QUESTION_COLUMNS).where(
+                models.QuizQuestion.roadmap_item_id == roadmap_item_id
+            ).order_by(models.QuizQuestion.id)
+        )).all()
+        body = dumps({"roadmap_item_id": roadmap_item_id, "questions": [question_payload(row) for row in rows]})
+        payload = quiz_cache.put(roadmap_item_id, owner.roadmap_id, version, body)
+    
+    # Always revalidate: the ETag tells a new item apart from a deleted one that had its id
+    return cached_response(payload.body, payload.etag, "no-cache", if_none_match)
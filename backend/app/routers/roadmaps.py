@@ -1,16 +1,17 @@
-from dotenv import load_dotenv
-import os
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from google  import genai
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 import json
 from datetime import datetime
 from pydantic import BaseModel, Field
-from app import models, schema, db
-from typing import List, Optional
-from app.routers import knowledge_graph
-
-load_dotenv()
+from app import models, schema, db, llm, jobs, idempotency, metrics, node_index, prompts, quiz_cache, roadmap_cache, discovery_cache, singleflight
+from app.fast_json import json_response
+from app.routers.knowledge_graph import delete_graph_rows, node_degrees
+from app.embeddings import normalize_text
+from typing import List, Literal, Optional, Union
+from app.json_stream import ArrayItemParser
 
 class QuestionAI(BaseModel):
     question: str
@@ -29,15 +30,141 @@ class RoadmapDataAI(BaseModel):
 
 router = APIRouter(prefix="/api/roadmaps")
 
-GEMINI_API_KEY=os.getenv("GEMINI_API_KEY")
-# Use the updated SDK
-client = genai.Client(api_key=GEMINI_API_KEY)
+async def save_roadmap(
+    db_conn: AsyncSession,
+    topic: str,
+    experience: str,
+    items: List[dict],
+    user_id: str = "default_user"
+) -> models.Roadmap:
+    """Persist a roadmap with its items and quiz questions."""
+    db_roadmap = await create_roadmap_record(db_conn, topic, experience, user_id)
+    
+    for item_data in items:
+        await save_roadmap_item(db_conn, db_roadmap.id, item_data)
+    
+    await db_conn.commit()
+    return db_roadmap
+
+
+async def create_roadmap_record(
+    db_conn: AsyncSession,
+    topic: str,
+    experience: str,
+    user_id: str = "default_user"
+) -> models.Roadmap:
+    """Create the roadmap row itself, without items."""
+    db_roadmap = models.Roadmap(
+        user_id=user_id,
+        topic=topic,
+        experience=experience,
+        created_at=datetime.now().isoformat()
+    )
+    db_conn.add(db_roadmap)
+    await db_conn.commit()
+    return db_roadmap
+
+
+async def save_roadmap_item(db_conn: AsyncSession, roadmap_id: int, item_data: dict) -> models.RoadmapItem:
+    """Add one roadmap item and its quiz questions (caller commits)."""
+    # Create roadmap item
+    db_item = models.RoadmapItem(
+        roadmap_id=roadmap_id,
+        title=item_data["title"],
+        summary=item_data["summary"],
+        level=item_data["level"],
+        study_material=item_data["study_material"]
+    )
+    db_conn.add(db_item)
+    await db_conn.flush()  # Get the item ID without committing
+    
+    # Create quiz questions for this item
+    for question_data in item_data["questions"]:
+        db_question = models.QuizQuestion(
+            roadmap_item_id=db_item.id,
+            question=question_data["question"],
+            options=question_data["options"],
+            correct=question_data["correct"]
+        )
+        db_conn.add(db_question)
+    
+    return db_item
+
+
+@router.post("/generate", response_model=schema.RoadmapGenerateResponse)
+async def generate_roadmap(
+    request: schema.RoadmapCreate,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    db_conn: AsyncSession = Depends(db.get_db)
+):
+    """
+    Generate a roadmap (with quiz questions) for a topic and experience level.
+    
+    Headers:
+    - Idempotency-Key: Optional; a retry with the same key returns the stored response
+    
+    Identical requests that arrive while one is being generated share its result.
+    """
+    return await create_roadmap(request, db_conn, idempotency_key, endpoint="generate")
 
 
-@router.post("/generate", response_model=schema.RoadmapResponse)
-async def generate_roadmap(request: schema.RoadmapCreate, db_conn: Session = Depends(db.get_db)):
+async def create_roadmap(
+    request: schema.RoadmapCreate,
+    db_conn: AsyncSession,
+    idempotency_key: Optional[str],
+    endpoint: str
+) -> dict:
+    """Idempotent, coalesced roadmap creation shared by /generate and /accept-suggestion."""
+    params_hash = idempotency.request_hash(request.model_dump())
+    if idempotency_key:
+        stored = await idempotency.lookup(db_conn, idempotency_key, endpoint, params_hash)
+        if stored is not None:
+            return stored
+    
+    flight_key = (
+        "roadmap",
+        normalize_text(request.topic),
+        normalize_text(request.experience),
+        request.user_id
+    )
+    result = await singleflight.run(flight_key, lambda: generate_and_save_roadmap(request))
     
-    prompt = f"""
+    if idempotency_key:
+        await idempotency.store(db_conn, idempotency_key, endpoint, params_hash, result)
+    return result
+
+
+async def generate_and_save_roadmap(request: schema.RoadmapCreate) -> dict:
+    """Generate (or clone from cache) and persist a roadmap, then queue graph linking."""
+    # May be shared by several requests, so it can't use any one request's session
+    async with db.AsyncSessionLocal() as db_conn:
+        # Serve near-identical topics from the cache instead of calling the model
+        cached = await roadmap_cache.lookup(db_conn, request.topic, request.experience)
+        if cached:
+            print(f"✓ Roadmap cache hit for '{request.topic}' (roadmap {cached.roadmap_id})")
+            items = await roadmap_cache.load_items(db_conn, cached)
+        else:
+            items = await generate_roadmap_items(request)
+        
+        db_roadmap = await save_roadmap(db_conn, request.topic, request.experience, items, request.user_id)
+        if not cached:
+            await roadmap_cache.store(db_conn, request.topic, request.experience, db_roadmap.id)
+        
+        # Link this roadmap into the knowledge graph in the background
+        graph_job = await jobs.enqueue(db_conn, "graph.add_roadmap", {"roadmap_id": db_roadmap.id})
+        
+        return {
+            "id": db_roadmap.id,
+            "topic": db_roadmap.topic,
+            "experience": db_roadmap.experience,
+            "items": items,
+            "graph_job_id": graph_job.id
+        }
+
+
+def build_roadmap_prompt(request: schema.RoadmapCreate) -> str:
+    """Prompt asking the model for a roadmap with quiz questions."""
+    return f"""
     Generate a personalized learning roadmap for someone who wants to learn: {request.topic}
     
     Their experience: {request.experience}
@@ -68,142 +195,325 @@ async def generate_roadmap(request: schema.RoadmapCreate, db_conn: Session = Dep
       ]
     }}
     """
-    
-    # Use updated API
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": RoadmapDataAI.model_json_schema(),
-        }
-    )
-    roadmap_data = response.parsed
-    
-    # Save to database (same as before)
-    db_roadmap = models.Roadmap(
-        topic=request.topic,
-        experience=request.experience,
-        created_at=datetime.now().isoformat()
-    )
-    db_conn.add(db_roadmap)
-    db_conn.commit()
-    db_conn.refresh(db_roadmap)
-    
-    for item_data in roadmap_data["items"]:
-        # Create roadmap item
-        db_item = models.RoadmapItem(
-            roadmap_id=db_roadmap.id,
-            title=item_data["title"],
-            summary=item_data["summary"],
-            level=item_data["level"],
-            study_material=json.dumps(item_data["study_material"])
+
+
+async def generate_roadmap_items(request: schema.RoadmapCreate) -> List[dict]:
+    """Ask the model for roadmap items (with quiz questions) for this request."""
+    try:
+        roadmap_data = await llm.generate_json(
+            build_roadmap_prompt(request),
+            RoadmapDataAI.model_json_schema()
         )
-        db_conn.add(db_item)
-        db_conn.flush()  # Get the item ID without committing
+    except llm.LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=f"Roadmap generation timed out: {str(e)}")
+    
+    return roadmap_data["items"]
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_roadmap_events(request: schema.RoadmapCreate):
+    """
+    Generate a roadmap and yield SSE messages as it is built.
+    Each item is saved and emitted as soon as the model has finished writing it.
+    """
+    # The request-scoped session may be closed before a streamed body finishes
+    db_conn = db.AsyncSessionLocal()
+    roadmap_id = None
+    completed = False
+    try:
+        cached = await roadmap_cache.lookup(db_conn, request.topic, request.experience)
+        db_roadmap = await create_roadmap_record(db_conn, request.topic, request.experience, request.user_id)
+        roadmap_id = db_roadmap.id
+        yield sse_event("roadmap", {
+            "id": db_roadmap.id,
+            "topic": db_roadmap.topic,
+            "experience": db_roadmap.experience,
+            "cached": cached is not None
+        })
         
-        # Create quiz questions for this item
-        for question_data in item_data["questions"]:
-            db_question = models.QuizQuestion(
-                roadmap_item_id=db_item.id,
-                question=question_data["question"],
-                options=json.dumps(question_data["options"]),
-                correct=question_data["correct"]
-            )
-            db_conn.add(db_question)
+        if cached:
+            item_batches = _single_batch(await roadmap_cache.load_items(db_conn, cached))
+        else:
+            item_batches = stream_roadmap_items(request)
+        
+        item_count = 0
+        async for items in item_batches:
+            for item_data in items:
+                db_item = await save_roadmap_item(db_conn, db_roadmap.id, item_data)
+                await db_conn.commit()
+                item_count += 1
+                yield sse_event("item", {"id": db_item.id, **item_data})
+        
+        if item_count == 0:
+            raise ValueError("Model returned no roadmap items")
+        
+        if not cached:
+            await roadmap_cache.store(db_conn, request.topic, request.experience, db_roadmap.id)
+        
+        # Link this roadmap into the knowledge graph in the background
+        graph_job = await jobs.enqueue(db_conn, "graph.add_roadmap", {"roadmap_id": roadmap_id})
+        completed = True
+        
+        yield sse_event("done", {"id": roadmap_id, "item_count": item_count, "graph_job_id": graph_job.id})
     
-    db_conn.commit()
+    except Exception as e:
+        yield sse_event("error", {"detail": f"Failed to generate roadmap: {str(e)}"})
     
-    # Incrementally add this roadmap to the knowledge graph
-    await knowledge_graph.add_roadmap_to_graph(db_roadmap.id, db_conn)
+    finally:
+        # Also runs when the client disconnects (the generator is cancelled or closed),
+        # so shield the cleanup from that cancellation
+        await asyncio.shield(close_roadmap_stream(db_conn, None if completed else roadmap_id))
+
+
+async def close_roadmap_stream(db_conn: AsyncSession, partial_roadmap_id: Optional[int]):
+    """Close a stream's session and delete its roadmap if generation didn't finish."""
+    await db_conn.close()
+    if partial_roadmap_id is None:
+        return
+    # Don't leave a half-written roadmap behind
+    async with db.AsyncSessionLocal() as cleanup_conn:
+        await delete_roadmaps(cleanup_conn, [partial_roadmap_id])
+        await cleanup_conn.commit()
+    roadmap_cache.unindex_roadmaps([partial_roadmap_id])
+    quiz_cache.forget_roadmaps([partial_roadmap_id])
+    print(f"➖ Removed partial roadmap {partial_roadmap_id}")
+
+
+async def stream_roadmap_items(request: schema.RoadmapCreate):
+    """Yield lists of roadmap items as they complete in the model's streamed output."""
+    parser = ArrayItemParser("items")
+    item_count = 0
+    async for chunk in llm.stream_json(
+        build_roadmap_prompt(request),
+        RoadmapDataAI.model_json_schema()
+    ):
+        items = parser.feed(chunk)
+        if items:
+            item_count += len(items)
+            yield items
+    
+    if item_count == 0:
+        metrics.LLM_PARSE_FAILURES.labels(metrics.current_caller()).inc()
+
+
+async def _single_batch(items: List[dict]):
+    yield items
+
+
+@router.post("/generate/stream")
+async def generate_roadmap_stream(request: schema.RoadmapCreate):
+    """
+    Generate a roadmap and stream it as Server-Sent Events.
     
-    return {
-        "id": db_roadmap.id,
-        "topic": db_roadmap.topic,
-        "experience": db_roadmap.experience,
-        "items": roadmap_data["items"]
-    }
+    Events:
+    - roadmap: The new roadmap's id, topic and experience (sent first)
+    - item: One roadmap item with its questions, sent as soon as it is saved
+    - done: Generation finished; graph linking was queued as graph_job_id
+    - error: Generation failed; the partial roadmap has been removed
+    """
+    return StreamingResponse(
+        stream_roadmap_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
 
-@router.get("/", response_model=List[schema.RoadmapResponse])
-async def get_roadmaps(db_conn: Session = Depends(db.get_db)):
+
+@router.get("/", response_model=Union[List[schema.RoadmapResponse], List[schema.RoadmapSummary]])
+async def get_roadmaps(
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[int] = Query(default=None, description="Return roadmaps older than this id (from X-Next-Cursor)"),
+    view: Literal["full", "summary"] = Query(default="full", description="'summary' omits items and study materials"),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    """
+    List roadmaps, newest first, one page at a time.
     
-    roadmaps = db_conn.query(models.Roadmap).all()
-    result = []
+    Query parameters:
+    - limit: Page size (default 100, max 500)
+    - cursor: Id of the last roadmap on the previous page
+    - view: "full" (with items) or "summary" (id, topic, experience, item_count)
     
-    for roadmap in roadmaps:
-        items = db_conn.query(models.RoadmapItem).filter(
-            models.RoadmapItem.roadmap_id == roadmap.id
-        ).all()
+    Response headers:
+    - X-Next-Cursor / Link: Present when there is another page
+    """
+    query = select(models.Roadmap.id, models.Roadmap.topic, models.Roadmap.experience, models.Roadmap.created_at)
+    if cursor is not None:
+        query = query.where(models.Roadmap.id < cursor)
+    # Fetch one extra row to know whether another page exists
+    roadmaps = (await db_conn.execute(query.order_by(models.Roadmap.id.desc()).limit(limit + 1))).all()
+    
+    headers = {}
+    if len(roadmaps) > limit:
+        roadmaps = roadmaps[:limit]
+        next_cursor = roadmaps[-1].id
+        headers["X-Next-Cursor"] = str(next_cursor)
+        headers["Link"] = f'</api/roadmaps/?limit={limit}&cursor={next_cursor}&view={view}>; rel="next"'
+    
+    roadmap_ids = [roadmap.id for roadmap in roadmaps]
+    
+    # Rows are built from typed columns, so they skip response_model validation (see app/fast_json.py)
+    if view == "summary":
+        item_counts = dict((await db_conn.execute(
+            select(models.RoadmapItem.roadmap_id, func.count(models.RoadmapItem.id)).where(
+                models.RoadmapItem.roadmap_id.in_(roadmap_ids)
+            ).group_by(models.RoadmapItem.roadmap_id)
+        )).all()) if roadmap_ids else {}
         
-        result.append({
+        return json_response([
+            {
+                "id": roadmap.id,
+                "topic": roadmap.topic,
+                "experience": roadmap.experience,
+                "created_at": roadmap.created_at,
+                "item_count": item_counts.get(roadmap.id, 0)
+            }
+            for roadmap in roadmaps
+        ], headers=headers)
+    
+    # One batched item query for the whole page
+    items_by_roadmap = {roadmap_id: [] for roadmap_id in roadmap_ids}
+    if roadmap_ids:
+        items = (await db_conn.execute(select(
+            models.RoadmapItem.id,
+            models.RoadmapItem.roadmap_id,
+            models.RoadmapItem.title,
+            models.RoadmapItem.summary,
+            models.RoadmapItem.level,
+            models.RoadmapItem.study_material
+        ).where(
+            models.RoadmapItem.roadmap_id.in_(roadmap_ids)
+        ).order_by(models.RoadmapItem.id))).all()
+        for item in items:
+            items_by_roadmap[item.roadmap_id].append({
+                "id": item.id,
+                "title": item.title,
+                "summary": item.summary,
+                "level": item.level,
+                "study_material": item.study_material
+            })
+    
+    return json_response([
+        {
             "id": roadmap.id,
             "topic": roadmap.topic,
             "experience": roadmap.experience,
-            "items": [
-                {
-                    "id": item.id,
-                    "title": item.title,
-                    "summary": item.summary,
-                    "level": item.level,
-                    "study_material": json.loads(item.study_material)
-                }
-                for item in items
-            ]
-        })
+            "items": items_by_roadmap[roadmap.id]
+        }
+        for roadmap in roadmaps
+    ], headers=headers)
+
+
+async def delete_roadmaps(db_conn: AsyncSession, roadmap_ids: List[int]) -> List[int]:
+    """
+    Delete roadmaps together with everything that hangs off them (caller commits).
     
-    return result
+    Items, quiz questions, progress, cache entries and graph nodes/edges are
+    removed by ON DELETE CASCADE; graph removals are logged first so clients
+    syncing the graph see them. Returns the ids that existed and were deleted.
+    """
+    existing_ids = list((await db_conn.scalars(
+        select(models.Roadmap.id).where(models.Roadmap.id.in_(roadmap_ids))
+    )).all())
+    if not existing_ids:
+        return []
+    
+    await delete_graph_rows(db_conn, existing_ids)
+    
+    # Stop serving these roadmaps from the generation cache
+    await roadmap_cache.forget_roadmaps(db_conn, existing_ids)
+    # Suggestions based on progress in these roadmaps are out of date
+    await discovery_cache.forget_roadmaps(db_conn, existing_ids)
+    
+    await db_conn.execute(delete(models.Roadmap).where(
+        models.Roadmap.id.in_(existing_ids)
+    ).execution_options(synchronize_session=False))
+    return existing_ids
+
+
+async def finish_roadmap_deletion(db_conn: AsyncSession, roadmap_ids: List[int]):
+    """In-process index and cache upkeep after deleted roadmaps are committed."""
+    for roadmap_id in roadmap_ids:
+        node_index.remove_roadmap(roadmap_id)
+    roadmap_cache.unindex_roadmaps(roadmap_ids)
+    quiz_cache.forget_roadmaps(roadmap_ids)
+    await jobs.enqueue(db_conn, "graph.layout", dedupe=True)
 
 
 @router.delete("/{roadmap_id}")
-async def delete_roadmap(roadmap_id: int, db_conn: Session = Depends(db.get_db)):
-    """Delete a roadmap and all its associated items and questions."""
-    
-    # Check if roadmap exists
-    roadmap = db_conn.query(models.Roadmap).filter(models.Roadmap.id == roadmap_id).first()
-    if not roadmap:
-        raise HTTPException(status_code=404, detail="Roadmap not found")
+async def delete_roadmap(roadmap_id: int, db_conn: AsyncSession = Depends(db.get_db)):
+    """Delete a roadmap with its items, questions, progress and graph nodes in one transaction."""
     
     try:
-        # Get all roadmap items for this roadmap
-        roadmap_items = db_conn.query(models.RoadmapItem).filter(
-            models.RoadmapItem.roadmap_id == roadmap_id
-        ).all()
-        
-        # Get roadmap item IDs to delete associated quiz questions and progress
-        item_ids = [item.id for item in roadmap_items]
-        
-        # Delete quiz questions associated with these items
-        if item_ids:
-            db_conn.query(models.QuizQuestion).filter(
-                models.QuizQuestion.roadmap_item_id.in_(item_ids)
-            ).delete(synchronize_session=False)
-            
-            # Delete quiz progress for these items
-            db_conn.query(models.QuizProgress).filter(
-                models.QuizProgress.roadmap_item_id.in_(item_ids)
-            ).delete(synchronize_session=False)
-        
-        # Delete roadmap items
-        db_conn.query(models.RoadmapItem).filter(
-            models.RoadmapItem.roadmap_id == roadmap_id
-        ).delete(synchronize_session=False)
-        
-        # Delete the roadmap itself
-        db_conn.delete(roadmap)
+        deleted_ids = await delete_roadmaps(db_conn, [roadmap_id])
+        if not deleted_ids:
+            raise HTTPException(status_code=404, detail="Roadmap not found")
         
         # Commit all changes
-        db_conn.commit()
-        
-        # Incrementally remove this roadmap from the knowledge graph
-        await knowledge_graph.remove_roadmap_from_graph(roadmap_id, db_conn)
+        await db_conn.commit()
+        await finish_roadmap_deletion(db_conn, deleted_ids)
         
         return {"message": f"Roadmap {roadmap_id} successfully deleted"}
     
+    except HTTPException:
+        raise
     except Exception as e:
-        db_conn.rollback()
+        await db_conn.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete roadmap: {str(e)}")
 
 
+class BulkDeleteRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+
+class BulkDeleteResponse(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
+
+@router.post("/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_roadmaps(request: BulkDeleteRequest, db_conn: AsyncSession = Depends(db.get_db)):
+    """
+    Delete many roadmaps in a single transaction.
+    
+    Request body:
+    - ids: Roadmap ids to delete (up to 500)
+    
+    Returns:
+    - deleted: Ids that were deleted
+    - not_found: Ids that didn't exist (ignored)
+    """
+    try:
+        deleted_ids = await delete_roadmaps(db_conn, request.ids)
+        await db_conn.commit()
+        await finish_roadmap_deletion(db_conn, deleted_ids)
+    except Exception as e:
+        await db_conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to delete roadmaps: {str(e)}")
+    
+    deleted = set(deleted_ids)
+    return {
+        "deleted": sorted(deleted),
+        "not_found": sorted({roadmap_id for roadmap_id in request.ids if roadmap_id not in deleted})
+    }
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters for the semantic roadmap cache in this process.
+    
+    Returns:
+    - hits, misses, evictions, current entry count and hit rate
+    """
+    return roadmap_cache.stats()
+
+
 class TopicSuggestion(BaseModel):
     topic: str
     reason: str
@@ -216,68 +526,11 @@ class DiscoveryResponse(BaseModel):
     turtle_message: str
 
 
-@router.post("/discover")
-async def discover_topics(
-    user_id: str = "default_user",
-    db_conn: Session = Depends(db.get_db)
-):
-    """
-    AI-powered topic discovery based on completed topics.
-    Analyzes user's learning journey and suggests new topics to explore.
-    
-    Query parameters:
-    - user_id: User identifier (defaults to "default_user")
-    
-    Returns:
-    - 3 curated topic suggestions (related, advanced, adjacent)
-    - Personalized turtle guide message
-    """
-    # Get user's completed topics
-    completed_progress = db_conn.query(models.QuizProgress).filter(
-        models.QuizProgress.user_id == user_id,
-        models.QuizProgress.score == models.QuizProgress.total_questions
-    ).all()
-    
-    if not completed_progress:
-        raise HTTPException(status_code=400, detail="No completed topics yet")
-    
-    # Get completed item details
-    item_ids = [p.roadmap_item_id for p in completed_progress]
-    completed_items = db_conn.query(models.RoadmapItem).filter(
-        models.RoadmapItem.id.in_(item_ids)
-    ).all()
-    
-    # Get roadmap topics
-    roadmap_ids = list(set([item.roadmap_id for item in completed_items]))
-    roadmaps = db_conn.query(models.Roadmap).filter(
-        models.Roadmap.id.in_(roadmap_ids)
-    ).all()
-    
-    # Build completed topics list
-    completed_topics_data = []
-    for item in completed_items:
-        roadmap = next((r for r in roadmaps if r.id == item.roadmap_id), None)
-        if roadmap:
-            completed_topics_data.append({
-                "title": item.title,
-                "roadmap_topic": roadmap.topic,
-                "level": item.level,
-                "summary": item.summary
-            })
-    
-    # Get existing graph connections for context
-    graph_nodes = db_conn.query(models.KnowledgeGraphNode).filter(
-        models.KnowledgeGraphNode.node_type == "title"
-    ).all()
-    
-    graph_edges = db_conn.query(models.KnowledgeGraphEdge).all()
-    
-    # Create AI prompt for discovery
-    discovery_prompt = f"""
+DISCOVERY_PROMPT = """
     You are a wise, shy turtle guide helping a learner discover new topics on their learning journey.
     
-    The learner has completed these topics:
-    {json.dumps(completed_topics_data, indent=2)}
+    The learner has completed these topics (most recent first):
+    {completed_topics}
     
     Based on their learning journey, suggest 3 NEW topics they should explore:
     
@@ -306,46 +559,143 @@ async def discover_topics(
       "turtle_message": "H-hello explorer... I noticed you've been learning about..."
     }}
     """
-    
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=discovery_prompt,
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": {
-                    "type": "object",
-                    "properties": {
-                        "suggestions": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "topic": {"type": "string"},
-                                    "reason": {"type": "string"},
-                                    "suggestion_type": {"type": "string"},
-                                    "description": {"type": "string"}
-                                },
-                                "required": ["topic", "reason", "suggestion_type", "description"]
-                            }
-                        },
-                        "turtle_message": {"type": "string"}
-                    },
-                    "required": ["suggestions", "turtle_message"]
-                }
+
+# Summaries are cut to this many characters in the discovery prompt
+DISCOVERY_SUMMARY_CHARS = 160
+
+
+async def generate_discovery(user_id: str) -> Optional[dict]:
+    """
+    Ask the model for topic suggestions based on the user's completed topics.
+    Returns None if the user hasn't completed anything yet (or nothing fits the prompt budget).
+    """
+    # May be shared by several callers, so it reads through its own session,
+    # which is released before the model call
+    async with db.AsyncReadSessionLocal() as db_conn:
+        # Completed items with their roadmap topics
+        completed = (await db_conn.execute(
+            select(models.RoadmapItem, models.Roadmap.topic, models.QuizProgress.completed_at).join(
+                models.QuizProgress, models.QuizProgress.roadmap_item_id == models.RoadmapItem.id
+            ).join(
+                models.Roadmap, models.Roadmap.id == models.RoadmapItem.roadmap_id
+            ).where(
+                models.QuizProgress.user_id == user_id,
+                models.QuizProgress.score == models.QuizProgress.total_questions
+            )
+        )).all()
+        degrees = await node_degrees(db_conn, [f"title_{item.id}" for item, _, _ in completed]) if completed else {}
+    
+    if not completed:
+        return None
+    
+    # Rank for the prompt budget: most recent, then most connected in the graph; one entry per title
+    ranked = prompts.dedupe(
+        sorted(
+            completed,
+            key=lambda row: (row.completed_at, degrees[f"title_{row[0].id}"], row[0].id),
+            reverse=True
+        ),
+        key=lambda row: normalize_text(row[0].title)
+    )
+    discovery_prompt, kept = prompts.build("discovery", DISCOVERY_PROMPT, {
+        "completed_topics": [
+            {
+                "title": item.title,
+                "roadmap_topic": topic,
+                "level": item.level,
+                "summary": prompts.truncate(item.summary, DISCOVERY_SUMMARY_CHARS)
             }
-        )
-        
-        discovery_data = response.parsed
-        
-        return {
-            "suggestions": discovery_data["suggestions"],
-            "completed_topics": [item["title"] for item in completed_topics_data],
-            "turtle_message": discovery_data["turtle_message"]
+            for item, topic, _ in ranked
+        ]
+    })
+    if not kept["completed_topics"]:
+        print("⏭️ No completed topic fits the discovery prompt budget; skipping discovery")
+        return None
+    
+    discovery_data = await llm.generate_json(
+        discovery_prompt,
+        {
+            "type": "object",
+            "properties": {
+                "suggestions": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "topic": {"type": "string"},
+                            "reason": {"type": "string"},
+                            "suggestion_type": {"type": "string"},
+                            "description": {"type": "string"}
+                        },
+                        "required": ["topic", "reason", "suggestion_type", "description"]
+                    }
+                },
+                "turtle_message": {"type": "string"}
+            },
+            "required": ["suggestions", "turtle_message"]
         }
-        
+    )
+    
+    return {
+        "suggestions": discovery_data["suggestions"],
+        "completed_topics": [item.title for item, _, _ in ranked],
+        "turtle_message": discovery_data["turtle_message"]
+    }
+
+
+async def compute_discovery(user_id: str, at_milestone: int) -> Optional[dict]:
+    """generate_discovery(), sharing one model call per (user, milestone) in this process."""
+    return await singleflight.run(("discovery", user_id, at_milestone), lambda: generate_discovery(user_id))
+
+
+@jobs.handler("discovery.precompute")
+async def precompute_discovery_job(payload: dict, db_conn: AsyncSession):
+    """Compute a user's suggestions for an upcoming milestone ahead of time."""
+    user_id, at_milestone = payload["user_id"], payload["milestone"]
+    if await discovery_cache.lookup(db_conn, user_id, at_milestone):
+        return
+    discovery = await compute_discovery(user_id, at_milestone)
+    if discovery:
+        await discovery_cache.store(db_conn, user_id, at_milestone, discovery)
+
+
+@router.post("/discover")
+async def discover_topics(
+    user_id: str = "default_user",
+    db_conn: AsyncSession = Depends(db.get_db)
+):
+    """
+    AI-powered topic discovery based on completed topics.
+    Analyzes user's learning journey and suggests new topics to explore.
+    
+    Suggestions are computed once per discovery milestone (usually ahead of
+    time by a background job) and served from the discovery cache after that.
+    
+    Query parameters:
+    - user_id: User identifier (defaults to "default_user")
+    
+    Returns:
+    - 3 curated topic suggestions (related, advanced, adjacent)
+    - Personalized turtle guide message
+    """
+    profile = await db_conn.get(models.UserProfile, user_id)
+    at_milestone = discovery_cache.milestone(profile.total_unlocks if profile else 0)
+    
+    cached = await discovery_cache.lookup(db_conn, user_id, at_milestone)
+    if cached:
+        return cached
+    
+    try:
+        discovery = await compute_discovery(user_id, at_milestone)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate suggestions: {str(e)}")
+    
+    if discovery is None:
+        raise HTTPException(status_code=400, detail="No completed topics yet")
+    
+    await discovery_cache.store(db_conn, user_id, at_milestone, discovery)
+    # Another request may have stored first; serve what was kept
+    return await discovery_cache.lookup(db_conn, user_id, at_milestone) or discovery
 
 
 @router.post("/accept-suggestion")
@@ -353,7 +703,8 @@ async def accept_suggestion(
     topic: str = Query(..., description="The suggested topic to generate roadmap for"),
     experience: str = Query(default="Beginner", description="Experience level"),
     user_id: str = Query(default="default_user", description="User identifier"),
-    db_conn: Session = Depends(db.get_db)
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    db_conn: AsyncSession = Depends(db.get_db)
 ):
     """
     Accept a suggested topic and generate a full roadmap for it.
@@ -363,9 +714,12 @@ async def accept_suggestion(
     - experience: User's experience level (default: "Beginner")
     - user_id: User identifier (defaults to "default_user")
     
+    Headers:
+    - Idempotency-Key: Optional; a retry with the same key returns the stored response
+    
     Returns:
     - Generated roadmap with items and questions
     """
     # Use existing generate_roadmap logic
-    request = schema.RoadmapCreate(topic=topic, experience=experience)
-    return await generate_roadmap(request, db_conn)
+    request = schema.RoadmapCreate(topic=topic, experience=experience, user_id=user_id)
+    return await create_roadmap(request, db_conn, idempotency_key, endpoint="accept-suggestion")
@@ -1,9 +1,10 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class RoadmapCreate(BaseModel):
     topic: str
     experience: str
+    user_id: str = "default_user"
 
 class RoadmapResponse(BaseModel):
     id: int
@@ -11,6 +12,16 @@ class RoadmapResponse(BaseModel):
     experience: str
     items: List[dict]
 
+class RoadmapSummary(BaseModel):
+    id: int
+    topic: str
+    experience: str
+    created_at: Optional[str] = None
+    item_count: int
+
+class RoadmapGenerateResponse(RoadmapResponse):
+    graph_job_id: Optional[int] = None  # background job linking it into the knowledge graph
+
 class QuizQuestion(BaseModel):
     question: str
     options: List[str]
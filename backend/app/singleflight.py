@@ -0,0 +1,25 @@
+"""
+Coalesce identical in-flight async calls.
+
+While a call for a key is running, further callers with the same key
+await the same result instead of starting their own call. The shared call
+is shielded, so one caller disconnecting doesn't cancel it for the rest.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+_in_flight: Dict[Hashable, asyncio.Task] = {}
+
+
+async def run(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """Run factory() unless a call with this key is already in flight; return its result."""
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    else:
+        print(f"⏳ Joining in-flight call for {key}")
+    return await asyncio.shield(task)
+
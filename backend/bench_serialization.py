@@ -0,0 +1,193 @@
+"""
+Benchmark response serialization for GET /api/roadmaps/ and /api/quiz/{id}.
+
+Runs the API in-process against a temporary SQLite database filled with
+generated roadmaps. "before" is the previous implementation, mounted
+under /legacy: JSON text columns decoded with json.loads row by row, and
+dicts returned through the response_model. "after" is the current code:
+native JSON columns decoded by orjson and bodies encoded once by orjson.
+
+Per-row cost for the roadmap list is the slope between a small and a
+large page, so fixed per-request overhead (routing, the test client)
+cancels out. Quiz requests are compared against a cache hit, which does
+no database or encoding work.
+
+Usage:
+    python bench_serialization.py
+    python bench_serialization.py --roadmaps 500 --items 12 --repeats 30
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# The database URL is read when app.db is imported
+_workdir = tempfile.mkdtemp(prefix="bench_serialization_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/bench.db"
+os.environ["JOBS_RUN_IN_PROCESS"] = "false"
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.testclient import TestClient
+from sqlalchemy import String, insert, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app import db, migrations, models, quiz_cache, schema
+from app.app import app
+from app.routers.quiz import QuizResponse
+
+legacy = APIRouter(prefix="/legacy")
+
+
+@legacy.get("/roadmaps/", response_model=List[schema.RoadmapResponse])
+async def legacy_get_roadmaps(
+    limit: int = Query(default=100),
+    cursor: Optional[int] = Query(default=None),
+    db_conn: AsyncSession = Depends(db.get_read_db)
+):
+    query = select(models.Roadmap)
+    if cursor is not None:
+        query = query.where(models.Roadmap.id < cursor)
+    roadmaps = (await db_conn.scalars(query.order_by(models.Roadmap.id.desc()).limit(limit + 1))).all()[:limit]
+    roadmap_ids = [roadmap.id for roadmap in roadmaps]
+    items_by_roadmap = {roadmap_id: [] for roadmap_id in roadmap_ids}
+    items = (await db_conn.execute(select(
+        models.RoadmapItem,
+        type_coerce(models.RoadmapItem.study_material, String).label("study_material_text")
+    ).where(
+        models.RoadmapItem.roadmap_id.in_(roadmap_ids)
+    ).order_by(models.RoadmapItem.id))).all()
+    for item, study_material_text in items:
+        items_by_roadmap[item.roadmap_id].append({
+            "id": item.id,
+            "title": item.title,
+            "summary": item.summary,
+            "level": item.level,
+            "study_material": json.loads(study_material_text)
+        })
+    return [
+        {"id": roadmap.id, "topic": roadmap.topic, "experience": roadmap.experience, "items": items_by_roadmap[roadmap.id]}
+        for roadmap in roadmaps
+    ]
+
+
+@legacy.get("/quiz/{roadmap_item_id}", response_model=QuizResponse)
+async def legacy_get_quiz_questions(roadmap_item_id: int, db_conn: AsyncSession = Depends(db.get_read_db)):
+    if not await db_conn.get(models.RoadmapItem, roadmap_item_id):
+        raise HTTPException(status_code=404, detail="Roadmap item not found")
+    questions = (await db_conn.execute(select(
+        models.QuizQuestion,
+        type_coerce(models.QuizQuestion.options, String).label("options_text")
+    ).where(models.QuizQuestion.roadmap_item_id == roadmap_item_id))).all()
+    return {
+        "roadmap_item_id": roadmap_item_id,
+        "questions": [
+            {"id": q.id, "question": q.question, "options": json.loads(options_text), "correct": q.correct}
+            for q, options_text in questions
+        ]
+    }
+
+
+app.include_router(legacy)
+
+
+def seed(roadmap_count: int, items_per_roadmap: int, questions_per_item: int) -> List[int]:
+    """Fill the database and return the roadmap item ids."""
+    migrations.upgrade(db.engine)
+    with db.engine.begin() as conn:
+        conn.execute(insert(models.Roadmap), [
+            {"id": r, "topic": f"Topic {r}", "experience": "Some experience", "created_at": "2025-01-01T00:00:00"}
+            for r in range(1, roadmap_count + 1)
+        ])
+        items = [
+            {
+                "id": (r - 1) * items_per_roadmap + i,
+                "roadmap_id": r,
+                "title": f"Item {i} of topic {r}",
+                "summary": "A short summary of what this step covers and why it matters. " * 3,
+                "level": i,
+                "study_material": [f"https://example.com/{r}/{i}/{n}" for n in range(3)]
+            }
+            for r in range(1, roadmap_count + 1) for i in range(1, items_per_roadmap + 1)
+        ]
+        conn.execute(insert(models.RoadmapItem), items)
+        conn.execute(insert(models.QuizQuestion), [
+            {
+                "roadmap_item_id": item["id"],
+                "question": f"Question {q} about {item['title']}?",
+                "options": [f"Option {o}" for o in "ABCD"],
+                "correct": q % 4
+            }
+            for item in items for q in range(questions_per_item)
+        ])
+    return [item["id"] for item in items]
+
+
+def time_requests(client: TestClient, paths: List[str], repeats: int, before_each=None) -> float:
+    """Median seconds per request over `repeats` passes through `paths`."""
+    for path in paths[:3]:
+        client.get(path)  # warm up
+    samples = []
+    for _ in range(repeats):
+        for path in paths:
+            if before_each:
+                before_each()
+            started = time.perf_counter()
+            response = client.get(path)
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200, (path, response.status_code)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark roadmap and quiz response serialization")
+    parser.add_argument("--roadmaps", type=int, default=300, help="Roadmaps to generate")
+    parser.add_argument("--items", type=int, default=10, help="Items per roadmap")
+    parser.add_argument("--questions", type=int, default=4, help="Quiz questions per item")
+    parser.add_argument("--repeats", type=int, default=20, help="Timed passes per measurement")
+    args = parser.parse_args()
+
+    small_page, large_page = 10, min(args.roadmaps, 300)
+    if large_page <= small_page:
+        print(f"❌ Need more than {small_page} roadmaps")
+        sys.exit(1)
+
+    item_ids = seed(args.roadmaps, args.items, args.questions)
+    client = TestClient(app)
+    print(f"🔄 {args.roadmaps} roadmaps x {args.items} items x {args.questions} questions")
+
+    print("\nGET /api/roadmaps/ (per item row, from the slope between pages of "
+          f"{small_page} and {large_page} roadmaps)")
+    rows = (large_page - small_page) * args.items
+    results = {}
+    for label, prefix in (("before", "/legacy/roadmaps/"), ("after", "/api/roadmaps/")):
+        small = time_requests(client, [f"{prefix}?limit={small_page}"], args.repeats)
+        large = time_requests(client, [f"{prefix}?limit={large_page}"], args.repeats)
+        results[label] = (large - small) / rows
+        print(f"  {label:>6}: {large * 1000:7.2f} ms/page of {large_page}, {results[label] * 1e6:6.2f} µs/row")
+    print(f"  speedup: {results['before'] / results['after']:.1f}x per row")
+
+    print(f"\nGET /api/quiz/{{id}} ({args.questions} questions per item)")
+    sample_ids = item_ids[::max(1, len(item_ids) // 200)]
+    paths = {
+        "before": [f"/legacy/quiz/{item_id}" for item_id in sample_ids],
+        "after": [f"/api/quiz/{item_id}" for item_id in sample_ids],
+    }
+    before = time_requests(client, paths["before"], args.repeats)
+    after_cold = time_requests(client, paths["after"], args.repeats, before_each=quiz_cache._entries.clear)
+    after_warm = time_requests(client, paths["after"], args.repeats)
+    # A cache hit does no database or encoding work, so it is the fixed cost of a request
+    for label, seconds in (("before", before), ("after (cache miss)", after_cold), ("after (cache hit)", after_warm)):
+        print(f"  {label:>18}: {seconds * 1e6:7.1f} µs/request, {(seconds - after_warm) * 1e6:7.1f} µs above a cache hit")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(_workdir, ignore_errors=True)
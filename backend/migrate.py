@@ -0,0 +1,44 @@
+"""
+Apply database schema migrations.
+
+Usage:
+    python migrate.py            # apply all pending migrations
+    python migrate.py --to 3     # apply pending migrations up to version 3
+    python migrate.py status     # show current and pending versions
+
+Non-interactive, so it can run from deploy scripts before the API starts.
+"""
+
+import argparse
+import sys
+
+from app import migrations
+from app.db import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    parser.add_argument("--to", type=int, default=None, help="Stop after this migration version")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(f"Current version: {migrations.current_version(engine)}")
+        print(f"Latest version:  {migrations.latest_version()}")
+        for step in migrations.pending(engine):
+            print(f"  pending {step.version}: {step.description}")
+        return
+
+    applied = migrations.upgrade(engine, target=args.to)
+    if applied:
+        print(f"✓ Database at version {migrations.current_version(engine)} ({len(applied)} migrations applied)")
+    else:
+        print(f"✓ Database already at version {migrations.current_version(engine)}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
@@ -2,13 +2,12 @@
 Seed the database with static demo data for roadmaps, quiz questions, and knowledge graph.
 """
 import os
-import json
 from datetime import datetime
-from app.db import get_db, engine
+from app.db import SessionLocal
 from app import models
 
 def seed_database():
-    db = next(get_db())
+    db = SessionLocal()
 
     # Clear existing data (optional, for clean seeding)
     db.query(models.QuizProgress).delete()
@@ -124,7 +123,7 @@ def seed_database():
             title=item_data['title'],
             summary=item_data['summary'],
             level=item_data['level'],
-            study_material=json.dumps(item_data['study_material'])
+            study_material=item_data['study_material']
         )
         db.add(item)
         db.flush()
@@ -135,7 +134,7 @@ def seed_database():
             question = models.QuizQuestion(
                 roadmap_item_id=item.id,
                 question=q_data['question'],
-                options=json.dumps(q_data['options']),
+                options=q_data['options'],
                 correct=q_data['correct']
             )
             db.add(question)
@@ -243,7 +242,7 @@ def seed_database():
             title=item_data['title'],
             summary=item_data['summary'],
             level=item_data['level'],
-            study_material=json.dumps(item_data['study_material'])
+            study_material=item_data['study_material']
         )
         db.add(item)
         db.flush()
@@ -254,7 +253,7 @@ def seed_database():
             question = models.QuizQuestion(
                 roadmap_item_id=item.id,
                 question=q_data['question'],
-                options=json.dumps(q_data['options']),
+                options=q_data['options'],
                 correct=q_data['correct']
             )
             db.add(question)
@@ -285,6 +284,7 @@ def seed_database():
             created_at=datetime.utcnow()
         )
         db.add(title_node)
+        db.flush()  # edges reference nodes by foreign key
 
         # Intra-roadmap edge
         edge = models.KnowledgeGraphEdge(
@@ -317,6 +317,7 @@ def seed_database():
             created_at=datetime.utcnow()
         )
         db.add(title_node)
+        db.flush()  # edges reference nodes by foreign key
 
         # Intra-roadmap edge
         edge = models.KnowledgeGraphEdge(
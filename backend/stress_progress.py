@@ -0,0 +1,91 @@
+"""
+Concurrency stress check for quiz completion.
+
+Fires many overlapping POST /api/progress/complete requests at a running
+API, with every item submitted several times at once, for a fresh user.
+Afterwards the user must have exactly one unlock per item: no duplicate
+QuizProgress rows and no lost or doubled total_unlocks increments.
+
+Usage (with the API running and at least one roadmap in the database):
+    python stress_progress.py                          # against http://localhost:8000
+    python stress_progress.py --url http://host:8000 --repeats 10 --threads 32
+
+Exits with status 1 if any count is wrong.
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def request(url: str, body: dict = None) -> dict:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress concurrent quiz completions")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--items", type=int, default=50, help="Roadmap items to complete")
+    parser.add_argument("--repeats", type=int, default=5, help="Concurrent submissions per item")
+    parser.add_argument("--threads", type=int, default=16, help="Requests in flight at once")
+    args = parser.parse_args()
+
+    roadmaps = request(f"{args.url}/api/roadmaps/?limit=500")
+    item_ids = [item["id"] for roadmap in roadmaps for item in roadmap["items"]][:args.items]
+    if not item_ids:
+        print("❌ No roadmap items found; generate or seed a roadmap first")
+        sys.exit(1)
+
+    user_id = f"stress_{uuid.uuid4().hex[:8]}"
+    submissions = [item_id for item_id in item_ids for _ in range(args.repeats)]
+    print(f"🔄 {len(submissions)} completions of {len(item_ids)} items for {user_id} ({args.threads} threads)")
+
+    def complete(item_id: int) -> dict:
+        try:
+            return request(f"{args.url}/api/progress/complete", {
+                "roadmap_item_id": item_id,
+                "score": 4,
+                "total_questions": 4,
+                "user_id": user_id
+            })
+        except urllib.error.HTTPError as e:
+            return {"success": False, "roadmap_item_id": item_id, "error": f"HTTP {e.code}: {e.read()[:200]}"}
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(complete, submissions))
+    elapsed = time.monotonic() - started
+
+    new_unlocks = Counter(result["roadmap_item_id"] for result in results if result.get("is_new_unlock"))
+    unlocked_ids = request(f"{args.url}/api/progress/unlocked?user_id={user_id}")["unlocked_ids"]
+    total_unlocks = request(f"{args.url}/api/progress/turtle-state?user_id={user_id}")["total_unlocks"]
+
+    checks = [
+        ("every request succeeded", all(result.get("success") for result in results)),
+        ("one is_new_unlock per item", sorted(new_unlocks) == sorted(item_ids) and set(new_unlocks.values()) == {1}),
+        ("one progress row per item", sorted(unlocked_ids) == sorted(item_ids)),
+        ("total_unlocks equals item count", total_unlocks == len(item_ids)),
+    ]
+    print(f"✓ {len(submissions)} requests in {elapsed:.1f}s ({len(submissions) / elapsed:.0f}/s)")
+    for name, passed in checks:
+        print(f"{'✓' if passed else '❌'} {name}")
+    print(f"   unlocked rows: {len(unlocked_ids)}, total_unlocks: {total_unlocks}, expected: {len(item_ids)}")
+    errors = [result["error"] for result in results if "error" in result]
+    if errors:
+        print(f"   {len(errors)} failed requests, e.g. {errors[0]}")
+
+    if not all(passed for _, passed in checks):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
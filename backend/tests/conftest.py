@@ -0,0 +1,97 @@
+"""
+Shared fixtures: a migrated temporary SQLite database, emptied after each
+test, and an in-process client for the API with the LLM faked out.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+# The database URL is read when app.db is imported
+_workdir = tempfile.mkdtemp(prefix="backend_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/test.db"
+os.environ["JOBS_RUN_IN_PROCESS"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import adjacency, db, llm, migrations, models, node_index, quiz_cache, roadmap_cache
+from app.app import app
+
+
+def fake_items(topic: str, count: int = 3):
+    """Roadmap items in the shape the model returns."""
+    return [
+        {
+            "title": f"{topic} step {level}",
+            "summary": f"What to learn about {topic} at level {level}",
+            "level": level,
+            "study_material": [f"https://example.com/{level}"],
+            "questions": [
+                {"question": f"Question {n} on step {level}?", "options": ["a", "b", "c", "d"], "correct": 0}
+                for n in range(2)
+            ],
+        }
+        for level in range(1, count + 1)
+    ]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    migrations.upgrade(db.engine)
+    yield
+    db.engine.dispose()
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_database(database):
+    yield
+    with db.engine.begin() as conn:
+        for table in reversed(models.Base.metadata.sorted_tables):
+            if table is not models.SchemaVersion.__table__:
+                conn.execute(table.delete())
+    quiz_cache._entries.clear()
+    roadmap_cache._index_loaded = False
+    roadmap_cache._reset_index([])
+    node_index.reset()
+    # Graph versions restart once the change log is emptied
+    adjacency._version = -1
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Answer every LLM call (plain or streamed) with a canned roadmap; returns the prompts it was sent."""
+    prompts = []
+
+    async def generate_json(prompt, schema, **kwargs):
+        prompts.append(prompt)
+        if "relationships" in str(schema):
+            return {"relationships": []}
+        return {"items": fake_items("Topic")}
+
+    async def stream_json(prompt, schema, **kwargs):
+        document = json.dumps(await generate_json(prompt, schema))
+        for start in range(0, len(document), 50):
+            yield document[start:start + 50]
+
+    monkeypatch.setattr(llm, "generate_json", generate_json)
+    monkeypatch.setattr(llm, "stream_json", stream_json)
+    return prompts
+
+
+@pytest.fixture
+def client(fake_llm):
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def create_roadmap(client):
+    """Create a roadmap through the API and return its id."""
+    def create(topic: str = "Python", experience: str = "Beginner") -> int:
+        response = client.post("/api/roadmaps/generate", json={"topic": topic, "experience": experience})
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return create
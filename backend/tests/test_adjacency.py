@@ -0,0 +1,117 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from app import db, models
+from test_graph_versions import record
+
+RELATIONSHIPS = ["contains", "prerequisite", "related"]
+
+
+@pytest.fixture
+def graph():
+    """Three roadmaps of topic nodes with random edges, logged as graph changes."""
+    rng = random.Random(7)
+    with db.SessionLocal() as session:
+        roadmaps = [models.Roadmap(topic=f"Topic {n}", experience="Beginner", user_id="default_user") for n in range(3)]
+        session.add_all(roadmaps)
+        session.commit()
+        roadmap_ids = [roadmap.id for roadmap in roadmaps]
+
+    nodes = [
+        models.KnowledgeGraphNode(id=f"topic_{n}", label=f"Topic {n}", node_type="topic", roadmap_id=roadmap_ids[n % 3], group=n % 3)
+        for n in range(30)
+    ]
+    edges = [
+        models.KnowledgeGraphEdge(
+            source=f"topic_{a}", target=f"topic_{b}",
+            weight=round(rng.uniform(0.5, 3.0), 2), relationship=rng.choice(RELATIONSHIPS)
+        )
+        for a, b in rng.sample([(a, b) for a in range(30) for b in range(30) if a != b], 60)
+    ]
+    record(added_nodes=nodes)
+    record(added_edges=edges)
+    return roadmap_ids
+
+
+def edge_table(relationship=None, min_weight=None):
+    with db.SessionLocal() as session:
+        edges = session.query(models.KnowledgeGraphEdge).all()
+        return [
+            (edge.id, edge.source, edge.target) for edge in edges
+            if (relationship is None or edge.relationship == relationship)
+            and (min_weight is None or edge.weight >= min_weight)
+        ]
+
+
+def expected_neighbors(node_id, edges):
+    touching = [edge for edge in edges if node_id in edge[1:]]
+    return {node_id} | {end for edge in touching for end in edge[1:]}, {edge[0] for edge in touching}
+
+
+def expected_subgraph(seeds, hops, edges):
+    links = defaultdict(set)
+    for _, source, target in edges:
+        links[source].add(target)
+        links[target].add(source)
+    visited, frontier = set(seeds), set(seeds)
+    for _ in range(hops):
+        frontier = {other for node in frontier for other in links[node]} - visited
+        visited |= frontier
+    return visited, {edge_id for edge_id, source, target in edges if source in visited and target in visited}
+
+
+def ids(response):
+    body = response.json()
+    return {node["id"] for node in body["nodes"]}, {edge["id"] for edge in body["edges"]}
+
+
+@pytest.mark.parametrize("filters", [{}, {"relationship": "prerequisite"}, {"min_weight": 2.0}, {"relationship": "related", "min_weight": 1.5}])
+def test_neighbors_match_the_edge_table(client, graph, filters):
+    edges = edge_table(**filters)
+    for n in range(30):
+        response = client.get(f"/api/knowledge-graph/nodes/topic_{n}/neighbors", params=filters)
+        assert response.status_code == 200
+        assert ids(response) == expected_neighbors(f"topic_{n}", edges)
+
+
+@pytest.mark.parametrize("hops", [0, 1, 2])
+@pytest.mark.parametrize("filters", [{}, {"relationship": "contains"}, {"min_weight": 1.5}])
+def test_roadmap_subgraph_matches_a_walk_of_the_edge_table(client, graph, hops, filters):
+    edges = edge_table(**filters)
+    for roadmap_id in graph:
+        with db.SessionLocal() as session:
+            seeds = {node.id for node in session.query(models.KnowledgeGraphNode).filter_by(roadmap_id=roadmap_id)}
+        response = client.get(f"/api/knowledge-graph/roadmaps/{roadmap_id}/subgraph", params={"hops": hops, **filters})
+        assert response.status_code == 200
+        assert ids(response) == expected_subgraph(seeds, hops, edges)
+
+
+def test_unknown_node_or_roadmap_is_not_found(client, graph):
+    assert client.get("/api/knowledge-graph/nodes/topic_999/neighbors").status_code == 404
+    assert client.get("/api/knowledge-graph/roadmaps/999/subgraph").status_code == 404
+
+
+def test_index_reloads_when_the_graph_version_moves(client, graph):
+    url = "/api/knowledge-graph/nodes/topic_0/neighbors"
+    before = client.get(url).json()
+
+    # Written without a change record: the version stays put, so the index isn't reloaded
+    with db.SessionLocal() as session:
+        session.add(models.KnowledgeGraphEdge(source="topic_0", target="topic_28", relationship="related"))
+        session.commit()
+    assert client.get(url).json() == before
+
+    edge = models.KnowledgeGraphEdge(source="topic_0", target="topic_29", relationship="related")
+    version = record(added_edges=[edge])
+    after = client.get(url)
+    assert after.json()["version"] == version > before["version"]
+    assert ids(after) == expected_neighbors("topic_0", edge_table())
+    assert {"topic_28", "topic_29"} <= ids(after)[0]
+
+    with db.SessionLocal() as session:
+        session.query(models.KnowledgeGraphEdge).filter_by(id=edge.id).delete()
+        session.commit()
+    record(removed_edges=[edge.id])
+    assert edge.id not in ids(client.get(url))[1]
@@ -0,0 +1,75 @@
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import func, select
+
+from app import db, llm, models, singleflight
+from app.app import app
+from conftest import fake_items
+
+
+@pytest.fixture
+def slow_model(monkeypatch):
+    """A model that takes a moment per roadmap; returns the topics it was asked for."""
+    topics = []
+
+    async def generate_json(prompt, schema, **kwargs):
+        topic = prompt.split("wants to learn: ", 1)[1].split("\n", 1)[0]
+        topics.append(topic)
+        await asyncio.sleep(0.2)
+        return {"items": fake_items(topic)}
+
+    monkeypatch.setattr(llm, "generate_json", generate_json)
+    return topics
+
+
+def roadmap_count() -> int:
+    with db.engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(models.Roadmap))
+
+
+async def post_concurrently(bodies):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*[client.post("/api/roadmaps/generate", json=body) for body in bodies])
+
+
+def test_concurrent_identical_generations_share_one_model_call(slow_model):
+    identical = [{"topic": "Rust", "experience": "Beginner"}, {"topic": "rust", "experience": "beginner "}] * 3
+
+    responses = asyncio.run(post_concurrently(identical + [{"topic": "Go", "experience": "Beginner"}]))
+
+    assert [response.status_code for response in responses] == [200] * 7
+    assert sorted(slow_model) == ["Go", "Rust"]
+    assert len({response.json()["id"] for response in responses[:6]}) == 1
+    assert roadmap_count() == 2
+    assert not singleflight._in_flight
+
+
+def test_idempotency_key_replays_the_stored_response(client, slow_model):
+    body = {"topic": "Rust", "experience": "Beginner"}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    first = client.post("/api/roadmaps/generate", json=body, headers=headers)
+    retried = client.post("/api/roadmaps/generate", json=body, headers=headers)
+
+    assert retried.status_code == 200
+    assert retried.json() == first.json()
+    assert slow_model == ["Rust"]
+    assert roadmap_count() == 1
+
+
+def test_idempotency_key_reused_with_other_parameters_is_rejected(client, slow_model):
+    headers = {"Idempotency-Key": "retry-2"}
+    client.post("/api/roadmaps/generate", json={"topic": "Rust", "experience": "Beginner"}, headers=headers)
+
+    other_body = client.post("/api/roadmaps/generate", json={"topic": "Go", "experience": "Beginner"}, headers=headers)
+    other_endpoint = client.post(
+        "/api/roadmaps/accept-suggestion", params={"topic": "Rust", "experience": "Beginner"}, headers=headers
+    )
+
+    assert other_body.status_code == 422
+    assert other_endpoint.status_code == 422
+    assert slow_model == ["Rust"]
+    assert roadmap_count() == 1
@@ -0,0 +1,101 @@
+import math
+
+import msgpack
+import numpy as np
+
+from app import db, graph_format, models
+
+
+def decode(content: bytes):
+    """Rows and positions back out of the columnar format, the way a client reads it."""
+    payload = msgpack.unpackb(content, raw=False)
+    assert payload["format"] == graph_format.FORMAT_NAME
+    nodes, edges = payload["nodes"], payload["edges"]
+
+    def column(table, name, dtype):
+        values = np.frombuffer(table[name], dtype=dtype)
+        assert len(values) == table["count"]
+        return values.tolist()
+
+    types = [nodes["types"][code] for code in column(nodes, "type", nodes["type_dtype"])]
+    ids = [f"{node_type}_{key}" for node_type, key in zip(types, column(nodes, "key", "<i4"))]
+    labels = [nodes["labels"][code] for code in column(nodes, "label", "<u4")]
+    roadmap_ids = [None if value == -1 else value for value in column(nodes, "roadmap_id", "<i4")]
+    groups = [None if value == -1 else value for value in column(nodes, "group", "<i4")]
+    positions = {
+        node_id: [x, y]
+        for node_id, x, y in zip(ids, column(nodes, "x", "<f4"), column(nodes, "y", "<f4"))
+        if not math.isnan(x)
+    }
+    node_rows = list(zip(ids, labels, types, roadmap_ids, groups))
+
+    relationships = [edges["relationships"][code] for code in column(edges, "relationship", edges["relationship_dtype"])]
+    edge_rows = list(zip(
+        column(edges, "id", "<i4"),
+        [ids[index] for index in column(edges, "source", "<u4")],
+        [ids[index] for index in column(edges, "target", "<u4")],
+        column(edges, "weight", "<f4"),
+        relationships
+    ))
+    return payload["version"], node_rows, edge_rows, positions
+
+
+def sample_graph(node_count: int, relationship_count: int):
+    nodes = [("topic_1", "Python", "topic", 1, 0)] + [
+        (f"title_{n}", f"Step {n}", "title", 1 + n % 3, n % 3) for n in range(1, node_count)
+    ]
+    edges = [
+        (n, nodes[n % node_count][0], nodes[(n * 7 + 1) % node_count][0], 1.5 + n % 4, f"relationship {n % relationship_count}")
+        for n in range(1, node_count * 3)
+    ]
+    return nodes, edges
+
+
+def test_round_trip_with_more_relationships_than_a_byte_indexes():
+    nodes, edges = sample_graph(400, relationship_count=300)
+    positions = {"topic_1": [0.5, -2.0], "title_7": [3.25, 4.0]}
+
+    content = graph_format.encode_graph(12, nodes, edges, positions=positions)
+
+    version, node_rows, edge_rows, decoded_positions = decode(content)
+    assert version == 12
+    assert node_rows == nodes
+    assert edge_rows == edges
+    assert decoded_positions == positions
+    assert msgpack.unpackb(content)["edges"]["relationship_dtype"] == "<u2"
+
+
+def test_edges_with_unknown_endpoints_are_dropped():
+    nodes = [("topic_1", "Python", "topic", 1, 0), ("title_2", None, "title", None, None)]
+    edges = [(1, "topic_1", "title_2", 3.0, "contains"), (2, "topic_1", "title_9", 2.0, "related")]
+
+    _, node_rows, edge_rows, _ = decode(graph_format.encode_graph(1, nodes, edges))
+
+    assert node_rows == [("topic_1", "Python", "topic", 1, 0), ("title_2", "", "title", None, None)]
+    assert edge_rows == [(1, "topic_1", "title_2", 3.0, "contains")]
+
+
+def test_msgpack_response_is_much_smaller_than_json(client):
+    nodes, edges = sample_graph(600, relationship_count=20)
+    with db.SessionLocal() as session:
+        session.add_all([models.Roadmap(id=roadmap_id, topic=f"Topic {roadmap_id}") for roadmap_id in (1, 2, 3)])
+        session.flush()
+        session.add_all([
+            models.KnowledgeGraphNode(id=node_id, label=label, node_type=node_type, roadmap_id=roadmap_id, group=group)
+            for node_id, label, node_type, roadmap_id, group in nodes
+        ])
+        session.flush()
+        session.add_all([
+            models.KnowledgeGraphEdge(id=edge_id, source=source, target=target, weight=weight, relationship=relationship)
+            for edge_id, source, target, weight, relationship in edges
+        ])
+        session.commit()
+
+    as_json = client.get("/api/knowledge-graph/")
+    as_msgpack = client.get("/api/knowledge-graph/", params={"format": "msgpack"})
+
+    assert as_msgpack.headers["content-type"] == graph_format.MEDIA_TYPE
+    _, node_rows, edge_rows, _ = decode(as_msgpack.content)
+    assert len(node_rows) == len(as_json.json()["nodes"]) == len(nodes)
+    assert len(edge_rows) == len(as_json.json()["edges"]) == len(edges)
+    assert len(as_msgpack.content) * 3 < len(as_json.content)
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from app import db, graph_layout, jobs, models
+from test_graph_versions import node, record
+
+
+@pytest.fixture(autouse=True)
+def few_iterations(monkeypatch):
+    monkeypatch.setattr(graph_layout, "FULL_ITERATIONS", 5)
+    monkeypatch.setattr(graph_layout, "INCREMENTAL_ITERATIONS", 5)
+
+
+@pytest.fixture
+def roadmap(create_roadmap):
+    """A roadmap for test nodes to belong to, without its own graph jobs."""
+    create_roadmap()
+    with db.SessionLocal() as session:
+        session.query(models.Job).delete()
+        session.commit()
+
+
+def layout_jobs():
+    with db.SessionLocal() as session:
+        return session.query(models.Job).filter_by(kind="graph.layout", status="queued").count()
+
+
+def stored_layouts():
+    with db.SessionLocal() as session:
+        return {layout.version: layout.relaxed_count for layout in session.query(models.GraphLayout)}
+
+
+def test_layout_request_queues_the_job_instead_of_computing(client, roadmap):
+    version = record(added_nodes=[node("topic_1"), node("topic_2")])
+
+    for _ in range(2):
+        response = client.get("/api/knowledge-graph/layout")
+        assert response.json() == {"version": 0, "pending": True, "positions": []}
+        assert "ETag" not in response.headers
+    assert layout_jobs() == 1
+    assert stored_layouts() == {}
+
+    asyncio.run(jobs.run_pending_jobs())
+    ready = client.get("/api/knowledge-graph/layout")
+    assert ready.json()["version"] == version
+    assert ready.json()["pending"] is False
+    assert {p["id"] for p in ready.json()["positions"]} == {"topic_1", "topic_2"}
+    assert layout_jobs() == 0
+
+
+def test_stale_layout_is_served_while_the_next_one_is_queued(client, roadmap):
+    first = record(added_nodes=[node("topic_1")])
+    client.get("/api/knowledge-graph/layout")
+    asyncio.run(jobs.run_pending_jobs())
+    etag = client.get("/api/knowledge-graph/layout").headers["ETag"]
+
+    record(added_nodes=[node("topic_2")])
+    stale = client.get("/api/knowledge-graph/layout", headers={"If-None-Match": etag})
+    assert stale.status_code == 200
+    assert stale.json()["version"] == first
+    assert stale.json()["pending"] is True
+    assert [p["id"] for p in stale.json()["positions"]] == ["topic_1"]
+    assert layout_jobs() == 1
+
+
+def test_only_a_reset_since_the_previous_layout_relaxes_every_node(roadmap, monkeypatch):
+    monkeypatch.setattr(graph_layout, "KEEP_LAYOUTS", 10)
+
+    async def compute():
+        async with db.AsyncSessionLocal() as session:
+            return (await graph_layout.compute_layout(session)).version
+
+    first = record(added_nodes=[node("topic_1"), node("topic_2")])
+    asyncio.run(compute())
+    added = record(added_nodes=[node("topic_3")])
+    asyncio.run(compute())
+    rebuilt = record(added_nodes=[node("topic_4")], reset=True)
+    asyncio.run(compute())
+
+    assert stored_layouts() == {first: 2, added: 1, rebuilt: 4}
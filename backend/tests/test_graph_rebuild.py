@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app import db, jobs, llm, models
+from app.routers import knowledge_graph
+
+
+def seed_roadmaps(item_counts):
+    """Roadmaps with the given numbers of items, in order; returns their ids."""
+    roadmap_ids = []
+    with db.SessionLocal() as session:
+        for index, count in enumerate(item_counts):
+            roadmap = models.Roadmap(user_id="default_user", topic=f"Topic {index}", experience="Beginner", created_at="")
+            session.add(roadmap)
+            session.flush()
+            session.add_all([
+                models.RoadmapItem(roadmap_id=roadmap.id, title=f"Step {level} of topic {index}", summary="", level=level, study_material=[])
+                for level in range(1, count + 1)
+            ])
+            roadmap_ids.append(roadmap.id)
+        session.commit()
+    return roadmap_ids
+
+
+def rebuild_status(rebuild_id: int) -> tuple:
+    with db.SessionLocal() as session:
+        rebuild = session.get(models.GraphRebuild, rebuild_id)
+        return rebuild.status, rebuild.completed_pairs, rebuild.total_pairs
+
+
+async def start_rebuild() -> tuple:
+    async with db.AsyncSessionLocal() as db_conn:
+        job = await knowledge_graph.start_rebuild(db_conn)
+        return job.id, job.payload
+
+
+@pytest.fixture
+def relationship_model(monkeypatch):
+    """Answer relationship prompts with no relationships; fail the calls listed in `failing` (by call number)."""
+    calls = {"count": 0, "failing": set()}
+
+    async def generate_json(prompt, schema, **kwargs):
+        calls["count"] += 1
+        if calls["count"] in calls["failing"]:
+            raise RuntimeError("model unavailable")
+        return {"relationships": []}
+
+    monkeypatch.setattr(llm, "generate_json", generate_json)
+    monkeypatch.setattr(jobs, "BACKOFF_SECONDS", 0)
+    return calls
+
+
+def test_partition_keeps_roadmaps_whole_within_block_size(monkeypatch):
+    monkeypatch.setattr(knowledge_graph, "REBUILD_BLOCK_SIZE", 5)
+    monkeypatch.setattr(knowledge_graph, "REBUILD_NEIGHBOR_BLOCKS", 1)
+    sizes = [2, 2, 3, 7, 1, 4]
+    roadmap_ids = seed_roadmaps(sizes)
+    size_of = dict(zip(roadmap_ids, sizes))
+
+    async def partition():
+        async with db.AsyncSessionLocal() as db_conn:
+            return await knowledge_graph.partition_graph(db_conn)
+
+    blocks, pairs = asyncio.run(partition())
+
+    assert sorted(roadmap_id for block in blocks for roadmap_id in block) == roadmap_ids
+    for block in blocks:
+        assert sum(size_of[roadmap_id] for roadmap_id in block) <= 5 or len(block) == 1
+    assert blocks == [[roadmap_ids[0], roadmap_ids[1]], [roadmap_ids[2]], [roadmap_ids[3]], [roadmap_ids[4], roadmap_ids[5]]]
+    # Multi-roadmap blocks are compared with themselves, and every block with its nearest other block
+    assert [0, 0] in pairs and [3, 3] in pairs and [1, 1] not in pairs
+    for i in range(len(blocks)):
+        assert any(a != b and i in (a, b) for a, b in pairs)
+    assert pairs == sorted(pairs) and all(a <= b for a, b in pairs)
+
+
+def test_failed_rebuild_resumes_unfinished_pairs_on_retry(monkeypatch, relationship_model):
+    monkeypatch.setattr(knowledge_graph, "REBUILD_BLOCK_SIZE", 4)
+    seed_roadmaps([2, 2, 2, 2, 2, 2])
+    relationship_model["failing"] = {1}
+    job_id, payload = asyncio.run(start_rebuild())
+    rebuild_id = json.loads(payload)["rebuild_id"]
+
+    asyncio.run(jobs.run_pending_jobs(limit=1))
+    status, completed, total = rebuild_status(rebuild_id)
+    assert (status, completed) == ("running", total - 1)
+    calls_before_retry = relationship_model["count"]
+
+    asyncio.run(jobs.run_pending_jobs(limit=1))
+
+    # Only the pair without a checkpoint was asked again, and the nodes weren't rebuilt
+    assert relationship_model["count"] == calls_before_retry + 1
+    assert rebuild_status(rebuild_id) == ("succeeded", total, total)
+    with db.SessionLocal() as session:
+        assert session.get(models.Job, job_id).status == "succeeded"
+        assert len(session.scalars(select(models.GraphRebuildPair)).all()) == total
+
+
+def test_new_request_supersedes_a_rebuild_under_way(relationship_model):
+    seed_roadmaps([2, 2])
+    relationship_model["failing"] = {1}
+    _, first_payload = asyncio.run(start_rebuild())
+    asyncio.run(jobs.run_pending_jobs(limit=1))
+    first_id = json.loads(first_payload)["rebuild_id"]
+    assert rebuild_status(first_id)[0] == "running"
+
+    # A roadmap added since: the interrupted rebuild's plan doesn't include it
+    seed_roadmaps([3])
+    _, second_payload = asyncio.run(start_rebuild())
+    second_id = json.loads(second_payload)["rebuild_id"]
+    asyncio.run(jobs.run_pending_jobs())
+
+    assert second_id != first_id
+    assert rebuild_status(first_id)[0] == "superseded"
+    assert rebuild_status(second_id)[0] == "succeeded"
+    with db.SessionLocal() as session:
+        assert len(session.scalars(select(models.KnowledgeGraphNode).where(models.KnowledgeGraphNode.node_type == "topic")).all()) == 3
+
+
+def test_queued_rebuild_is_reused_by_another_request():
+    seed_roadmaps([2])
+
+    assert asyncio.run(start_rebuild()) == asyncio.run(start_rebuild())
+
+
+def test_rebuild_is_marked_failed_when_its_job_gives_up(monkeypatch, relationship_model):
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 1)
+    seed_roadmaps([2, 2])
+    relationship_model["failing"] = set(range(1, 100))
+    _, payload = asyncio.run(start_rebuild())
+
+    asyncio.run(jobs.run_pending_jobs())
+
+    assert rebuild_status(json.loads(payload)["rebuild_id"])[0] == "failed"
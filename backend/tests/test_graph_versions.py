@@ -0,0 +1,101 @@
+import asyncio
+
+from app import db, graph_versions, models
+
+
+def node(node_id):
+    """A topic node on the test's roadmap."""
+    with db.SessionLocal() as session:
+        roadmap_id = session.query(models.Roadmap.id).scalar()
+    return models.KnowledgeGraphNode(id=node_id, label=node_id, node_type="topic", roadmap_id=roadmap_id, group=0)
+
+
+def record(added_nodes=(), added_edges=(), removed_nodes=(), removed_edges=(), reset=False):
+    """Apply and log one batch of graph changes; returns the new version."""
+    async def run():
+        async with db.AsyncSessionLocal() as session:
+            if reset:
+                graph_versions.record_reset(session)
+            session.add_all(list(added_nodes) + list(added_edges))
+            await graph_versions.record_added(session, added_nodes, added_edges)
+            await graph_versions.record_removed(session, removed_nodes, removed_edges)
+            await session.commit()
+            return await graph_versions.current_version(session)
+    return asyncio.run(run())
+
+
+def test_graph_is_not_modified_until_its_version_changes(client, create_roadmap):
+    create_roadmap()
+    record(added_nodes=[node("topic_1")])
+    first = client.get("/api/knowledge-graph/")
+    etag = first.headers["ETag"]
+
+    for header in (etag, f'"stale", {etag}', "*"):
+        cached = client.get("/api/knowledge-graph/", headers={"If-None-Match": header})
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+    assert client.get("/api/knowledge-graph/", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    record(added_nodes=[node("topic_2")])
+    changed = client.get("/api/knowledge-graph/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()["nodes"]) == 2
+
+
+def test_layout_is_not_modified_for_a_matching_etag(client):
+    with db.SessionLocal() as session:
+        session.add(models.GraphChange(op="reset", kind=""))
+        session.add(models.GraphLayout(version=1, positions="{}"))
+        session.commit()
+    etag = graph_versions.etag(1, "layout")
+
+    assert client.get("/api/knowledge-graph/layout", headers={"If-None-Match": f'"stale", {etag}'}).status_code == 304
+    assert client.get("/api/knowledge-graph/layout", headers={"If-None-Match": "*"}).status_code == 304
+
+
+def test_changes_are_folded_per_node_and_edge(client, create_roadmap):
+    create_roadmap()
+    since = record(added_nodes=[node("topic_1"), node("topic_2")])
+    edge = models.KnowledgeGraphEdge(source="topic_1", target="topic_2", relationship="related")
+    record(added_nodes=[node("topic_3")], added_edges=[edge])
+    record(removed_nodes=["topic_3"], removed_edges=[edge.id])
+    version = record(added_nodes=[node("topic_4")], removed_nodes=["topic_2"])
+
+    changes = client.get("/api/knowledge-graph/changes", params={"since": since}).json()
+    assert changes["version"] == version
+    assert changes["reset"] is False
+    assert [n["id"] for n in changes["nodes_added"]] == ["topic_4"]
+    assert sorted(changes["nodes_removed"]) == ["topic_2", "topic_3"]
+    assert changes["edges_added"] == []
+    assert changes["edges_removed"] == [edge.id]
+
+    unchanged = client.get("/api/knowledge-graph/changes", params={"since": version}).json()
+    assert unchanged["nodes_added"] == unchanged["nodes_removed"] == []
+
+
+def test_a_rebuild_after_since_asks_for_a_reset(client, create_roadmap):
+    create_roadmap()
+    since = record(added_nodes=[node("topic_1")])
+    rebuilt = record(added_nodes=[node("topic_2")], reset=True)
+
+    assert client.get("/api/knowledge-graph/changes", params={"since": since}).json()["reset"] is True
+
+    record(added_nodes=[node("topic_3")])
+    after = client.get("/api/knowledge-graph/changes", params={"since": rebuilt}).json()
+    assert after["reset"] is False
+    assert [n["id"] for n in after["nodes_added"]] == ["topic_3"]
+
+
+def test_versions_pruned_past_retention_ask_for_a_reset(client, create_roadmap, monkeypatch):
+    create_roadmap()
+    monkeypatch.setattr(graph_versions, "RETENTION", 3)
+    versions = [record(added_nodes=[node(f"topic_{n}")]) for n in range(6)]
+
+    with db.SessionLocal() as session:
+        assert session.query(models.GraphChange).count() == 3
+
+    assert client.get("/api/knowledge-graph/changes", params={"since": versions[1]}).json()["reset"] is True
+    kept = client.get("/api/knowledge-graph/changes", params={"since": versions[2]}).json()
+    assert kept["reset"] is False
+    assert [n["id"] for n in kept["nodes_added"]] == ["topic_3", "topic_4", "topic_5"]
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import db, jobs, models
+
+
+def job_status(job_id: int) -> tuple:
+    with db.SessionLocal() as session:
+        job = session.get(models.Job, job_id)
+        return job.status, job.attempts
+
+
+async def enqueue(kind: str) -> int:
+    async with db.AsyncSessionLocal() as db_conn:
+        return (await jobs.enqueue(db_conn, kind)).id
+
+
+def test_long_running_job_keeps_its_lease(monkeypatch):
+    monkeypatch.setattr(jobs, "LEASE_SECONDS", 0.3)
+    monkeypatch.setitem(jobs._handlers, "test.slow", lambda payload, db_conn: asyncio.sleep(1))
+
+    async def run_while_another_worker_starts():
+        job_id = await enqueue("test.slow")
+        worker = asyncio.create_task(jobs.run_pending_jobs())
+        # Well past the lease, but the running worker renews it
+        await asyncio.sleep(0.7)
+        async with db.AsyncSessionLocal() as db_conn:
+            await jobs._requeue_expired_jobs(db_conn)
+        assert job_status(job_id) == ("running", 1)
+        await worker
+        return job_id
+
+    job_id = asyncio.run(run_while_another_worker_starts())
+
+    assert job_status(job_id) == ("succeeded", 1)
+
+
+def test_job_with_expired_lease_is_requeued():
+    async def requeue_abandoned_job():
+        async with db.AsyncSessionLocal() as db_conn:
+            db_conn.add(models.Job(
+                kind="test.abandoned",
+                payload="{}",
+                status="running",
+                attempts=1,
+                lease_expires_at=datetime.utcnow() - timedelta(seconds=1)
+            ))
+            await db_conn.commit()
+            await jobs._requeue_expired_jobs(db_conn)
+            return (await db_conn.scalar(select(models.Job))).id
+
+    job_id = asyncio.run(requeue_abandoned_job())
+
+    assert job_status(job_id) == ("queued", 1)
@@ -0,0 +1,24 @@
+import json
+
+from app import db, models
+
+
+def test_graph_etag_changes_once_the_layout_is_stored(client, create_roadmap):
+    roadmap_id = create_roadmap()
+    with db.SessionLocal() as session:
+        session.add(models.KnowledgeGraphNode(id="topic_1", label="Python", node_type="topic", roadmap_id=roadmap_id, group=0))
+        session.add(models.GraphChange(op="reset", kind=""))
+        session.commit()
+
+    first = client.get("/api/knowledge-graph/")
+    assert first.json()["nodes"][0]["x"] is None
+    assert client.get("/api/knowledge-graph/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    with db.SessionLocal() as session:
+        session.add(models.GraphLayout(version=first.json()["version"], positions=json.dumps({"topic_1": [1.0, 2.0]})))
+        session.commit()
+
+    second = client.get("/api/knowledge-graph/", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.json()["nodes"][0]["x"] == 1.0
+    assert client.get("/api/knowledge-graph/", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
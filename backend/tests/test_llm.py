@@ -0,0 +1,192 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app import llm, metrics
+
+MODEL = "test-model"
+CALLER = "test:llm"
+
+
+def usage(prompt=0, response=0, thoughts=0):
+    return SimpleNamespace(prompt_token_count=prompt, candidates_token_count=response, thoughts_token_count=thoughts)
+
+
+class FakeModels:
+    """Stands in for client.aio.models, recording how many calls overlap."""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.parsed = {"ok": True}
+        self.error = None
+        self.chunks = []
+        self.chunk_delay = 0.0
+        self.running = 0
+        self.peak = 0
+
+    async def generate_content(self, model, contents, config):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return SimpleNamespace(parsed=self.parsed, usage_metadata=usage(prompt=10, response=5, thoughts=2))
+        finally:
+            self.running -= 1
+
+    async def generate_content_stream(self, model, contents, config):
+        async def stream():
+            for text, chunk_usage in self.chunks:
+                await asyncio.sleep(self.chunk_delay)
+                yield SimpleNamespace(text=text, usage_metadata=chunk_usage)
+        return stream()
+
+
+@pytest.fixture
+def models(monkeypatch):
+    fake = FakeModels()
+    monkeypatch.setattr(llm, "_client", SimpleNamespace(aio=SimpleNamespace(models=fake)))
+    monkeypatch.setattr(llm, "_semaphore", None)
+    monkeypatch.setattr(llm, "MAX_CONCURRENCY", 2)
+    return fake
+
+
+def calls(method: str, outcome: str) -> float:
+    return REGISTRY.get_sample_value(
+        "llm_call_duration_seconds_count",
+        {"caller": CALLER, "model": MODEL, "method": method, "outcome": outcome}
+    ) or 0.0
+
+
+def tokens(token_type: str) -> float:
+    return REGISTRY.get_sample_value(
+        "llm_tokens_total", {"caller": CALLER, "model": MODEL, "type": token_type}
+    ) or 0.0
+
+
+def parse_failures() -> float:
+    return REGISTRY.get_sample_value("llm_parse_failures_total", {"caller": CALLER}) or 0.0
+
+
+def run(coro):
+    async def as_caller():
+        token = metrics.set_caller(CALLER)
+        try:
+            return await coro
+        finally:
+            metrics.reset_caller(token)
+    return asyncio.run(as_caller())
+
+
+def generate(**kwargs):
+    return llm.generate_json("prompt", {"type": "object"}, model=MODEL, **kwargs)
+
+
+async def collect(**kwargs):
+    return [text async for text in llm.stream_json("prompt", {"type": "object"}, model=MODEL, **kwargs)]
+
+
+def test_concurrent_calls_are_capped_by_the_semaphore(models):
+    models.delay = 0.02
+
+    async def burst():
+        return await asyncio.gather(*(generate() for _ in range(5)))
+
+    assert run(burst()) == [{"ok": True}] * 5
+    assert models.peak == 2
+
+
+def test_slow_call_times_out_and_frees_its_slot(models):
+    models.delay = 1.0
+    timeouts_before = calls("generate", "timeout")
+
+    with pytest.raises(llm.LLMTimeoutError):
+        run(generate(timeout=0.05))
+    assert calls("generate", "timeout") == timeouts_before + 1
+
+    models.delay = 0.0
+    assert run(generate()) == {"ok": True}
+
+
+def test_waiting_for_a_slot_does_not_count_against_the_timeout(models, monkeypatch):
+    monkeypatch.setattr(llm, "MAX_CONCURRENCY", 1)
+    models.delay = 0.1
+
+    async def queued():
+        # The second call waits ~0.1s for the slot, then runs ~0.1s of its 0.15s timeout
+        return await asyncio.gather(generate(), generate(timeout=0.15))
+
+    assert run(queued()) == [{"ok": True}] * 2
+
+
+def test_generate_records_tokens_and_outcome(models):
+    ok_before, prompt_before, response_before, thoughts_before = (
+        calls("generate", "ok"), tokens("prompt"), tokens("response"), tokens("thoughts")
+    )
+
+    run(generate())
+
+    assert calls("generate", "ok") == ok_before + 1
+    assert (tokens("prompt"), tokens("response"), tokens("thoughts")) == (
+        prompt_before + 10, response_before + 5, thoughts_before + 2
+    )
+
+
+def test_unparseable_response_is_a_parse_error(models):
+    models.parsed = None
+    failures_before, parse_errors_before, prompt_before = parse_failures(), calls("generate", "parse_error"), tokens("prompt")
+
+    with pytest.raises(llm.LLMParseError):
+        run(generate())
+
+    assert parse_failures() == failures_before + 1
+    assert calls("generate", "parse_error") == parse_errors_before + 1
+    # The tokens were still billed
+    assert tokens("prompt") == prompt_before + 10
+
+
+def test_client_errors_propagate_as_error_outcome(models):
+    models.error = RuntimeError("quota exceeded")
+    errors_before = calls("generate", "error")
+
+    with pytest.raises(RuntimeError):
+        run(generate())
+    assert calls("generate", "error") == errors_before + 1
+
+
+def test_stream_yields_text_and_counts_final_usage(models):
+    models.chunks = [('{"items"', None), ("", None), (": []}", usage(prompt=7, response=3))]
+    ok_before, prompt_before, response_before = calls("stream", "ok"), tokens("prompt"), tokens("response")
+
+    assert run(collect()) == ['{"items"', ": []}"]
+    assert calls("stream", "ok") == ok_before + 1
+    assert (tokens("prompt"), tokens("response")) == (prompt_before + 7, response_before + 3)
+
+
+def test_stream_deadline_covers_the_whole_stream(models):
+    # Each chunk arrives well within the timeout, but all of them together don't
+    models.chunks = [("x", None)] * 5
+    models.chunk_delay = 0.04
+    timeouts_before = calls("stream", "timeout")
+
+    with pytest.raises(llm.LLMTimeoutError):
+        run(collect(timeout=0.1))
+    assert calls("stream", "timeout") == timeouts_before + 1
+
+
+def test_stream_closed_early_is_recorded_and_frees_its_slot(models, monkeypatch):
+    monkeypatch.setattr(llm, "MAX_CONCURRENCY", 1)
+    models.chunks = [("a", None), ("b", None)]
+    errors_before = calls("stream", "error")
+
+    async def read_first_then_again():
+        stream = llm.stream_json("prompt", {"type": "object"}, model=MODEL)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first, await collect()
+
+    assert run(read_first_then_again()) == ("a", ["a", "b"])
+    assert calls("stream", "error") == errors_before + 1
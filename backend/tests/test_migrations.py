@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app import migrations, models, roadmap_progress
+
+# Columns the models map as JSON over the text type their migration declared;
+# SQLite stores both as text, so the tables were left as they were
+JSON_OVER_TEXT = {
+    **{column: "VARCHAR" for column in migrations.JSON_LIST_COLUMNS},
+    ("roadmap_progress", "level_items"): "TEXT",
+    ("roadmap_progress", "level_completed"): "TEXT",
+    ("roadmap_progress", "completed_item_ids"): "TEXT",
+}
+
+
+def schema(engine) -> dict:
+    """Columns, foreign keys and indexes of every table, in comparable form."""
+    inspector = inspect(engine)
+    return {
+        table: {
+            "columns": {column["name"]: (str(column["type"]), column["nullable"]) for column in inspector.get_columns(table)},
+            "primary_key": sorted(inspector.get_pk_constraint(table)["constrained_columns"]),
+            "foreign_keys": sorted(
+                (tuple(fk["constrained_columns"]), fk["referred_table"], fk["options"].get("ondelete"))
+                for fk in inspector.get_foreign_keys(table)
+            ),
+            "indexes": sorted((index["name"], tuple(index["column_names"]), bool(index["unique"])) for index in inspector.get_indexes(table)),
+        }
+        for table in inspector.get_table_names()
+    }
+
+
+def test_fresh_database_migrates_to_model_schema(tmp_path):
+    migrated = create_engine(f"sqlite:///{tmp_path}/migrated.db")
+    from_models = create_engine(f"sqlite:///{tmp_path}/models.db")
+    migrations.upgrade(migrated)
+    models.Base.metadata.create_all(from_models)
+
+    expected = schema(from_models)
+    for (table, column), declared_type in JSON_OVER_TEXT.items():
+        expected[table]["columns"][column] = (declared_type, True)
+
+    assert schema(migrated) == expected
+    assert migrations.current_version(migrated) == migrations.latest_version()
+
+
+def test_legacy_data_is_migrated_for_the_current_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    migrations.upgrade(engine, target=1)
+    with engine.begin() as conn:
+        # A pre-migration database: cached graph, no graph rows, progress on a roadmap without an owner
+        conn.execute(text("CREATE TABLE knowledge_graph_cache (id INTEGER PRIMARY KEY, graph_data TEXT)"))
+        conn.execute(text("INSERT INTO roadmaps (id, topic, created_at) VALUES (1, 'Python', '2024-01-01T00:00:00')"))
+        conn.execute(text("""
+            INSERT INTO roadmap_items (id, roadmap_id, title, level, study_material)
+            VALUES (1, 1, 'Basics', 1, '[]'), (2, 1, 'Syntax', 1, '[]'), (3, 1, 'Classes', 2, 'not json')
+        """))
+        conn.execute(text("""
+            INSERT INTO quiz_progress (user_id, roadmap_item_id, score, total_questions)
+            VALUES ('default_user', 1, 2, 2), ('default_user', 2, 1, 2)
+        """))
+
+    migrations.upgrade(engine)
+
+    with Session(engine) as session:
+        summary = session.get(models.RoadmapProgress, ("default_user", 1))
+        assert roadmap_progress.levels_progress(summary) == {
+            "completed_levels": [], "current_level": 1, "completed_item_ids": [1]
+        }
+        assert session.get(models.Roadmap, 1).user_id == "default_user"
+        assert session.get(models.RoadmapItem, 3).study_material == []
+        job = session.query(models.Job).one()
+        assert (job.kind, job.status, job.attempts) == ("graph.rebuild", "queued", 0)
+        assert job.run_after <= datetime.utcnow()
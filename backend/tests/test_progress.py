@@ -0,0 +1,81 @@
+import asyncio
+
+import httpx
+from sqlalchemy import func, select
+
+from app import db, migrations, models
+from app.app import app
+
+USER_ID = "concurrent_user"
+REPEATS = 8
+
+
+async def submit_concurrently(item_ids):
+    """Every item completed REPEATS times at once, through single and batch completions."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        def complete(item_id):
+            return client.post("/api/progress/complete", json={
+                "roadmap_item_id": item_id, "score": 2, "total_questions": 2, "user_id": USER_ID
+            })
+
+        def complete_batch(item_ids):
+            return client.post("/api/progress/complete/batch", json={
+                "completions": [{"roadmap_item_id": item_id, "score": 2, "total_questions": 2} for item_id in item_ids],
+                "user_id": USER_ID
+            })
+
+        requests = [complete(item_id) for item_id in item_ids for _ in range(REPEATS)]
+        requests += [complete_batch(item_ids) for _ in range(REPEATS)]
+        return await asyncio.gather(*requests)
+
+
+def test_concurrent_duplicate_completions_unlock_once(client, create_roadmap):
+    roadmap_ids = [create_roadmap("Python"), create_roadmap("Rust")]
+    with db.SessionLocal() as session:
+        items = session.execute(
+            select(models.RoadmapItem.id, models.RoadmapItem.roadmap_id).where(models.RoadmapItem.roadmap_id.in_(roadmap_ids))
+        ).all()
+    item_ids = [item_id for item_id, _ in items]
+
+    responses = asyncio.run(submit_concurrently(item_ids))
+
+    assert [response.status_code for response in responses] == [200] * len(responses)
+    with db.SessionLocal() as session:
+        rows_per_item = dict(session.execute(
+            select(models.QuizProgress.roadmap_item_id, func.count()).where(
+                models.QuizProgress.user_id == USER_ID
+            ).group_by(models.QuizProgress.roadmap_item_id)
+        ).all())
+        profile = session.get(models.UserProfile, USER_ID)
+    assert rows_per_item == {item_id: 1 for item_id in item_ids}
+    assert profile.total_unlocks == len(item_ids)
+    reported_unlocks = sum(
+        response.json()["new_unlocks"] if "new_unlocks" in response.json() else response.json()["is_new_unlock"]
+        for response in responses
+    )
+    assert reported_unlocks == len(item_ids)
+    for roadmap_id in roadmap_ids:
+        summary = client.get(f"/api/progress/roadmap/{roadmap_id}", params={"user_id": USER_ID}).json()
+        assert sorted(summary["completed_item_ids"]) == sorted(item_id for item_id, owner in items if owner == roadmap_id)
+
+
+def test_legacy_roadmap_without_owner_is_listed_after_migration(client, create_roadmap):
+    owned_id = create_roadmap()
+    with db.SessionLocal() as session:
+        # As saved before roadmaps had an owner
+        legacy = models.Roadmap(topic="Legacy", experience="Beginner", created_at="2024-01-01T00:00:00")
+        session.add(legacy)
+        session.flush()
+        session.add(models.RoadmapItem(roadmap_id=legacy.id, title="Legacy step", summary="", level=2, study_material=[]))
+        session.commit()
+        legacy_id = legacy.id
+
+    migrations.backfill_roadmap_owners(db.engine)
+
+    listed = {summary["roadmap_id"]: summary for summary in client.get("/api/progress/roadmaps").json()}
+    assert sorted(listed) == [owned_id, legacy_id]
+    assert listed[legacy_id]["current_level"] == 2
+    assert client.get(f"/api/progress/roadmap/{legacy_id}").json() == {
+        key: value for key, value in listed[legacy_id].items() if key != "roadmap_id"
+    }
@@ -0,0 +1,76 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from app import db, llm, prompts
+from app.routers import knowledge_graph
+from app.routers.knowledge_graph import Node
+
+TEMPLATE = """
+    Relate these new topics {new_topics}
+    to these existing ones {existing_topics}.
+"""
+
+
+def entries(prefix: str, count: int):
+    return [{"id": f"{prefix}_{n}", "label": f"{prefix} topic number {n} " * 3} for n in range(count)]
+
+
+def dropped(section: str) -> float:
+    return REGISTRY.get_sample_value(
+        "llm_prompt_entries_dropped_total", {"kind": "graph_link", "section": section}
+    ) or 0.0
+
+
+def test_dedupe_keeps_the_first_entry_per_key_in_order():
+    ranked = ["Python", "Rust", "python", "Go", "RUST"]
+
+    assert prompts.dedupe(ranked, key=str.lower) == ["Python", "Rust", "Go"]
+
+
+def test_truncate_cuts_at_a_word_boundary():
+    assert prompts.truncate("  short text ", 20) == "short text"
+    assert prompts.truncate("one two three four", 12) == "one two…"
+
+
+def test_build_keeps_ranked_prefixes_within_the_budget(monkeypatch):
+    monkeypatch.setitem(prompts.BUDGETS, "graph_link", 200)
+    new_topics, existing_topics = entries("new", 3), entries("old", 40)
+    dropped_before = dropped("existing_topics")
+
+    prompt, kept = prompts.build("graph_link", TEMPLATE, {"new_topics": new_topics, "existing_topics": existing_topics})
+
+    assert prompts.estimate_tokens(prompt) <= 200
+    # Sections are filled in order, each with its leading entries
+    assert kept["new_topics"] == new_topics
+    assert 0 < len(kept["existing_topics"]) < len(existing_topics)
+    assert kept["existing_topics"] == existing_topics[:len(kept["existing_topics"])]
+    assert dropped("existing_topics") - dropped_before == len(existing_topics) - len(kept["existing_topics"])
+
+
+def test_build_can_leave_a_later_section_empty(monkeypatch):
+    monkeypatch.setitem(prompts.BUDGETS, "graph_link", 120)
+
+    _, kept = prompts.build("graph_link", TEMPLATE, {"new_topics": entries("new", 3), "existing_topics": entries("old", 5)})
+
+    assert kept["new_topics"] and kept["existing_topics"] == []
+
+
+def test_linking_skips_the_model_when_no_existing_node_fits(monkeypatch):
+    # Room for the new nodes only
+    monkeypatch.setitem(prompts.BUDGETS, "graph_link", 600)
+    new_nodes = [Node(id=f"title_{n}", label="A long new topic label " * 6, type="title", roadmap_id=1) for n in range(6)]
+    existing_nodes = [Node(id=f"title_{n}", label="Existing topic", type="title", roadmap_id=2) for n in range(10, 15)]
+
+    async def generate_json(prompt, schema, **kwargs):
+        raise AssertionError("the model should not be called")
+
+    monkeypatch.setattr(llm, "generate_json", generate_json)
+
+    async def analyze():
+        async with db.AsyncSessionLocal() as db_conn:
+            return await knowledge_graph.analyze_new_relationships(new_nodes, existing_nodes, db_conn)
+
+    _, kept_new, kept_existing = knowledge_graph.build_incremental_prompt(new_nodes, existing_nodes)
+    assert kept_new and not kept_existing
+    assert asyncio.run(analyze()) == []
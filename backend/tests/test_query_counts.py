@@ -0,0 +1,53 @@
+"""
+Query budgets of the hot read endpoints. Each runs a fixed number of
+queries however many roadmaps, items and questions there are; a failure
+lists the statements that ran, which usually points at a query in a loop.
+"""
+
+import pytest
+
+from app import query_profiler
+from conftest import fake_items
+
+TOPICS = ("Python", "Rust", "Go")
+
+
+@pytest.fixture
+def roadmap_ids(client, create_roadmap):
+    ids = [create_roadmap(topic) for topic in TOPICS]
+    # One roadmap with progress, the others without
+    client.post("/api/progress/complete", json={"roadmap_item_id": 1, "score": 2, "total_questions": 2})
+    return ids
+
+
+def test_list_roadmaps(client, roadmap_ids):
+    with query_profiler.assert_max_queries(2):
+        response = client.get("/api/roadmaps/")
+
+    assert len(response.json()) == len(TOPICS)
+    assert all(len(roadmap["items"]) == len(fake_items("Topic")) for roadmap in response.json())
+
+
+def test_quiz(client, roadmap_ids):
+    with query_profiler.assert_max_queries(2):
+        response = client.get("/api/quiz/1")
+    assert len(response.json()["questions"]) == 2
+
+    # Cached: only the lookup of the item's roadmap
+    with query_profiler.assert_max_queries(1):
+        client.get("/api/quiz/1")
+
+
+def test_roadmap_quizzes(client, roadmap_ids):
+    with query_profiler.assert_max_queries(1):
+        response = client.get(f"/api/quiz/roadmap/{roadmap_ids[0]}")
+
+    assert len(response.json()["quizzes"]) == len(fake_items("Topic"))
+
+
+def test_all_roadmap_progress(client, roadmap_ids):
+    with query_profiler.assert_max_queries(2):
+        response = client.get("/api/progress/roadmaps")
+
+    assert [summary["roadmap_id"] for summary in response.json()] == roadmap_ids
+    assert response.json()[0]["completed_item_ids"] == [1]
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from app import db, models
+
+
+def quiz_item_ids(roadmap_id: int):
+    with db.SessionLocal() as session:
+        return session.scalars(select(models.RoadmapItem.id).where(models.RoadmapItem.roadmap_id == roadmap_id)).all()
+
+
+def delete_elsewhere(roadmap_id: int):
+    """Delete a roadmap the way another worker would, leaving this process's quiz cache alone."""
+    with db.SessionLocal() as session:
+        session.execute(delete(models.Roadmap).where(models.Roadmap.id == roadmap_id))
+        session.commit()
+
+
+def test_quiz_is_revalidated_by_etag(client, create_roadmap):
+    item_id = quiz_item_ids(create_roadmap())[0]
+
+    response = client.get(f"/api/quiz/{item_id}")
+    assert response.headers["cache-control"] == "no-cache"
+    revalidated = client.get(f"/api/quiz/{item_id}", headers={"If-None-Match": response.headers["etag"]})
+
+    assert revalidated.status_code == 304
+
+
+def test_deleted_quiz_is_not_served_from_cache(client, create_roadmap):
+    roadmap_id = create_roadmap()
+    item_id = quiz_item_ids(roadmap_id)[0]
+    assert client.get(f"/api/quiz/{item_id}").status_code == 200
+
+    delete_elsewhere(roadmap_id)
+
+    assert client.get(f"/api/quiz/{item_id}").status_code == 404
+
+
+def test_reused_item_id_gets_its_own_quiz(client, create_roadmap):
+    roadmap_id = create_roadmap()
+    item_id = quiz_item_ids(roadmap_id)[0]
+    old = client.get(f"/api/quiz/{item_id}")
+    delete_elsewhere(roadmap_id)
+
+    # With no rows left, SQLite numbers the next ones from 1 again
+    with db.SessionLocal() as session:
+        roadmap = models.Roadmap(topic="Rust", experience="Beginner", created_at=datetime.now().isoformat())
+        session.add(roadmap)
+        session.flush()
+        item = models.RoadmapItem(roadmap_id=roadmap.id, title="Rust", summary="", level=1, study_material=[])
+        session.add(item)
+        session.flush()
+        session.add(models.QuizQuestion(roadmap_item_id=item.id, question="Who owns this value?", options=["me", "you"], correct=0))
+        session.commit()
+        assert (roadmap.id, item.id) == (roadmap_id, item_id)
+
+    new = client.get(f"/api/quiz/{item_id}")
+    assert [question["question"] for question in new.json()["questions"]] == ["Who owns this value?"]
+    assert new.headers["etag"] != old.headers["etag"]
+    assert client.get(f"/api/quiz/{item_id}", headers={"If-None-Match": old.headers["etag"]}).status_code == 200
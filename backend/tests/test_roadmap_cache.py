@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app import db, roadmap_cache
+from app.routers.roadmaps import delete_roadmaps
+
+EXPERIENCE = "I know some programming"
+
+
+def test_same_topic_written_differently_is_a_hit(create_roadmap, fake_llm):
+    create_roadmap("Intro to ML with Python", EXPERIENCE)
+    create_roadmap("intro to ML, with python!", EXPERIENCE)
+
+    assert len(fake_llm) == 1
+    assert roadmap_cache.stats()["hits"] >= 1
+
+
+@pytest.mark.parametrize("cached_topic, requested_topic", [
+    ("Intro to ML with Python", "Intro to ML with R"),
+    ("World War I history", "World War II history"),
+    ("Introduction to Organic Chemistry", "Introduction to Inorganic Chemistry"),
+    ("Python basics", "Python basics for data science"),
+])
+def test_near_miss_topics_are_not_served_from_cache(create_roadmap, fake_llm, cached_topic, requested_topic):
+    create_roadmap(cached_topic, EXPERIENCE)
+    create_roadmap(requested_topic, EXPERIENCE)
+
+    assert len(fake_llm) == 2
+
+
+def test_topic_tokens_ignore_order_case_and_filler_words():
+    assert roadmap_cache.topic_tokens("The History of Rome") == roadmap_cache.topic_tokens("rome history")
+    assert roadmap_cache.topic_tokens("World War I") != roadmap_cache.topic_tokens("World War II")
+
+
+def test_rolled_back_delete_keeps_the_entry_indexed(client, create_roadmap, fake_llm):
+    roadmap_id = create_roadmap("Python basics", EXPERIENCE)
+
+    async def delete_then_roll_back():
+        async with db.AsyncSessionLocal() as session:
+            await delete_roadmaps(session, [roadmap_id])
+            await session.rollback()
+
+    asyncio.run(delete_then_roll_back())
+    assert roadmap_cache.stats()["entries"] == 1
+    create_roadmap("Python basics", EXPERIENCE)
+    assert len(fake_llm) == 1
+
+
+def test_committed_delete_drops_the_entry_from_the_index(client, create_roadmap, fake_llm):
+    roadmap_id = create_roadmap("Python basics", EXPERIENCE)
+
+    assert client.delete(f"/api/roadmaps/{roadmap_id}").status_code == 200
+    assert roadmap_cache.stats()["entries"] == 0
+    create_roadmap("Python basics", EXPERIENCE)
+    assert len(fake_llm) == 2
@@ -0,0 +1,58 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from app import db, jobs, models
+
+
+def rows_of(roadmap_id: int) -> dict:
+    """How many rows of each table belong to a roadmap, directly or through its items and nodes."""
+    with db.SessionLocal() as session:
+        item_ids = select(models.RoadmapItem.id).where(models.RoadmapItem.roadmap_id == roadmap_id)
+        node_ids = select(models.KnowledgeGraphNode.id).where(models.KnowledgeGraphNode.roadmap_id == roadmap_id)
+        counts = {
+            "items": select(models.RoadmapItem).where(models.RoadmapItem.roadmap_id == roadmap_id),
+            "questions": select(models.QuizQuestion).where(models.QuizQuestion.roadmap_item_id.in_(item_ids)),
+            "quiz_progress": select(models.QuizProgress).where(models.QuizProgress.roadmap_item_id.in_(item_ids)),
+            "roadmap_progress": select(models.RoadmapProgress).where(models.RoadmapProgress.roadmap_id == roadmap_id),
+            "cache_entries": select(models.RoadmapCacheEntry).where(models.RoadmapCacheEntry.roadmap_id == roadmap_id),
+            "nodes": select(models.KnowledgeGraphNode).where(models.KnowledgeGraphNode.roadmap_id == roadmap_id),
+            "edges": select(models.KnowledgeGraphEdge).where(
+                models.KnowledgeGraphEdge.source.in_(node_ids) | models.KnowledgeGraphEdge.target.in_(node_ids)
+            ),
+        }
+        return {name: session.scalar(select(func.count()).select_from(query.subquery())) for name, query in counts.items()}
+
+
+def test_bulk_delete_cascades_to_everything_of_the_roadmaps(client, create_roadmap):
+    deleted_id, kept_id = create_roadmap("Python"), create_roadmap("Rust")
+    asyncio.run(jobs.run_pending_jobs())  # link both into the graph
+    with db.SessionLocal() as session:
+        first_item = session.scalar(select(models.RoadmapItem.id).where(models.RoadmapItem.roadmap_id == deleted_id).limit(1))
+        kept_item = session.scalar(select(models.RoadmapItem.id).where(models.RoadmapItem.roadmap_id == kept_id).limit(1))
+        # An edge across the two roadmaps goes with either end
+        session.add(models.KnowledgeGraphEdge(source=f"title_{first_item}", target=f"title_{kept_item}", weight=2.0))
+        session.commit()
+    client.post("/api/progress/complete", json={"roadmap_item_id": first_item, "score": 2, "total_questions": 2})
+    before = rows_of(deleted_id)
+    assert all(before.values()), before
+    kept_before = rows_of(kept_id)
+
+    response = client.post("/api/roadmaps/bulk-delete", json={"ids": [deleted_id, 999]})
+
+    assert response.status_code == 200
+    assert response.json() == {"deleted": [deleted_id], "not_found": [999]}
+    assert rows_of(deleted_id) == {name: 0 for name in before}
+    assert rows_of(kept_id) == {**kept_before, "edges": kept_before["edges"] - 1}
+
+
+def test_bulk_delete_reports_missing_ids(client):
+    response = client.post("/api/roadmaps/bulk-delete", json={"ids": [5, 6, 5]})
+
+    assert response.json() == {"deleted": [], "not_found": [5, 6]}
+
+
+def test_bulk_delete_takes_up_to_500_ids(client):
+    assert client.post("/api/roadmaps/bulk-delete", json={"ids": list(range(1, 501))}).status_code == 200
+    assert client.post("/api/roadmaps/bulk-delete", json={"ids": list(range(1, 502))}).status_code == 422
+    assert client.post("/api/roadmaps/bulk-delete", json={"ids": []}).status_code == 422
@@ -0,0 +1,72 @@
+import re
+
+from app import db, models
+
+
+def add_roadmaps(*topics):
+    with db.SessionLocal() as session:
+        roadmaps = [models.Roadmap(topic=topic, experience="Beginner", user_id="default_user") for topic in topics]
+        session.add_all(roadmaps)
+        session.commit()
+        return [roadmap.id for roadmap in roadmaps]
+
+
+def next_link(response):
+    match = re.fullmatch(r'<(.+)>; rel="next"', response.headers["Link"])
+    return match.group(1)
+
+
+def test_cursor_pages_walk_every_roadmap_newest_first(client):
+    ids = add_roadmaps(*(f"Topic {n}" for n in range(7)))
+
+    seen = []
+    response = client.get("/api/roadmaps/", params={"limit": 3, "view": "summary"})
+    while True:
+        assert response.status_code == 200
+        seen += [roadmap["id"] for roadmap in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        assert response.headers["X-Next-Cursor"] == str(seen[-1])
+        response = client.get(next_link(response))
+
+    assert seen == sorted(ids, reverse=True)
+    # The last page has one roadmap; no Link either
+    assert len(response.json()) == 1
+    assert "Link" not in response.headers
+
+
+def test_full_last_page_has_no_next_cursor(client):
+    add_roadmaps("Python", "Rust")
+
+    response = client.get("/api/roadmaps/", params={"limit": 2})
+    assert len(response.json()) == 2
+    assert "X-Next-Cursor" not in response.headers
+    assert "Link" not in response.headers
+
+
+def test_next_link_keeps_the_page_size_and_view(client):
+    add_roadmaps("Python", "Rust", "Go")
+
+    response = client.get("/api/roadmaps/", params={"limit": 2, "view": "summary"})
+    cursor = response.headers["X-Next-Cursor"]
+    assert next_link(response) == f"/api/roadmaps/?limit=2&cursor={cursor}&view=summary"
+    assert "item_count" in client.get(next_link(response)).json()[0]
+
+
+def test_invalid_cursor_or_limit_is_rejected(client):
+    assert client.get("/api/roadmaps/", params={"cursor": "abc"}).status_code == 422
+    assert client.get("/api/roadmaps/", params={"limit": 0}).status_code == 422
+    assert client.get("/api/roadmaps/", params={"limit": 501}).status_code == 422
+
+
+def test_roadmaps_created_between_pages_do_not_shift_later_pages(client):
+    old_ids = add_roadmaps(*(f"Topic {n}" for n in range(5)))
+
+    first = client.get("/api/roadmaps/", params={"limit": 2, "view": "summary"})
+    new_ids = add_roadmaps("Created while paging", "Also new")
+    second = client.get(next_link(first))
+    third = client.get(next_link(second))
+
+    pages = [[roadmap["id"] for roadmap in page.json()] for page in (first, second, third)]
+    assert pages == [old_ids[4:2:-1], old_ids[2:0:-1], old_ids[:1]]
+    assert not set(new_ids) & {roadmap_id for page in pages for roadmap_id in page}
@@ -0,0 +1,90 @@
+from sqlalchemy import select
+
+from app import db, models, roadmap_progress
+
+USER_ID = "default_user"
+
+
+def stored_summaries() -> dict:
+    with db.SessionLocal() as session:
+        return {
+            summary.roadmap_id: {
+                "level_items": summary.level_items,
+                "level_completed": summary.level_completed,
+                "completed_item_ids": summary.completed_item_ids,
+            }
+            for summary in session.scalars(select(models.RoadmapProgress).where(models.RoadmapProgress.user_id == USER_ID))
+        }
+
+
+def recomputed_summaries() -> dict:
+    """Summaries rebuilt from scratch out of the items and QuizProgress, for every roadmap with progress."""
+    with db.SessionLocal() as session:
+        completed = session.execute(
+            select(models.QuizProgress.roadmap_item_id, models.RoadmapItem.roadmap_id).join(
+                models.RoadmapItem, models.RoadmapItem.id == models.QuizProgress.roadmap_item_id
+            ).where(
+                models.QuizProgress.user_id == USER_ID,
+                models.QuizProgress.score == models.QuizProgress.total_questions
+            )
+        ).all()
+        roadmap_ids = {roadmap_id for _, roadmap_id in completed}
+        items = session.execute(
+            select(models.RoadmapItem.id, models.RoadmapItem.level, models.RoadmapItem.roadmap_id).where(
+                models.RoadmapItem.roadmap_id.in_(roadmap_ids)
+            )
+        ).all()
+    return {
+        roadmap_id: roadmap_progress.summarize(
+            [(item_id, level) for item_id, level, owner in items if owner == roadmap_id],
+            [item_id for item_id, _ in completed]
+        )
+        for roadmap_id in roadmap_ids
+    }
+
+
+def items_of(roadmap_id: int):
+    with db.SessionLocal() as session:
+        return session.scalars(
+            select(models.RoadmapItem.id).where(models.RoadmapItem.roadmap_id == roadmap_id).order_by(models.RoadmapItem.id)
+        ).all()
+
+
+def complete(client, item_id: int, score: int = 2):
+    response = client.post("/api/progress/complete", json={"roadmap_item_id": item_id, "score": score, "total_questions": 2})
+    assert response.status_code == 200
+
+
+def test_summary_matches_recompute_through_completions_and_deletes(client, create_roadmap):
+    python, rust = create_roadmap("Python"), create_roadmap("Rust")
+    python_items, rust_items = items_of(python), items_of(rust)
+
+    complete(client, python_items[0])
+    complete(client, rust_items[1])
+    assert stored_summaries() == recomputed_summaries()
+    assert stored_summaries()[python]["completed_item_ids"] == [python_items[0]]
+    assert stored_summaries()[python]["level_completed"] == {"1": 1, "2": 0, "3": 0}
+
+    # Completing again, or failing a retry, changes nothing
+    complete(client, python_items[0])
+    complete(client, python_items[0], score=1)
+    complete(client, python_items[1])
+    assert stored_summaries() == recomputed_summaries()
+    assert stored_summaries()[python]["completed_item_ids"] == python_items[:2]
+
+    assert client.delete(f"/api/roadmaps/{python}").status_code == 200
+    assert stored_summaries() == recomputed_summaries()
+    assert list(stored_summaries()) == [rust]
+
+
+def test_summary_columns_are_not_double_encoded(client, create_roadmap):
+    roadmap_id = create_roadmap()
+    complete(client, items_of(roadmap_id)[0])
+
+    with db.engine.connect() as conn:
+        stored_types = conn.exec_driver_sql(
+            "SELECT json_type(level_items), json_type(completed_item_ids) FROM roadmap_progress"
+        ).one()
+
+    # Not JSON strings wrapping encoded JSON
+    assert tuple(stored_types) == ("object", "array")
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app import db, llm, models, schema
+from app.routers.roadmaps import stream_roadmap_events
+from conftest import fake_items
+
+REQUEST = schema.RoadmapCreate(topic="Python", experience="Beginner")
+
+
+def count_rows(model) -> int:
+    with db.engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(model))
+
+
+@pytest.fixture
+def stalled_model(monkeypatch):
+    """The model streams the first roadmap item, then never sends anything else."""
+    async def stream_json(prompt, schema, **kwargs):
+        yield '{"items": [' + json.dumps(fake_items("Python")[0]) + ","
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(llm, "stream_json", stream_json)
+
+
+async def read_until_first_item(events):
+    async for event in events:
+        if event.startswith("event: item"):
+            return
+
+
+def test_complete_stream_keeps_roadmap(client):
+    response = client.post("/api/roadmaps/generate/stream", json=REQUEST.model_dump())
+
+    assert "event: done" in response.text
+    assert count_rows(models.Roadmap) == 1
+    assert count_rows(models.Job) == 1
+
+
+def test_cancelled_stream_removes_partial_roadmap(stalled_model):
+    async def disconnect_after_first_item():
+        events = stream_roadmap_events(REQUEST)
+        first_item = asyncio.Event()
+
+        async def consume():
+            await read_until_first_item(events)
+            first_item.set()
+            await read_until_first_item(events)
+
+        consumer = asyncio.create_task(consume())
+        await first_item.wait()
+        assert count_rows(models.RoadmapItem) == 1
+        # What the server does to the response task when the client goes away
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await consumer
+
+    asyncio.run(disconnect_after_first_item())
+
+    assert count_rows(models.Roadmap) == 0
+    assert count_rows(models.RoadmapItem) == 0
+    assert count_rows(models.Job) == 0
+
+
+def test_closed_stream_removes_partial_roadmap(stalled_model):
+    async def close_after_first_item():
+        events = stream_roadmap_events(REQUEST)
+        await read_until_first_item(events)
+        await events.aclose()
+
+    asyncio.run(close_after_first_item())
+
+    assert count_rows(models.Roadmap) == 0
+    assert count_rows(models.QuizQuestion) == 0
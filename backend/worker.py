@@ -0,0 +1,19 @@
+"""
+Run the background job worker as its own process.
+
+Use this with JOBS_RUN_IN_PROCESS=false on the API so graph linking and
+other background jobs don't share the API's event loop.
+"""
+
+import asyncio
+
+# Importing the app registers every router's job handlers
+import app.app  # noqa: F401
+from app import db, jobs, migrations
+
+if __name__ == "__main__":
+    migrations.check_current(db.engine)
+    try:
+        asyncio.run(jobs.run_worker())
+    except KeyboardInterrupt:
+        pass
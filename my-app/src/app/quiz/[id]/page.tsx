@@ -8,7 +8,7 @@ import Link from "next/link";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "@/components/ui/dialog";
-import { API_ENDPOINTS } from "@/lib/api";
+import { API_ENDPOINTS, fetchAllRoadmaps } from "@/lib/api";
 
 import { type Question } from "@/lib/data";
 
@@ -94,8 +94,7 @@ export default function QuizPage() {
               }
 
               // Fetch item title for modal
-              fetch(API_ENDPOINTS.roadmaps.base)
-                .then(res => res.json())
+              fetchAllRoadmaps<any>()
                 .then((roadmaps: any[]) => {
                   const item = roadmaps.flatMap((r: any) => r.items).find((item: any) => item.id === parseInt(id));
                   if (item) {
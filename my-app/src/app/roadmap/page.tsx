@@ -3,7 +3,7 @@ import { Card, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
 import { Separator } from "@/components/ui/separator";
 import { Button } from "@/components/ui/button";
-import { API_ENDPOINTS } from "@/lib/api";
+import { API_ENDPOINTS, fetchAllRoadmaps } from "@/lib/api";
 
 import {
   Dialog,
@@ -41,9 +41,8 @@ const RoadmapPage = () => {
   const [completedIds, setCompletedIds] = useState<Set<number>>(new Set());
 
   useEffect(() => {
-    // Fetch roadmaps
-    fetch(API_ENDPOINTS.roadmaps.base)
-      .then(res => res.json())
+    // Fetch roadmaps (every page)
+    fetchAllRoadmaps<Roadmap>()
       .then(data => {
         // Sort roadmaps by ID in descending order (newest first)
         const sortedData = data.sort((a: Roadmap, b: Roadmap) => b.id - a.id);
@@ -3,6 +3,9 @@
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || 'http://localhost:8000';
 
+// Largest page the roadmap list endpoint serves
+const ROADMAP_PAGE_SIZE = 500;
+
 // API endpoints
 export const API_ENDPOINTS = {
   // Knowledge Graph
@@ -23,7 +26,10 @@ export const API_ENDPOINTS = {
   // Roadmaps
   roadmaps: {
     base: `${API_BASE_URL}/api/roadmaps/`,
+    page: (cursor: string | null = null, limit: number = ROADMAP_PAGE_SIZE) =>
+      `${API_BASE_URL}/api/roadmaps/?limit=${limit}${cursor ? `&cursor=${cursor}` : ''}`,
     generate: `${API_BASE_URL}/api/roadmaps/generate`,
+    generateStream: `${API_BASE_URL}/api/roadmaps/generate/stream`,
     discover: (userId: string = 'default_user') => 
       `${API_BASE_URL}/api/roadmaps/discover?user_id=${userId}`,
     acceptSuggestion: (topic: string, experience: string = 'Beginner', userId: string = 'default_user') =>
@@ -63,4 +69,19 @@ export async function apiRequest<T>(
   }
 }
 
+// Fetch every roadmap (newest first), following X-Next-Cursor across pages
+export async function fetchAllRoadmaps<T>(): Promise<T[]> {
+  const roadmaps: T[] = [];
+  let cursor: string | null = null;
+  do {
+    const response: Response = await fetch(API_ENDPOINTS.roadmaps.page(cursor));
+    if (!response.ok) {
+      throw new Error(`API request failed: ${response.statusText}`);
+    }
+    roadmaps.push(...(await response.json()));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return roadmaps;
+}
+
 export default API_ENDPOINTS;